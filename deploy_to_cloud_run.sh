@@ -116,6 +116,7 @@ gcloud run deploy nyaya-sahayak \
     --cpu 2 \
     --timeout 300 \
     --max-instances 10 \
+    --startup-probe "httpGet.path=/readyz,periodSeconds=2,timeoutSeconds=1,failureThreshold=90" \
     --set-env-vars "GOOGLE_API_KEY=$GOOGLE_API_KEY,PROJECT_ID=$PROJECT_ID,LOCATION=us-central1" \
     --quiet
 
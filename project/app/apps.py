@@ -3,3 +3,16 @@ from django.apps import AppConfig
 
 class AppConfig(AppConfig):
     name = 'app'
+
+    def ready(self):
+        from . import chat_batch, log, rag_engine
+        from .metrics import registry
+        from .startup import collect_metrics, is_dev_server_child, start_warmup
+
+        registry.register_collector(log.collect_metrics)
+        registry.register_collector(chat_batch.collect_metrics)
+        registry.register_collector(rag_engine.collect_metrics)
+        registry.register_collector(collect_metrics)
+        # gunicorn starts the warmup from wsgi.py / asgi.py; management commands never do
+        if is_dev_server_child():
+            start_warmup()
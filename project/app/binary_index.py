@@ -0,0 +1,323 @@
+"""
+Nyaya-Sahayak Binary Retrieval Index
+Purpose: Compact on-disk index that workers open with mmap instead of rebuilding or unpickling
+
+File layout (little-endian):
+1. Header: magic, format, embedding dim, doc/term counts, average doc length,
+   then (offset, length) of every section below
+2. Info: JSON (corpus version, Act names)
+3. Term table: fixed-size entries (string offset, length, df, postings offset, length)
+   sorted by term bytes, so lookups are a binary search over the mapped pages
+4. Term strings: concatenated UTF-8 terms
+5. Postings: per term, varint delta-encoded doc ids interleaved with varint term frequencies
+6. Doc lengths (uint32), one per chunk
+7. Metadata: offset table + JSON per chunk (act, section, title, pages, text), decoded on demand
+8. Embeddings: float32 matrix (docs × dim) of L2-normalized hashed tf-idf vectors
+
+Opening is O(1) in corpus size: only the header is parsed. Every worker maps the same
+file read-only, so the OS page cache holds one physical copy shared by all of them.
+
+Configuration (environment):
+- INDEX_EMBEDDING_WEIGHT: weight of embedding similarity when re-ranking BM25 candidates (default: 0.3)
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b'NYIDX\x00\x00\x01'
+INDEX_FORMAT = 1
+DEFAULT_DIM = 256
+
+HEADER = struct.Struct('<8sIIIId' + 'QQ' * 8)
+TERM_ENTRY = struct.Struct('<IHIQI')
+SECTIONS = ('info', 'terms', 'strings', 'postings', 'lengths', 'meta_offsets', 'meta', 'embeddings')
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'to', 'in', 'for', 'on', 'by', 'or', 'and', 'is', 'are', 'be',
+    'as', 'at', 'it', 'its', 'any', 'with', 'such', 'shall', 'which', 'that', 'this', 'from',
+    'what', 'who', 'how', 'can', 'i', 'my', 'me', 'under', 'if', 'do', 'does', 'will',
+}
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords (shared by indexing and querying)"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_tokens(chunk: Dict) -> List[str]:
+    return tokenize(f"{chunk['act']} section {chunk['section']} {chunk['title']} {chunk['text']}")
+
+
+def _encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varints(data, start: int, end: int) -> Iterator[int]:
+    value = 0
+    shift = 0
+    for position in range(start, end):
+        byte = data[position]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+def _hashed_vector(weights: Dict[str, float], dim: int) -> Dict[int, float]:
+    """Feature-hash term weights into dim buckets (signed) and L2-normalize"""
+    vector: Dict[int, float] = {}
+    for term, weight in weights.items():
+        h = zlib.crc32(term.encode('utf-8'))
+        bucket = h % dim
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        vector[bucket] = vector.get(bucket, 0.0) + sign * weight
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {bucket: v / norm for bucket, v in vector.items()} if norm else {}
+
+
+def _idf(doc_count: int, df: int) -> float:
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+def build_index(chunks: List[Dict], path: str, version: str = '', dim: int = DEFAULT_DIM) -> None:
+    """
+    Write a binary index for chunks (atomically: temp file then rename)
+
+    Args:
+        chunks: Corpus chunks (see corpus.chunk_act_text)
+        path: Destination file
+        version: Corpus version recorded in the index
+        dim: Embedding dimensions
+    """
+    acts = sorted({chunk['act'] for chunk in chunks})
+
+    term_counts: List[Dict[str, int]] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = []
+    for doc_id, chunk in enumerate(chunks):
+        tokens = chunk_tokens(chunk)
+        lengths.append(len(tokens))
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        term_counts.append(counts)
+        for token, tf in counts.items():
+            postings.setdefault(token, []).append((doc_id, tf))
+
+    doc_count = len(chunks)
+    avg_length = (sum(lengths) / doc_count) if doc_count else 0.0
+
+    sections: Dict[str, bytes] = {}
+    sections['info'] = json.dumps({'version': version, 'acts': acts}).encode('utf-8')
+
+    terms = sorted(postings, key=lambda term: term.encode('utf-8'))
+    table = bytearray()
+    strings = bytearray()
+    postings_blob = bytearray()
+    for term in terms:
+        encoded = term.encode('utf-8')
+        start = len(postings_blob)
+        previous = 0
+        for doc_id, tf in postings[term]:
+            _encode_varint(doc_id - previous, postings_blob)
+            _encode_varint(tf, postings_blob)
+            previous = doc_id
+        table += TERM_ENTRY.pack(len(strings), len(encoded), len(postings[term]),
+                                 start, len(postings_blob) - start)
+        strings += encoded
+    sections['terms'] = bytes(table)
+    sections['strings'] = bytes(strings)
+    sections['postings'] = bytes(postings_blob)
+    sections['lengths'] = struct.pack(f'<{doc_count}I', *lengths)
+
+    meta = bytearray()
+    offsets = []
+    for chunk in chunks:
+        offsets.append(len(meta))
+        meta += json.dumps(chunk, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    offsets.append(len(meta))
+    sections['meta_offsets'] = struct.pack(f'<{len(offsets)}Q', *offsets)
+    sections['meta'] = bytes(meta)
+
+    embeddings = bytearray()
+    for counts in term_counts:
+        weights = {
+            term: (1 + math.log(tf)) * _idf(doc_count, len(postings[term]))
+            for term, tf in counts.items()
+        }
+        row = [0.0] * dim
+        for bucket, value in _hashed_vector(weights, dim).items():
+            row[bucket] = value
+        embeddings += struct.pack(f'<{dim}f', *row)
+    sections['embeddings'] = bytes(embeddings)
+
+    # Lay sections out after the header, 8-byte aligned
+    layout = []
+    offset = HEADER.size
+    for name in SECTIONS:
+        offset += (-offset) % 8
+        layout.append((offset, len(sections[name])))
+        offset += len(sections[name])
+
+    header = HEADER.pack(MAGIC, INDEX_FORMAT, dim, doc_count, len(terms), avg_length,
+                         *[value for pair in layout for value in pair])
+    with open(path + '.tmp', 'wb') as f:
+        f.write(header)
+        for name, (start, _) in zip(SECTIONS, layout):
+            f.write(b'\x00' * (start - f.tell()))
+            f.write(sections[name])
+    os.replace(path + '.tmp', path)
+
+
+class BinaryIndex:
+    """Read-only, memory-mapped view of an index written by build_index"""
+
+    def __init__(self, path: str, embedding_weight: float = 0.3):
+        self.path = path
+        self.embedding_weight = embedding_weight
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        fields = HEADER.unpack_from(self._mmap, 0)
+        magic, file_format, self.dim, self.doc_count, self.term_count, self.avg_length = fields[:6]
+        if magic != MAGIC or file_format != INDEX_FORMAT:
+            raise ValueError(f"Not a supported index file: {path}")
+        spans = fields[6:]
+        self._sections = {name: (spans[2 * i], spans[2 * i + 1]) for i, name in enumerate(SECTIONS)}
+
+        info = json.loads(bytes(self._section('info')).decode('utf-8'))
+        self.version = info.get('version')
+        self.acts: List[str] = info.get('acts', [])
+        self._lengths = self._section('lengths').cast('I')
+        self._meta_offsets = self._section('meta_offsets').cast('Q')
+        self._embeddings = self._section('embeddings').cast('f')
+
+    @classmethod
+    def open(cls, path: str) -> 'BinaryIndex':
+        return cls(path, embedding_weight=float(os.getenv('INDEX_EMBEDDING_WEIGHT', '0.3')))
+
+    def _section(self, name: str) -> memoryview:
+        start, length = self._sections[name]
+        return self._view[start:start + length]
+
+    def _term_entry(self, index: int) -> Tuple[bytes, int, int, int]:
+        start = self._sections['terms'][0] + index * TERM_ENTRY.size
+        string_offset, length, df, postings_offset, postings_length = TERM_ENTRY.unpack_from(self._mmap, start)
+        strings = self._sections['strings'][0] + string_offset
+        return self._mmap[strings:strings + length], df, postings_offset, postings_length
+
+    def lookup(self, term: str) -> Optional[Tuple[int, int, int]]:
+        """Binary search the term table; returns (df, postings offset, postings length)"""
+        target = term.encode('utf-8')
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            key, df, offset, length = self._term_entry(middle)
+            if key == target:
+                return df, offset, length
+            if key < target:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def postings(self, term: str) -> List[Tuple[int, int]]:
+        """(doc id, term frequency) pairs for a term"""
+        entry = self.lookup(term)
+        if entry is None:
+            return []
+        _, offset, length = entry
+        start = self._sections['postings'][0] + offset
+        values = _decode_varints(self._mmap, start, start + length)
+        result = []
+        doc_id = 0
+        for delta in values:
+            doc_id += delta
+            result.append((doc_id, next(values)))
+        return result
+
+    def doc(self, doc_id: int) -> Dict:
+        """Decode one chunk's metadata"""
+        base = self._sections['meta'][0]
+        start, end = self._meta_offsets[doc_id], self._meta_offsets[doc_id + 1]
+        return json.loads(self._mmap[base + start:base + end].decode('utf-8'))
+
+    def _cosine(self, doc_id: int, query_vector: Dict[int, float]) -> float:
+        row = doc_id * self.dim
+        return sum(value * self._embeddings[row + bucket] for bucket, value in query_vector.items())
+
+    def search(self, query: str, top_k: int = 3, candidates: int = 20,
+               collection: Optional[Dict] = None) -> List[Tuple[Dict, float]]:
+        """
+        BM25 over the postings, then re-rank the best candidates with embedding similarity
+
+        Args:
+            query: Search text
+            top_k: Results to return
+            candidates: BM25 hits re-ranked by embedding similarity
+            collection: Statistics of the whole corpus when this index is one shard of it
+                ({'doc_count', 'avg_length', 'df': {term: df}}), so relevance is comparable
+                across shards; default: this index's own
+
+        Returns:
+            List of (chunk, relevance) best first; relevance blends the BM25 score as a
+            fraction of the query's reference score with cosine similarity (0-1)
+        """
+        if not self.doc_count:
+            return []
+        counts: Dict[str, int] = {}
+        for token in tokenize(query):
+            counts[token] = counts.get(token, 0) + 1
+
+        doc_count = collection['doc_count'] if collection else self.doc_count
+        avg_length = collection['avg_length'] if collection else self.avg_length
+        scores: Dict[int, float] = {}
+        # Reference: every query term matched once in a chunk of average length (a precise
+        # hit). The asymptotic BM25 maximum, idf·(k1+1), is unreachable and kept even exact
+        # matches below 0.5
+        reference = 0.0
+        weights = {}
+        for term, query_tf in counts.items():
+            entry = self.lookup(term)
+            # A term other shards know still counts toward the reference
+            df = collection['df'].get(term, 0) if collection else (entry[0] if entry else 0)
+            if not df:
+                continue
+            idf = _idf(doc_count, df)
+            weights[term] = (1 + math.log(query_tf)) * idf
+            reference += idf
+            for doc_id, tf in self.postings(term) if entry else ():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if not scores:
+            return []
+
+        shortlist = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max(top_k, candidates)]
+        query_vector = _hashed_vector(weights, self.dim)
+        alpha = self.embedding_weight
+        ranked = sorted(
+            (
+                (doc_id, (1 - alpha) * min(1.0, score / reference)
+                 + alpha * max(0.0, self._cosine(doc_id, query_vector)))
+                for doc_id, score in shortlist
+            ),
+            key=lambda item: item[1],
+            reverse=True
+        )[:top_k]
+        return [(self.doc(doc_id), round(relevance, 4)) for doc_id, relevance in ranked]
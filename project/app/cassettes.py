@@ -0,0 +1,472 @@
+"""
+Nyaya-Sahayak Upstream Cassettes
+Purpose: Record real Vertex AI Search and Gemini traffic, replay it offline for benchmarks
+
+How it works:
+1. In record mode the engine's search client and Gemini models are wrapped; every call
+   (request, response, latency, stream chunk timing, errors) is appended to a JSON Lines
+   cassette after secrets are scrubbed
+2. In replay mode no upstream client is created; calls are answered from the cassette,
+   sleeping the recorded latency times CASSETTE_TIME_SCALE (0 = instant)
+3. Calls are matched on a hash of the scrubbed request; repeated identical calls are
+   served in recorded order. With CASSETTE_MATCH=nearest, a call that no longer matches
+   exactly (prompt construction, retrieval or routing changed) gets the recording with
+   the most similar prompt (MinHash over word shingles) or search query (word sets),
+   so changed pipelines can still be benchmarked against production-shaped traffic
+4. Recorded errors are replayed as CassetteError; unmatched calls raise CassetteMiss,
+   which the pipeline handles like any upstream failure
+
+Recording at the engine boundary covers every model call made through
+LegalRAGEngine.get_model() (chat, evidence, analysis, extraction, comparison, streams).
+File uploads made by the views are not recorded.
+
+Configuration (environment):
+- CASSETTE_MODE: "record", "replay" or "off" (default: off)
+- CASSETTE_PATH: cassette file (default: app/data/cassettes/default.jsonl)
+- CASSETTE_TIME_SCALE: replay latency multiplier (default: 1.0)
+- CASSETTE_MATCH: "exact" or "nearest" (default: nearest)
+- CASSETTE_MIN_SIMILARITY: lowest prompt similarity accepted by nearest match (default: 0.3)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from .log import get_logger
+from .prompt_packing import minhash, normalize_text, shingles, similarity
+
+log = get_logger('cassettes')
+
+DEFAULT_CASSETTE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'cassettes', 'default.jsonl')
+CASSETTE_VERSION = 1
+
+SEARCH = 'search'
+GENERATE = 'generate'
+
+# Credentials that can end up in prompts, URLs or error messages
+_SECRET_PATTERNS = [
+    re.compile(r'AIza[0-9A-Za-z_\-]{35}'),                 # Google API keys
+    re.compile(r'ya29\.[0-9A-Za-z_\-\.]+'),                # OAuth access tokens
+    re.compile(r'(?i)bearer\s+[0-9A-Za-z_\-\.=]+'),
+    re.compile(r'-----BEGIN [A-Z ]*PRIVATE KEY-----.*?-----END [A-Z ]*PRIVATE KEY-----', re.S),
+    re.compile(r'(?i)([?&](?:key|api_key|token|access_token)=)[^&\s"]+'),
+]
+_SECRET_ENV = ('GOOGLE_API_KEY', 'PROFILING_TOKEN')
+
+
+class CassetteMiss(Exception):
+    """No recording matches a call made during replay"""
+
+
+class CassetteError(Exception):
+    """An upstream error replayed from the cassette"""
+
+
+def scrub(text: str, secrets: List[str]) -> str:
+    """Replace credentials with placeholders"""
+    for secret in secrets:
+        text = text.replace(secret, '<redacted>')
+    for pattern in _SECRET_PATTERNS:
+        if pattern.groups:
+            text = pattern.sub(lambda match: match.group(1) + '<redacted>', text)
+        else:
+            text = pattern.sub('<redacted>', text)
+    return text
+
+
+def prompt_parts(contents) -> List[str]:
+    """Prompt as text parts; uploaded files become a placeholder (their names are random)"""
+    if isinstance(contents, str):
+        return [contents]
+    if isinstance(contents, (list, tuple)):
+        return [part if isinstance(part, str) else '<file>' for part in contents]
+    return ['<file>']
+
+
+def config_fields(generation_config) -> Dict:
+    """Fields of a GenerationConfig (object or dict) that change the output"""
+    if generation_config is None:
+        return {}
+    fields = {}
+    for name in ('temperature', 'max_output_tokens', 'top_p', 'top_k', 'candidate_count'):
+        if isinstance(generation_config, dict):
+            value = generation_config.get(name)
+        else:
+            value = getattr(generation_config, name, None)
+        if value is not None:
+            fields[name] = value
+    return fields
+
+
+def to_plain(value):
+    """Convert a response object (proto-plus message, namespace, ...) to JSON-able data"""
+    to_dict = getattr(type(value), 'to_dict', None)
+    if callable(to_dict):
+        try:
+            return to_dict(value)
+        except TypeError:
+            pass
+    if isinstance(value, dict):
+        return {str(key): to_plain(item) for key, item in value.items()}
+    if isinstance(value, SimpleNamespace):
+        return {key: to_plain(item) for key, item in vars(value).items()}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, 'items'):
+        return {str(key): to_plain(item) for key, item in value.items()}
+    if hasattr(value, '__iter__'):
+        return [to_plain(item) for item in value]
+    return str(value)
+
+
+def to_namespace(value):
+    """Recorded data back into attribute-access objects, as the engine reads responses"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+def _usage(response) -> Optional[Dict]:
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is None:
+        return None
+    return {name: getattr(metadata, name, 0) or 0
+            for name in ('prompt_token_count', 'candidates_token_count', 'total_token_count')}
+
+
+def _text(response) -> Optional[str]:
+    try:
+        return response.text
+    except ValueError:
+        # Blocked / empty candidates: replayed as a ValueError on .text
+        return None
+
+
+class ReplayedResponse:
+    """A recorded Gemini response (or stream) served from the cassette"""
+
+    def __init__(self, interaction: Dict, time_scale: float):
+        response = interaction['response']
+        self._text = response.get('text')
+        self._chunks = response.get('chunks')
+        self._error = response.get('error')
+        self._time_scale = time_scale
+        usage = response.get('usage')
+        self.usage_metadata = SimpleNamespace(**usage) if usage else None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            raise ValueError("Recorded response has no text")
+        return self._text
+
+    def __iter__(self):
+        for delay, text in self._chunks or []:
+            if self._time_scale > 0:
+                time.sleep(delay * self._time_scale)
+            yield SimpleNamespace(text=text)
+        if self._error:
+            raise CassetteError(self._error)
+
+
+class _RecordingStream:
+    """Passes a Gemini stream through, recording chunk text and timing once it is consumed"""
+
+    def __init__(self, stream, finish):
+        self._stream = stream
+        self._finish = finish
+
+    def __iter__(self):
+        chunks = []
+        last = time.perf_counter()
+        error = None
+        try:
+            for chunk in self._stream:
+                now = time.perf_counter()
+                try:
+                    text = chunk.text
+                except ValueError:
+                    text = ''
+                chunks.append((round(now - last, 4), text))
+                last = now
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs when the consumer stops early (OUT OF SCOPE cut-off)
+            self._finish(chunks, error, self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _CassetteModel:
+    """Wraps a GenerativeModel so generate_content goes through the cassette"""
+
+    def __init__(self, cassette: 'Cassette', model, model_name: str):
+        self._cassette = cassette
+        self._model = model
+        self.model_name = model_name if model_name.startswith('models/') else f"models/{model_name}"
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        request = {
+            'model': self.model_name.replace('models/', ''),
+            'prompt': prompt_parts(contents),
+            'config': config_fields(generation_config),
+            'stream': bool(stream),
+        }
+        if self._cassette.mode == 'replay':
+            return ReplayedResponse(self._cassette.replay(GENERATE, request), self._cassette.time_scale)
+        return self._cassette.record_generation(self._model, request, contents, generation_config,
+                                                stream, kwargs)
+
+
+class _CassetteSearchClient:
+    """Wraps the Discovery Engine client so search() goes through the cassette"""
+
+    def __init__(self, cassette: 'Cassette', client):
+        self._cassette = cassette
+        self._client = client
+
+    def search(self, request):
+        serving_config = getattr(request, 'serving_config', '')
+        recorded = {
+            # The data store id, without the project path
+            'data_store': serving_config.split('/dataStores/')[-1].split('/')[0],
+            'query': request.query,
+            'page_size': request.page_size,
+        }
+        if self._cassette.mode == 'replay':
+            interaction = self._cassette.replay(SEARCH, recorded)
+            return SimpleNamespace(results=to_namespace(interaction['response']['results']))
+
+        start = time.perf_counter()
+        try:
+            response = self._client.search(request)
+        except Exception as e:
+            self._cassette.append(SEARCH, recorded, {'error': self._cassette.scrub(str(e))},
+                                  time.perf_counter() - start)
+            raise
+        results = list(response.results)
+        self._cassette.append(SEARCH, recorded, {'results': [to_plain(result) for result in results]},
+                              time.perf_counter() - start)
+        return SimpleNamespace(results=results)
+
+
+class Cassette:
+    """Records upstream interactions to a JSON Lines file, or replays them"""
+
+    def __init__(self, mode: str = 'off', path: str = DEFAULT_CASSETTE_PATH, time_scale: float = 1.0,
+                 match: str = 'nearest', min_similarity: float = 0.3):
+        self.mode = mode if mode in ('record', 'replay') else 'off'
+        self.path = path
+        self.time_scale = time_scale
+        self.match = match
+        self.min_similarity = min_similarity
+        self.secrets = [value for value in (os.getenv(name, '') for name in _SECRET_ENV) if len(value) >= 8]
+        self._lock = threading.Lock()
+        self.stats = {'recorded': 0, 'exact': 0, 'nearest': 0, 'misses': 0, 'errors_replayed': 0}
+        # Replay state: key → interactions in recorded order, and the next index per key
+        self._by_key: Dict[str, List[Dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        # (kind, group) → [(signature, key)] for nearest matching
+        self._signatures: Dict[Tuple[str, str], List[Tuple[Tuple[int, ...], str]]] = {}
+        if self.mode == 'replay':
+            self.load()
+
+    @classmethod
+    def from_env(cls) -> 'Cassette':
+        return cls(
+            mode=os.getenv('CASSETTE_MODE', 'off'),
+            path=os.getenv('CASSETTE_PATH', DEFAULT_CASSETTE_PATH),
+            time_scale=float(os.getenv('CASSETTE_TIME_SCALE', '1.0')),
+            match=os.getenv('CASSETTE_MATCH', 'nearest'),
+            min_similarity=float(os.getenv('CASSETTE_MIN_SIMILARITY', '0.3')),
+        )
+
+    @property
+    def active(self) -> bool:
+        return self.mode != 'off'
+
+    def scrub(self, text: str) -> str:
+        return scrub(text, self.secrets)
+
+    def key(self, kind: str, request: Dict) -> str:
+        canonical = json.dumps([kind, request], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(self.scrub(canonical).encode('utf-8')).hexdigest()[:24]
+
+    @staticmethod
+    def _group(kind: str, request: Dict) -> str:
+        if kind == SEARCH:
+            return request['data_store']
+        return f"{request['model']}|{request['stream']}"
+
+    @staticmethod
+    def _match_text(kind: str, request: Dict) -> str:
+        return request['query'] if kind == SEARCH else '\n'.join(request['prompt'])
+
+    def _signature(self, kind: str, request: Dict) -> Tuple[int, ...]:
+        # Search queries are a handful of words: compare word sets, prompts by 3-word shingles
+        text = normalize_text(self._match_text(kind, request))
+        return minhash(shingles(text, size=1) if kind == SEARCH else shingles(text))
+
+    # --- Wrapping ---------------------------------------------------------------------
+
+    def wrap_model(self, model, model_name: str):
+        return _CassetteModel(self, model, model_name) if self.active else model
+
+    def wrap_search_client(self, client):
+        return _CassetteSearchClient(self, client) if self.active else client
+
+    # --- Recording --------------------------------------------------------------------
+
+    def append(self, kind: str, request: Dict, response: Dict, seconds: float) -> None:
+        """Append one scrubbed interaction to the cassette"""
+        request = json.loads(self.scrub(json.dumps(request, ensure_ascii=False)))
+        interaction = {
+            'kind': kind,
+            'key': self.key(kind, request),
+            'recorded_at': round(time.time(), 3),
+            'seconds': round(seconds, 4),
+            'request': request,
+            'response': json.loads(self.scrub(json.dumps(response, ensure_ascii=False, default=str))),
+        }
+        line = json.dumps(interaction, ensure_ascii=False)
+        with self._lock:
+            new_file = not os.path.exists(self.path)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if new_file:
+                    f.write(json.dumps({'cassette': CASSETTE_VERSION, 'created_at': round(time.time(), 3)}) + '\n')
+                f.write(line + '\n')
+            self.stats['recorded'] += 1
+
+    def record_generation(self, model, request: Dict, contents, generation_config, stream: bool, kwargs: Dict):
+        """Call the real model and record the completion (streams once they are consumed)"""
+        start = time.perf_counter()
+        try:
+            response = model.generate_content(contents, generation_config=generation_config,
+                                              stream=stream, **kwargs)
+        except Exception as e:
+            self.append(GENERATE, request, {'error': self.scrub(str(e))}, time.perf_counter() - start)
+            raise
+
+        if not stream:
+            self.append(GENERATE, request, {'text': _text(response), 'usage': _usage(response)},
+                        time.perf_counter() - start)
+            return response
+
+        def finish(chunks, error, raw_stream):
+            recorded = {'chunks': chunks, 'text': ''.join(text for _, text in chunks),
+                        'usage': _usage(raw_stream) if error is None else None}
+            if error is not None:
+                recorded['error'] = self.scrub(str(error))
+            self.append(GENERATE, request, recorded, time.perf_counter() - start)
+        return _RecordingStream(response, finish)
+
+    # --- Replay -----------------------------------------------------------------------
+
+    def load(self) -> int:
+        """Index the cassette for replay; returns the number of interactions"""
+        count = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError as e:
+            log.warning(f"CASSETTE: Could not read {self.path}: {str(e)}")
+            return 0
+        for line in lines:
+            try:
+                interaction = json.loads(line)
+            except ValueError:
+                continue
+            if 'kind' not in interaction:
+                continue
+            key = interaction['key']
+            if key not in self._by_key:
+                kind, request = interaction['kind'], interaction['request']
+                signature = self._signature(kind, request)
+                self._signatures.setdefault((kind, self._group(kind, request)), []).append((signature, key))
+            self._by_key.setdefault(key, []).append(interaction)
+            count += 1
+        log.info(f"CASSETTE: Replaying {count} interaction(s) from {self.path}")
+        return count
+
+    def replay(self, kind: str, request: Dict) -> Dict:
+        """The recorded interaction answering a call (after its recorded latency)"""
+        request = json.loads(self.scrub(json.dumps(request, ensure_ascii=False)))
+        key = self.key(kind, request)
+        outcome = 'exact'
+        if key not in self._by_key:
+            key = self._nearest(kind, request) if self.match == 'nearest' else None
+            outcome = 'nearest'
+        if key is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            raise CassetteMiss(f"No recorded {kind} matches: {self._match_text(kind, request)[:80]!r}")
+
+        with self._lock:
+            recordings = self._by_key[key]
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.stats[outcome] += 1
+        interaction = recordings[index % len(recordings)]
+
+        chunks = interaction['response'].get('chunks')
+        if self.time_scale > 0:
+            # Streams sleep per chunk while being iterated; only the time to first chunk here
+            streamed = sum(delay for delay, _ in chunks) if chunks else 0.0
+            time.sleep(max(0.0, interaction['seconds'] - streamed) * self.time_scale)
+        if 'error' in interaction['response'] and not chunks:
+            with self._lock:
+                self.stats['errors_replayed'] += 1
+            raise CassetteError(interaction['response']['error'])
+        return interaction
+
+    def _nearest(self, kind: str, request: Dict) -> Optional[str]:
+        """
+        Key of the most similar recording: same model (or data store) first, then any
+        recording of the kind (e.g. a call the router now sends to the other model).
+        Prompts must reach min_similarity; search queries take the closest recorded query
+        of the data store, whose latency and result shape are what the benchmark needs.
+        """
+        signature = self._signature(kind, request)
+        group = self._group(kind, request)
+        threshold = self.min_similarity if kind == GENERATE else 0.0
+        scopes = [self._signatures.get((kind, group), [])]
+        if kind == GENERATE:
+            scopes.append([pair for (other_kind, _), pairs in self._signatures.items()
+                           if other_kind == kind for pair in pairs])
+        for candidates in scopes:
+            if not candidates:
+                continue
+            best_score, best_key = max(((similarity(signature, other), key) for other, key in candidates),
+                                       key=lambda pair: pair[0])
+            if best_score >= threshold:
+                return best_key
+        return None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+# Global instance (loaded once at startup)
+_cassette = None
+
+def get_cassette() -> Cassette:
+    """Get or create the upstream cassette (inactive unless CASSETTE_MODE is set)"""
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette.from_env()
+        if _cassette.active:
+            log.info(f"CASSETTE: {_cassette.mode} mode ({_cassette.path})")
+    return _cassette
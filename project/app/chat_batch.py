@@ -0,0 +1,218 @@
+"""
+Nyaya-Sahayak Batch Chat
+Purpose: Answer many short queries in one request (/api/chat/batch/) for intake triage
+
+How it works:
+1. Queries are normalized (case, punctuation, spacing) and duplicates collapse onto the
+   first occurrence, so a complaint submitted twice is answered once
+2. Unique queries run through process_legal_query on the shared "batch" pool with at
+   most `concurrency` in flight for this batch; the answer, retrieval and web caches are
+   the engine's own, so a batch warms them for later requests and vice versa
+3. A batch deadline bounds the whole call: queries still running or not yet started
+   when it passes are reported as "timeout" instead of holding the response
+4. Results come back in input order with a per-item status (success / error / timeout);
+   duplicates carry the answer of, and point at, the item they repeat
+
+Configuration (environment):
+- BATCH_MAX_QUERIES: Most queries accepted in one batch (default: 200)
+- BATCH_CONCURRENCY: Queries in flight per batch unless the request asks for fewer (default: 8)
+- BATCH_MAX_CONCURRENCY: Upper bound on a requested concurrency (default: 32)
+- BATCH_TIMEOUT: Seconds for the whole batch (default: 120)
+- BATCH_POOL_SIZE: Worker threads shared by all batches (default: 16)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+
+from .concurrency import submit
+from .log import get_logger
+from .metrics import stats_samples
+from .web_fallback import normalize_query
+
+log = get_logger('chat_batch')
+
+SUCCESS = 'success'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+
+
+class BatchValidationError(ValueError):
+    """The batch request body is malformed or too large"""
+
+
+class BatchRunner:
+    """Deduplicates a batch of queries and answers them with bounded concurrency"""
+
+    def __init__(self, max_queries: int = 200, concurrency: int = 8, max_concurrency: int = 32,
+                 timeout: float = 120.0):
+        self.max_queries = max_queries
+        self.concurrency = concurrency
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.stats = {'batches': 0, 'queries': 0, 'duplicates': 0, SUCCESS: 0, ERROR: 0, TIMEOUT: 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'BatchRunner':
+        return cls(
+            max_queries=int(os.getenv('BATCH_MAX_QUERIES', '200')),
+            concurrency=int(os.getenv('BATCH_CONCURRENCY', '8')),
+            max_concurrency=int(os.getenv('BATCH_MAX_CONCURRENCY', '32')),
+            timeout=float(os.getenv('BATCH_TIMEOUT', '120')),
+        )
+
+    def parse(self, payload: Dict) -> List[Dict]:
+        """
+        Validate a request body: {"queries": ["...", {"id": "C-17", "message": "..."}], "concurrency": 4}
+
+        Returns:
+            Items as {'id', 'message'} in input order
+
+        Raises:
+            BatchValidationError: When the body cannot be processed
+        """
+        queries = payload.get('queries') if isinstance(payload, dict) else None
+        if not isinstance(queries, list) or not queries:
+            raise BatchValidationError("'queries' must be a non-empty list")
+        if len(queries) > self.max_queries:
+            raise BatchValidationError(f"At most {self.max_queries} queries per batch (got {len(queries)})")
+
+        items = []
+        for i, entry in enumerate(queries):
+            if isinstance(entry, str):
+                items.append({'id': None, 'message': entry})
+            elif isinstance(entry, dict) and isinstance(entry.get('message', ''), str):
+                items.append({'id': entry.get('id'), 'message': entry.get('message', '')})
+            else:
+                raise BatchValidationError(f"Query {i} must be a string or an object with a 'message'")
+        return items
+
+    def limit(self, requested: Optional[int] = None) -> int:
+        """Concurrency for one batch: the request's value if given, within [1, max_concurrency]"""
+        value = self.concurrency if requested is None else requested
+        return max(1, min(int(value), self.max_concurrency))
+
+    def run(self, engine, items: List[Dict], concurrency: Optional[int] = None) -> Tuple[List[Dict], Dict]:
+        """
+        Answer every item
+
+        Args:
+            engine: LegalRAGEngine
+            items: Items from parse()
+            concurrency: Queries in flight for this batch (None: BATCH_CONCURRENCY)
+
+        Returns:
+            (results in input order, batch summary)
+        """
+        start = time.perf_counter()
+        limit = self.limit(concurrency)
+
+        # Duplicates (and empty queries) never reach the engine
+        first_index: Dict[str, int] = {}
+        unique: List[int] = []
+        for i, item in enumerate(items):
+            key = normalize_query(item['message'])
+            if key and key not in first_index:
+                first_index[key] = i
+                unique.append(i)
+
+        outcomes: Dict[int, Dict] = {}
+        pending = {}
+        deadline = time.monotonic() + self.timeout
+        position = 0
+        while position < len(unique) or pending:
+            while position < len(unique) and len(pending) < limit:
+                index = unique[position]
+                pending[submit(self._answer, engine, items[index]['message'], pool='batch')] = index
+                position += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcomes[pending.pop(future)] = future.result()
+        for future in pending:
+            future.cancel()
+
+        results = []
+        for i, item in enumerate(items):
+            key = normalize_query(item['message'])
+            if not key:
+                outcome = {'status': ERROR, 'message': 'Query cannot be empty'}
+            else:
+                origin = first_index[key]
+                outcome = outcomes.get(origin) or {'status': TIMEOUT,
+                                                   'message': f"Batch deadline ({self.timeout}s) reached"}
+                if origin != i:
+                    outcome = dict(outcome, duplicate_of=origin)
+            results.append(dict({'index': i, 'id': item['id']}, **outcome))
+
+        counts = {status: sum(1 for result in results if result['status'] == status)
+                  for status in (SUCCESS, ERROR, TIMEOUT)}
+        summary = {
+            'total': len(items),
+            'unique': len(unique),
+            'duplicates': sum(1 for result in results if 'duplicate_of' in result),
+            'concurrency': limit,
+            'seconds': round(time.perf_counter() - start, 3),
+            **counts,
+        }
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['queries'] += summary['total']
+            self.stats['duplicates'] += summary['duplicates']
+            for status, count in counts.items():
+                self.stats[status] += count
+        log.info(f"BATCH: {summary['total']} queries ({summary['unique']} unique) at concurrency {limit} "
+                 f"in {summary['seconds']:.2f}s: {counts[SUCCESS]} ok, {counts[ERROR]} error, "
+                 f"{counts[TIMEOUT]} timeout")
+        return results, summary
+
+    @staticmethod
+    def _answer(engine, query: str) -> Dict:
+        from .rag_engine import answer_failure  # heavy module stays lazy (see startup.py)
+        
+        start = time.perf_counter()
+        try:
+            result = engine.process_legal_query(query)
+        except Exception as e:
+            log.warning(f"BATCH: Query failed ({query[:60]}): {str(e)}")
+            return {'status': ERROR, 'message': f'Error processing legal query: {str(e)}'}
+        # Generation and web-fallback errors come back as answers, not exceptions
+        failure = answer_failure(result)
+        if failure is not None:
+            log.warning(f"BATCH: Query failed ({query[:60]}): {failure}")
+            return {'status': ERROR, 'message': failure}
+        return {
+            'status': SUCCESS,
+            'response': result['response'],
+            'sources': result['sources'],
+            'confidence': result.get('confidence', 'medium'),
+            'note': result.get('note', ''),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+# Global instance (loaded once at startup)
+_batch_runner = None
+
+
+def get_batch_runner() -> BatchRunner:
+    global _batch_runner
+    if _batch_runner is None:
+        _batch_runner = BatchRunner.from_env()
+    return _batch_runner
+
+
+def collect_metrics():
+    """Batch totals for /metrics: (name, type, help, samples)"""
+    if _batch_runner is None:
+        return
+    yield ('nyaya_chat_batch', 'counter', 'Batch chat queries by outcome', stats_samples(_batch_runner.get_stats()))
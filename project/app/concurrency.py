@@ -0,0 +1,46 @@
+"""
+Nyaya-Sahayak Shared Worker Pools
+Purpose: Bounded thread pools for concurrent upstream calls (Vertex AI Search, Gemini, web search)
+
+Notes:
+- Pools are created lazily, one per name, and shared by every request thread
+- Work submitted through submit() runs inside a copy of the caller's context,
+  so per-request state held in contextvars follows the call onto the pool
+- Use a separate named pool for work that itself submits to another pool,
+  otherwise nested waits can exhaust the workers
+"""
+
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str = 'upstream') -> ThreadPoolExecutor:
+    """
+    Get or create the named worker pool
+
+    Pool size is read from <NAME>_POOL_SIZE (e.g. UPSTREAM_POOL_SIZE), default 16.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                max_workers = int(os.getenv(f'{name.upper()}_POOL_SIZE', '16'))
+                executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f'nyaya-{name}'
+                )
+                _executors[name] = executor
+    return executor
+
+
+def submit(fn: Callable, *args, pool: str = 'upstream', **kwargs) -> Future:
+    """Submit fn to a named pool, carrying over the caller's contextvars"""
+    ctx = contextvars.copy_context()
+    return get_executor(pool).submit(ctx.run, fn, *args, **kwargs)
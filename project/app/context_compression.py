@@ -0,0 +1,177 @@
+"""
+Nyaya-Sahayak Context Compression
+Purpose: Keep only the sentences of retrieved chunks that bear on the question
+
+How it works:
+1. Each chunk is split into sentences (and "(a)"-style clauses) with its
+   [Source: ..., Page ...] marker kept aside
+2. Sentences and the query become sparse TF-IDF vectors over stemmed tokens
+   (IDF computed across the sentences of this context), scored by cosine similarity
+3. The best sentence of every chunk is kept so each cited source stays in the prompt;
+   further sentences are kept best-first until COMPRESSION_KEEP_RATIO of the text
+4. Kept sentences are re-emitted in their original order under the chunk's marker;
+   chunks shorter than COMPRESSION_MIN_CHUNK_CHARS are left whole
+
+Configuration (environment):
+- CONTEXT_COMPRESSION_ENABLED: "False" passes context through unchanged (default: True)
+- COMPRESSION_KEEP_RATIO: share of sentence characters to keep (default: 0.5)
+- COMPRESSION_MIN_CHUNK_CHARS: chunks shorter than this are not compressed (default: 400)
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .binary_index import tokenize
+from .log import SAMPLED, get_logger
+from .prompt_packing import CHUNK_SEPARATOR
+from .tokens import estimate_tokens
+
+log = get_logger('context_compression')
+
+_MARKER = re.compile(r'^(\[Source:[^\]]*\])\s*')
+# Sentence ends, or a new "(a)" / "(1)" clause starting a line or following a colon/semicolon
+_BOUNDARY = re.compile(r'(?<=[.;:])\s+(?=[A-Z(\d"])|\n+(?=\s*\()')
+_ABBREVIATIONS = {'sec.', 'no.', 'i.e.', 'e.g.', 'viz.', 'cl.', 'art.', 'rs.', 'ss.', 's.'}
+# "(a) ...", "1. ...", "- ..." - an item of a list introduced by a line ending in ':'
+_LIST_ITEM = re.compile(r'^(?:\(\w{1,4}\)|\d{1,2}[.)]|[-•*])(?:\s|$)')
+_LIST_NUMBER = re.compile(r'\d{1,2}\.')
+
+STEM_LENGTH = 6
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split statute text into sentences/clauses, not breaking after common abbreviations
+
+    A list stays with the line introducing it ("the tenant can:" plus its items), so
+    compression keeps or drops the enumeration as a whole.
+    """
+    pieces = [piece.strip() for piece in _BOUNDARY.split(text) if piece and piece.strip()]
+    sentences: List[str] = []
+    in_list = False
+    for piece in pieces:
+        last_word = sentences[-1].rsplit(None, 1)[-1].lower() if sentences else ''
+        if last_word in _ABBREVIATIONS or _LIST_NUMBER.fullmatch(last_word):
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        elif sentences and (in_list or sentences[-1].endswith(':')) and _LIST_ITEM.match(piece):
+            sentences[-1] = f"{sentences[-1]}\n{piece}"
+            in_list = True
+        else:
+            sentences.append(piece)
+            in_list = False
+    return sentences
+
+
+def _stems(text: str) -> List[str]:
+    # Prefix stemming is enough to match "dishonour"/"dishonoured", "punish"/"punishment"
+    return [token[:STEM_LENGTH] for token in tokenize(text)]
+
+
+def _vector(counts: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+    vector = {term: (1 + math.log(count)) * idf.get(term, 0.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else {}
+
+
+class ContextCompressor:
+    """Extractive, query-aware sentence selection over a retrieved context"""
+
+    def __init__(self, enabled: bool = True, keep_ratio: float = 0.5, min_chunk_chars: int = 400):
+        self.enabled = enabled
+        self.keep_ratio = keep_ratio
+        self.min_chunk_chars = min_chunk_chars
+        self._lock = threading.Lock()
+        self.stats = {'contexts': 0, 'tokens_in': 0, 'tokens_out': 0}
+
+    @classmethod
+    def from_env(cls) -> 'ContextCompressor':
+        return cls(
+            enabled=os.getenv('CONTEXT_COMPRESSION_ENABLED', 'True') == 'True',
+            keep_ratio=float(os.getenv('COMPRESSION_KEEP_RATIO', '0.5')),
+            min_chunk_chars=int(os.getenv('COMPRESSION_MIN_CHUNK_CHARS', '400')),
+        )
+
+    def compress(self, query: str, context: str) -> Tuple[str, Dict]:
+        """
+        Compress a retrieved context against a query
+
+        Args:
+            query: User's legal question
+            context: Retrieved chunks joined with CHUNK_SEPARATOR
+
+        Returns:
+            Tuple of (compressed_context, report) where report has 'tokens_in',
+            'tokens_out', 'ratio' (out/in) and 'sentences_in'/'sentences_out'
+        """
+        tokens_in = estimate_tokens(context)
+        if not self.enabled or not context:
+            return context, {'tokens_in': tokens_in, 'tokens_out': tokens_in, 'ratio': 1.0}
+
+        chunks = []
+        for chunk in context.split(CHUNK_SEPARATOR):
+            match = _MARKER.match(chunk)
+            marker, body = (match.group(1), chunk[match.end():]) if match else ('', chunk)
+            sentences = split_sentences(body) if len(body) >= self.min_chunk_chars else [body]
+            chunks.append((marker, sentences))
+
+        # Sentence-level IDF over this context only
+        sentence_stems = [[Counter(_stems(sentence)) for sentence in sentences] for _, sentences in chunks]
+        all_counts = [counts for per_chunk in sentence_stems for counts in per_chunk]
+        df = Counter(term for counts in all_counts for term in counts)
+        n = len(all_counts)
+        idf = {term: math.log(1 + n / count) for term, count in df.items()}
+        query_vector = _vector(Counter(_stems(query)), idf)
+
+        # (score, chunk index, sentence index) for every compressible sentence
+        scored = []
+        keep = set()
+        total_chars = 0
+        for c, ((_, sentences), per_chunk) in enumerate(zip(chunks, sentence_stems)):
+            if len(sentences) == 1:
+                keep.add((c, 0))
+                continue
+            scores = []
+            for s, counts in enumerate(per_chunk):
+                vector = _vector(counts, idf)
+                score = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+                scores.append((score, c, s))
+                total_chars += len(sentences[s])
+            best = max(scores)
+            keep.add((best[1], best[2]))
+            scored.extend(scores)
+
+        # Add sentences best-first until the kept share of compressible text reaches the ratio
+        kept_chars = sum(len(chunks[c][1][s]) for c, s in keep if len(chunks[c][1]) > 1)
+        for score, c, s in sorted(scored, reverse=True):
+            if kept_chars >= total_chars * self.keep_ratio or score <= 0:
+                break
+            if (c, s) not in keep:
+                keep.add((c, s))
+                kept_chars += len(chunks[c][1][s])
+
+        out_chunks = []
+        for c, (marker, sentences) in enumerate(chunks):
+            body = ' '.join(sentence for s, sentence in enumerate(sentences) if (c, s) in keep)
+            out_chunks.append(f"{marker}\n{body}" if marker else body)
+        compressed = CHUNK_SEPARATOR.join(out_chunks)
+
+        tokens_out = estimate_tokens(compressed)
+        report = {
+            'tokens_in': tokens_in,
+            'tokens_out': tokens_out,
+            'ratio': round(tokens_out / tokens_in, 3) if tokens_in else 1.0,
+            'sentences_in': n,
+            'sentences_out': len(keep),
+        }
+        with self._lock:
+            self.stats['contexts'] += 1
+            self.stats['tokens_in'] += tokens_in
+            self.stats['tokens_out'] += tokens_out
+
+        log.info(f"CONTEXT COMPRESSION: {len(keep)}/{n} sentence(s), "
+                 f"~{tokens_in} → ~{tokens_out} tokens (ratio {report['ratio']:.2f})", extra=SAMPLED)
+        return compressed, report
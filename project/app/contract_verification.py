@@ -0,0 +1,203 @@
+"""
+Nyaya-Sahayak Contract Verification
+Purpose: Cross-verify a contract file against the legal database (shared by /api/verify-contract/
+and the offline batch command)
+
+How it works:
+1. The file is uploaded to Gemini and the strong model extracts the contract type, parties
+   and clauses as JSON
+2. Each clause runs through process_legal_query with clause-specific expansion hints, and a
+   routed model compares the clause with the retrieved provisions (fast model for short
+   clauses, escalated when the answer is not valid JSON)
+3. Clause verdicts roll up into issues, risks and an overall compliance status
+"""
+
+import json
+import os
+import textwrap
+from typing import Dict
+
+from .metrics import span
+from .query_expansion import clause_hints
+from .startup import LazyModule
+
+# Imported on first use (see startup.py)
+genai = LazyModule('google.generativeai')
+
+EXTRACTION_PROMPT = textwrap.dedent("""
+    Extract all key clauses from this legal contract/agreement.
+    For each clause, identify:
+    1. Clause title/heading
+    2. Full text of the clause
+    3. Any monetary amounts, dates, or critical terms
+
+    Format as JSON:
+    {
+        "contract_type": "Type of contract",
+        "parties": ["Party 1", "Party 2"],
+        "clauses": [
+            {
+                "title": "Clause title",
+                "text": "Full clause text",
+                "critical_terms": ["term1", "term2"]
+            }
+        ]
+    }
+
+    Output ONLY valid JSON.
+    """)
+
+COMPARISON_PROMPT = textwrap.dedent("""
+    You are a contract verification specialist. Compare this contract clause against legal provisions.
+
+    CONTRACT CLAUSE:
+    {clause_text}
+
+    LEGAL PROVISIONS FROM DATABASE:
+    {provisions}
+
+    Identify:
+    1. Any conflicts between the clause and legal requirements
+    2. Missing mandatory provisions
+    3. Potential legal risks
+    4. Compliance status (COMPLIANT / NON-COMPLIANT / UNCLEAR)
+
+    Respond in JSON:
+    {{
+        "compliance": "COMPLIANT or NON-COMPLIANT or UNCLEAR",
+        "issues": ["issue1", "issue2"],
+        "risks": ["risk1", "risk2"],
+        "recommendation": "Brief recommendation"
+    }}
+    """)
+
+
+def strip_json_fences(text):
+    """Remove markdown code fences Gemini wraps around JSON output"""
+    return text.replace('```json', '').replace('```', '').strip()
+
+
+def is_json(text):
+    """Check whether a model answer parses as JSON (used to escalate fast-model output)"""
+    try:
+        json.loads(strip_json_fences(text))
+        return True
+    except ValueError:
+        return False
+
+
+def verify_contract_file(path: str, rag=None) -> Dict:
+    """
+    Extract a contract's clauses and check each against the legal database
+
+    Args:
+        path: Local PDF/DOCX file
+        rag: LegalRAGEngine (default: the process-wide engine)
+
+    Returns:
+        Contract type, parties, overall compliance, discrepancies, risks and per-clause analysis
+
+    Raises:
+        ValueError: When GOOGLE_API_KEY is not set
+    """
+    # Configure Google AI with API key
+    api_key = os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
+    genai.configure(api_key=api_key)
+
+    if rag is None:
+        from .rag_engine import get_rag_engine
+        rag = get_rag_engine()
+
+    # Use the strong model to extract contract text
+    model = rag.get_model(rag.router.strong_model)
+
+    # Upload file to Gemini for text extraction
+    with span('gemini_upload'):
+        uploaded_file_obj = genai.upload_file(path)
+
+    extraction_response = rag.generate_content(model, [uploaded_file_obj, EXTRACTION_PROMPT],
+                                               op='gemini_extraction')
+
+    # Parse extracted data
+    contract_text = strip_json_fences(extraction_response.text)
+    try:
+        contract_data = json.loads(contract_text)
+    except ValueError:
+        contract_data = None
+    if not isinstance(contract_data, dict):
+        contract_data = {"raw_text": contract_text}
+
+    # Cross-verify each clause against legal database
+    discrepancies = []
+    risks = []
+    compliance_status = []
+
+    for clause in contract_data.get('clauses', []):
+        clause_text = clause.get('text', '')
+        clause_title = clause.get('title', 'Unnamed Clause')
+
+        # Query RAG for relevant legal provisions
+        verification_query = f"What are the legal requirements and restrictions for: {clause_text[:500]}"
+        rag_result = rag.process_legal_query(verification_query,
+                                             expansion_hints=clause_hints(clause))
+
+        # Short clauses go to the fast model; unparseable output is escalated
+        decision = rag.router.route(clause_text, task='clause_comparison')
+        comparison_response = rag.generate_routed(
+            decision,
+            COMPARISON_PROMPT.format(clause_text=clause_text, provisions=rag_result['response']),
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.2,
+                max_output_tokens=1024,
+            ),
+            op='gemini_comparison',
+            needs_escalation=lambda text: not is_json(text)
+        )
+
+        # Parse comparison result
+        comparison_text = strip_json_fences(comparison_response.text)
+        try:
+            comparison = json.loads(comparison_text)
+
+            if comparison.get('issues'):
+                discrepancies.append({
+                    'clause': clause_title,
+                    'issues': comparison['issues']
+                })
+
+            if comparison.get('risks'):
+                risks.extend([{
+                    'clause': clause_title,
+                    'risk': risk
+                } for risk in comparison['risks']])
+
+            compliance_status.append({
+                'clause': clause_title,
+                'status': comparison.get('compliance', 'UNCLEAR'),
+                'recommendation': comparison.get('recommendation', '')
+            })
+        except (ValueError, AttributeError, TypeError):
+            # Skip if parsing fails or the verdict has the wrong shape
+            pass
+
+    # Overall compliance assessment
+    overall_compliance = "COMPLIANT"
+    if any(c['status'] == 'NON-COMPLIANT' for c in compliance_status):
+        overall_compliance = "NON-COMPLIANT"
+    elif any(c['status'] == 'UNCLEAR' for c in compliance_status):
+        overall_compliance = "NEEDS REVIEW"
+
+    return {
+        'contract_type': contract_data.get('contract_type', 'Unknown'),
+        'parties': contract_data.get('parties', []),
+        'overall_compliance': overall_compliance,
+        'discrepancies': discrepancies,
+        'risks': risks,
+        'clause_analysis': compliance_status,
+        'total_clauses_analyzed': len(contract_data.get('clauses', [])),
+        'issues_found': len(discrepancies),
+        'risks_identified': len(risks)
+    }
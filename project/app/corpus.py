@@ -0,0 +1,522 @@
+"""
+Nyaya-Sahayak Bare Act Corpus
+Purpose: Section-level chunks of the Bare Acts with page offsets, served from a memory-mapped index
+
+Pipeline (see `manage.py ingest_bare_acts`):
+1. Each PDF's pages are extracted with PyPDF2 and joined, remembering where every page starts
+2. Section headings ("420. Cheating and dishonestly inducing delivery of property.—")
+   split the text into sections; long sections are split again at sub-sections "(1)", "(2)"
+3. Every chunk carries act name, section, sub-section and the page range it spans
+4. Each source file becomes one segment (segments/<digest>.json); manifest.json maps every
+   file (by its path relative to the ingested directory, so same-named PDFs in different
+   folders stay apart) to its SHA-256 digest and segment and carries the corpus version
+5. Re-ingesting only re-chunks files whose digest changed (or new files)
+6. Publishing groups chunks by Act into per-Act shards, each a binary index (see
+   binary_index.py) that workers open with mmap - no per-worker rebuild, one shared
+   copy in the page cache. Shard files are named by their source digests, so an Act
+   whose files did not change keeps its existing shard
+
+Live updates:
+- CorpusWatcher polls the manifest; on a new version it maps the new index file and hands
+  the engine the new corpus plus the Acts that changed, so only cache entries citing
+  those Acts are invalidated. The engine publishes it with set_corpus(), so get_corpus()
+  never hands out a stale version
+- With DATA_STORE_ID (Vertex AI Search) retrieval does not read the corpus, so no
+  watcher runs; the version loaded at startup only fills in page numbers
+
+Retrieval:
+- Without DATA_STORE_ID the RAG engine searches the corpus (BM25 + embedding re-rank),
+  only in the shards the shard router predicts (see shard_router.py), in parallel.
+  Every shard scores with corpus-wide document frequencies and length, so hits from
+  different shards are ranked on one scale
+- With Vertex AI Search, results lacking page_number are located in the corpus by text:
+  the passage's rarest word picks candidate chunks from the postings, so only those
+  are decoded and compared
+
+Configuration (environment):
+- CORPUS_DIR: directory holding corpus artifacts (default: app/data/corpus)
+- CORPUS_MAX_CHUNK_CHARS: sections longer than this are split at sub-sections (default: 1500)
+- CORPUS_RELOAD_INTERVAL: seconds between manifest checks, 0 disables; ignored with DATA_STORE_ID (default: 30)
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import heapq
+import threading
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .binary_index import BinaryIndex, build_index, tokenize
+from .concurrency import submit
+from .log import get_logger
+
+log = get_logger('corpus')
+
+CORPUS_FORMAT = 4
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'data', 'corpus')
+MANIFEST_NAME = 'manifest.json'
+SEGMENTS_DIR = 'segments'
+SHARDS_DIR = 'shards'
+
+# "420. Cheating and dishonestly inducing delivery of property.—Whoever ..."
+# "[138. Dishonour of cheque for insufficiency, etc., of funds in the account.- Where ..."
+SECTION_HEADING = re.compile(
+    r'^[ \t]*\[?(\d{1,3}[A-Z]{0,3})\.\s+([A-Z][^\n]{2,250}?)\.?\s*[—–\-]+\s*',
+    re.MULTILINE
+)
+# "(1)" opens a sub-section after whitespace or straight after the heading dash ("—(1) Every ...")
+SUBSECTION_START = re.compile(r'(?:^|[\s—–\-])\((\d{1,2}[A-Z]?)\)\s', re.MULTILINE)
+# Case-sensitive, so "... the provisions of this Act, 2019" in running text is not a title
+ACT_TITLE = re.compile(
+    r'\b(?:THE\s+|The\s+)?([A-Z][A-Za-z\s,()]{3,120}?'
+    r'(?:ACT|Act|CODE|Code|SANHITA|Sanhita|ADHINIYAM|Adhiniyam),?\s*\d{4})'
+)
+# Footnotes look like headings ("1. Subs. by Act 5 of 2019, s. 2.—") and are skipped
+FOOTNOTE_PREFIXES = ('subs', 'ins', 'omitted', 'rep', 'added', 'the words', 'renumbered')
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+
+def _normalize_text(text: str) -> str:
+    return ' '.join(_HTML_TAG.sub(' ', text).lower().split())
+
+
+def detect_act_name(first_pages: str, path: str) -> str:
+    """Act title from the first pages ("The Indian Penal Code, 1860"), else from the filename"""
+    match = ACT_TITLE.search(first_pages[:3000])
+    if match:
+        name = ' '.join(match.group(1).split())
+        return name.title().replace(' Of ', ' of ').replace(' And ', ' and ')
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.replace('_', ' ').replace('-', ' ').title()
+
+
+def _page_label(page_starts: List[int], start: int, end: int) -> Tuple[int, int]:
+    """1-based first and last page of a character span"""
+    first = bisect_right(page_starts, start)
+    last = bisect_right(page_starts, max(start, end - 1))
+    return first, last
+
+
+def _split_long(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """Split a span at sentence ends into pieces of at most max_chars (relative offsets)"""
+    pieces = []
+    start = 0
+    while len(text) - start > max_chars:
+        cut = text.rfind('. ', start, start + max_chars)
+        cut = cut + 1 if cut > start else start + max_chars
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, len(text)))
+    return pieces
+
+
+def chunk_act_text(pages: List[str], act: str, source: str, max_chars: int = 1500) -> List[Dict]:
+    """
+    Split an Act's page texts into section / sub-section chunks
+
+    Args:
+        pages: Text of each PDF page, in order
+        act: Act name stored on every chunk
+        source: Source file (corpus key) stored on every chunk
+        max_chars: Sections longer than this are split at sub-sections
+
+    Returns:
+        List of chunk dicts with 'id', 'act', 'section', 'subsection', 'title',
+        'text', 'page_start', 'page_end' and 'source'
+    """
+    page_starts = []
+    text = ''
+    for page in pages:
+        page_starts.append(len(text))
+        text += (page or '') + '\n'
+
+    headings = [
+        match for match in SECTION_HEADING.finditer(text)
+        if not match.group(2).lower().startswith(FOOTNOTE_PREFIXES)
+    ]
+
+    chunks = []
+    for index, heading in enumerate(headings):
+        section = heading.group(1)
+        title = ' '.join(heading.group(2).split()).rstrip('.')
+        start = heading.start()
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+        body = text[start:end]
+
+        spans = [(None, 0, len(body))]
+        if len(body) > max_chars:
+            starts = [(m.group(1), m.start(1) - 1) for m in SUBSECTION_START.finditer(body)]
+            if starts:
+                spans = [(None, 0, starts[0][1])] if starts[0][1] > 0 else []
+                for i, (number, sub_start) in enumerate(starts):
+                    sub_end = starts[i + 1][1] if i + 1 < len(starts) else len(body)
+                    spans.append((number, sub_start, sub_end))
+
+        for subsection, span_start, span_end in spans:
+            for piece_start, piece_end in _split_long(body[span_start:span_end], max_chars):
+                raw = body[span_start + piece_start:span_start + piece_end]
+                chunk_text = ' '.join(raw.split())
+                if not chunk_text:
+                    continue
+                # Page range of the visible text, not the surrounding whitespace
+                offset = start + span_start + piece_start
+                page_start, page_end = _page_label(
+                    page_starts,
+                    offset + len(raw) - len(raw.lstrip()),
+                    offset + len(raw.rstrip())
+                )
+                chunks.append({
+                    'id': f"{act}::{section}::{subsection or ''}::{len(chunks)}",
+                    'act': act,
+                    'section': section,
+                    'subsection': subsection,
+                    'title': title,
+                    'text': chunk_text if subsection is None else f"{section}. {title} — {chunk_text}",
+                    'page_start': page_start,
+                    'page_end': page_end,
+                    'source': source,
+                })
+    return chunks
+
+
+def parse_act_pdf(path: str, max_chars: int = 1500, source: Optional[str] = None) -> Dict:
+    """
+    Parse one Bare Act PDF into chunks (top-level so it can run in a worker process)
+
+    Args:
+        path: PDF file
+        max_chars: Longest chunk before it is split at sentence ends
+        source: Corpus key of the file (path relative to the ingested directory);
+                default: the file name
+
+    Returns:
+        Dict with 'source', 'act', 'pages' and 'chunks'
+    """
+    import PyPDF2
+
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        pages = [page.extract_text() or '' for page in reader.pages]
+
+    act = detect_act_name('\n'.join(pages[:2]), path)
+    source = source or os.path.basename(path)
+    return {
+        'source': source,
+        'act': act,
+        'pages': len(pages),
+        'chunks': chunk_act_text(pages, act, source, max_chars=max_chars),
+    }
+
+
+def page_label(chunk: Dict) -> str:
+    if chunk['page_start'] == chunk['page_end']:
+        return str(chunk['page_start'])
+    return f"{chunk['page_start']}-{chunk['page_end']}"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: str, data: Dict) -> None:
+    """Write then rename, so readers never see a half-written file"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def read_manifest(corpus_dir: str) -> Optional[Dict]:
+    """The corpus manifest, or None if nothing was ingested yet"""
+    path = os.path.join(corpus_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != CORPUS_FORMAT:
+        raise ValueError(f"Unsupported corpus format {manifest.get('format')} in {path}")
+    return manifest
+
+
+def write_segment(corpus_dir: str, parsed: Dict, digest: str) -> str:
+    """
+    Write one parsed file as a segment
+
+    Returns:
+        Segment path relative to the corpus directory
+    """
+    segment = os.path.join(SEGMENTS_DIR, f"{digest[:24]}.json")
+    os.makedirs(os.path.join(corpus_dir, SEGMENTS_DIR), exist_ok=True)
+    _write_json_atomic(os.path.join(corpus_dir, segment), {'chunks': parsed['chunks']})
+    return segment
+
+
+def _shard_file(act: str, digests: List[str]) -> str:
+    """Shard path named by its Act and source digests, so unchanged Acts map to existing files"""
+    slug = re.sub(r'[^a-z0-9]+', '-', act.lower()).strip('-')[:60]
+    key = hashlib.sha256(''.join(sorted(digests)).encode('ascii')).hexdigest()[:16]
+    return os.path.join(SHARDS_DIR, f"{slug}-{key}.bin")
+
+
+def publish_corpus(corpus_dir: str, files: Dict[str, Dict]) -> Dict:
+    """
+    Build per-Act shard indexes for Acts whose files changed, publish a new manifest
+    version and delete segments / shards the new version no longer references
+
+    Args:
+        files: source (file path relative to the ingested directory) → {'digest', 'segment', 'act', 'pages', 'chunks'}
+    """
+    version = time.strftime('%Y%m%d%H%M%S') + f"{int(time.time() * 1000) % 1000:03d}"
+    by_act: Dict[str, List[str]] = {}
+    for source in sorted(files):
+        by_act.setdefault(files[source]['act'], []).append(source)
+
+    os.makedirs(os.path.join(corpus_dir, SHARDS_DIR), exist_ok=True)
+    shards = {}
+    for act, sources in by_act.items():
+        shard = _shard_file(act, [files[source]['digest'] for source in sources])
+        shards[act] = shard
+        if os.path.exists(os.path.join(corpus_dir, shard)):
+            continue
+        chunks = []
+        for source in sources:
+            with open(os.path.join(corpus_dir, files[source]['segment']), 'r', encoding='utf-8') as f:
+                chunks.extend(json.load(f)['chunks'])
+        build_index(chunks, os.path.join(corpus_dir, shard), version=version)
+
+    manifest = {
+        'format': CORPUS_FORMAT,
+        'version': version,
+        'shards': shards,
+        'files': files,
+    }
+    _write_json_atomic(os.path.join(corpus_dir, MANIFEST_NAME), manifest)
+
+    # Workers still mapping an old shard keep their pages until they reload (POSIX unlink)
+    for directory, referenced in (
+        (SHARDS_DIR, {os.path.basename(shard) for shard in shards.values()}),
+        (SEGMENTS_DIR, {os.path.basename(entry['segment']) for entry in files.values()}),
+    ):
+        path = os.path.join(corpus_dir, directory)
+        for name in os.listdir(path) if os.path.isdir(path) else []:
+            if name.endswith(('.bin', '.json')) and name not in referenced:
+                os.remove(os.path.join(path, name))
+    return manifest
+
+
+class Corpus:
+    """One corpus version: its manifest plus a memory-mapped index per Act shard"""
+
+    def __init__(self, manifest: Dict, shards: Dict[str, BinaryIndex], path: str = ''):
+        self.path = path
+        self.version = manifest.get('version')
+        self.files: Dict[str, Dict] = manifest.get('files', {})
+        self.shard_paths: Dict[str, str] = manifest.get('shards', {})
+        self.shards = shards
+        self.doc_count = sum(index.doc_count for index in shards.values())
+
+    @classmethod
+    def load(cls, corpus_dir: str, previous: Optional['Corpus'] = None) -> Optional['Corpus']:
+        """
+        Open the current corpus version (O(1) per shard: indexes are mapped, not read)
+
+        Args:
+            corpus_dir: Corpus artifact directory
+            previous: Open older version whose unchanged shards are reused
+
+        Returns:
+            The corpus, or None if nothing was ingested yet
+        """
+        manifest = read_manifest(corpus_dir)
+        if manifest is None:
+            return None
+        shards = {}
+        for act, shard in manifest['shards'].items():
+            if previous is not None and previous.shard_paths.get(act) == shard:
+                shards[act] = previous.shards[act]
+            else:
+                shards[act] = BinaryIndex.open(os.path.join(corpus_dir, shard))
+        return cls(manifest, shards, os.path.join(corpus_dir, MANIFEST_NAME))
+
+    @property
+    def shard_names(self) -> List[str]:
+        return list(self.shards)
+
+    def changed_tags(self, previous: Optional['Corpus']) -> Set[str]:
+        """
+        Cache tags (lowercase Act and file names) of files added, changed or removed since previous
+        (sources are relative paths; the tag is the file name, as search backends report it)
+        """
+        old_files = previous.files if previous is not None else {}
+        tags = set()
+        for source in set(old_files) | set(self.files):
+            old, new = old_files.get(source), self.files.get(source)
+            if old is None or new is None or old['digest'] != new['digest']:
+                tags.add(os.path.basename(source).lower())
+                for entry in (old, new):
+                    if entry is not None:
+                        tags.add(entry['act'].lower())
+        return tags
+
+    def search(self, query: str, top_k: int = 3,
+               shards: Optional[List[str]] = None) -> List[Tuple[Dict, float]]:
+        """
+        Search the given shards (default: all) in parallel and merge by relevance
+
+        Returns:
+            List of (chunk, relevance) best first
+        """
+        indexes = [self.shards[name] for name in (shards or self.shard_names) if name in self.shards]
+        if not indexes:
+            return []
+        # Shard-local idf would make a rare term in a small Act outrank the same match elsewhere
+        collection = self.collection_stats(query)
+        if len(indexes) == 1:
+            return indexes[0].search(query, top_k=top_k, collection=collection)
+
+        futures = [submit(index.search, query, top_k, collection=collection, pool='shards')
+                   for index in indexes]
+        hits = [hit for future in futures for hit in future.result()]
+        return heapq.nlargest(top_k, hits, key=lambda hit: hit[1])
+
+    def collection_stats(self, query: str) -> Dict:
+        """Corpus-wide BM25 statistics (doc count, average length, df of the query terms)"""
+        df = {}
+        for term in set(tokenize(query)):
+            entries = [index.lookup(term) for index in self.shards.values()]
+            df[term] = sum(entry[0] for entry in entries if entry is not None)
+        total_length = sum(index.avg_length * index.doc_count for index in self.shards.values())
+        return {
+            'doc_count': self.doc_count,
+            'avg_length': total_length / max(self.doc_count, 1),
+            'df': df,
+        }
+
+    def locate(self, filename: str, text: str) -> Optional[Dict]:
+        """
+        Find the chunk a retrieved passage came from (for results without page numbers)
+
+        Args:
+            filename: Document name reported by the search backend
+            text: Retrieved passage (snippet HTML is ignored)
+        """
+        needle = _normalize_text(text)[:120]
+        if len(needle) < 20:
+            return None
+        # The snippet may start and end mid-word; only its inner words are certain to be indexed
+        terms = set(tokenize(needle)[1:-1])
+        name = filename.lower()
+        matching = [act for act in self.shards if act.lower() in name or name in act.lower()]
+        for act in matching or self.shard_names:
+            index = self.shards[act]
+            for doc_id in self._locate_candidates(index, terms):
+                chunk = index.doc(doc_id)
+                if needle in _normalize_text(chunk['text']):
+                    return chunk
+        return None
+
+    @staticmethod
+    def _locate_candidates(index: BinaryIndex, terms: Set[str]) -> List[int]:
+        """Chunks containing the passage's rarest word (every chunk if it has no usable word)"""
+        if not terms:
+            return list(range(index.doc_count))
+        rarest = None
+        for term in terms:
+            entry = index.lookup(term)
+            if entry is None:
+                return []  # a word this shard never saw: the passage is not from it
+            if rarest is None or entry[0] < rarest[0]:
+                rarest = (entry[0], term)
+        return [doc_id for doc_id, _ in index.postings(rarest[1])]
+
+
+class CorpusWatcher:
+    """
+    Background thread that picks up new corpus versions without a restart
+
+    Args:
+        corpus_dir: Corpus artifact directory
+        current: Corpus already loaded (or None)
+        on_reload: Called with (new corpus, changed cache tags) once the new version is open
+        interval: Seconds between manifest checks
+    """
+
+    def __init__(self, corpus_dir: str, current: Optional[Corpus],
+                 on_reload: Callable[[Corpus, Set[str]], None], interval: float = 30.0):
+        self.corpus_dir = corpus_dir
+        self.current = current
+        self.on_reload = on_reload
+        self.interval = interval
+        self._manifest_mtime = self._mtime()
+        self._thread = None
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.corpus_dir, MANIFEST_NAME)).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='corpus-watcher', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                log.warning(f"Corpus reload failed: {str(e)}")
+
+    def check(self) -> bool:
+        """Load and publish a new corpus version if the manifest changed; True if reloaded"""
+        mtime = self._mtime()
+        if mtime is None or mtime == self._manifest_mtime:
+            return False
+        self._manifest_mtime = mtime
+
+        corpus = Corpus.load(self.corpus_dir, previous=self.current)
+        if corpus is None or (self.current is not None and corpus.version == self.current.version):
+            return False
+        changed = corpus.changed_tags(self.current)
+        self.current = corpus
+        log.info(f"Corpus reloaded: version {corpus.version}, {corpus.doc_count} chunks, "
+                 f"changed: {', '.join(sorted(changed)) or 'none'}")
+        self.on_reload(corpus, changed)
+        return True
+
+
+# Global instance (loaded once at startup)
+_corpus = None
+_corpus_loaded = False
+
+def get_corpus() -> Optional[Corpus]:
+    """Get the ingested corpus (None when `manage.py ingest_bare_acts` has not been run)"""
+    global _corpus, _corpus_loaded
+    if not _corpus_loaded:
+        corpus_dir = os.getenv('CORPUS_DIR', DEFAULT_CORPUS_DIR)
+        try:
+            _corpus = Corpus.load(corpus_dir)
+            if _corpus is not None:
+                log.info(f"Corpus loaded: {_corpus.doc_count} chunks (version {_corpus.version})")
+        except (OSError, ValueError) as e:
+            log.warning(f"Corpus unavailable ({corpus_dir}): {str(e)}")
+            _corpus = None
+        _corpus_loaded = True
+    return _corpus
+
+
+def set_corpus(corpus: Optional[Corpus]) -> None:
+    """Publish a reloaded corpus version as the process-wide corpus"""
+    global _corpus, _corpus_loaded
+    _corpus = corpus
+    _corpus_loaded = True
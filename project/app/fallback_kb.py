@@ -0,0 +1,200 @@
+"""
+Nyaya-Sahayak Fallback Knowledge Base
+Purpose: Topic context for queries when Vertex AI Search is not configured
+
+How it works:
+1. Topics (keywords, context text, sources) live in a JSON table loaded once at startup
+2. Every keyword of every topic is compiled into one Aho-Corasick automaton, so a
+   query is scanned once regardless of how many topics exist
+3. Keywords match at the start of a word ("rent" matches "rental", not "parent")
+4. Each topic scores the weights of its distinct matched keywords; the best topic
+   and close runners-up (multi-topic queries) are combined into one context
+
+Topic file format:
+    {
+        "version": 1,
+        "topics": [
+            {
+                "id": "cheque_dishonour",
+                "title": "Cheque Bounce",
+                "keywords": ["cheque", {"term": "bounce", "weight": 2}],
+                "priority": 1.0,                 # optional score multiplier
+                "context": "...",
+                "sources": [{"filename": ..., "page": ..., "relevance_score": 0.9}]
+            }
+        ]
+    }
+A keyword's default weight is its word count, so phrases outrank single words.
+
+Configuration (environment):
+- FALLBACK_TOPICS_PATH: path to the topic table (default: app/data/fallback_topics.json)
+- FALLBACK_MAX_TOPICS: maximum topics combined into one context (default: 2)
+- FALLBACK_MIN_RELATIVE_SCORE: runner-up topics need this fraction of the best score (default: 0.5)
+"""
+
+import os
+import json
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger('fallback_kb')
+
+DEFAULT_TOPICS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'fallback_topics.json')
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every occurrence of every pattern
+
+    Args:
+        patterns: Lowercase patterns; a match reports the pattern's index in this list
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append(index)
+
+        # Breadth-first failure links; outputs inherit from the failure target
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Scan text for all patterns
+
+        Returns:
+            List of (pattern index, start offset) for every occurrence
+        """
+        matches = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._out[node]:
+                matches.append((index, position - len(self.patterns[index]) + 1))
+        return matches
+
+
+class FallbackKnowledgeBase:
+    """Topic table plus a compiled keyword automaton over all topics"""
+
+    def __init__(self, topics: List[Dict], max_topics: int = 2, min_relative_score: float = 0.5):
+        self.topics = topics
+        self.max_topics = max_topics
+        self.min_relative_score = min_relative_score
+
+        # keyword → [(topic index, weight)]; duplicate keywords across topics share one pattern
+        self._keyword_topics: Dict[str, List[Tuple[int, float]]] = {}
+        for topic_index, topic in enumerate(topics):
+            for keyword in topic.get('keywords', []):
+                if isinstance(keyword, dict):
+                    term = keyword['term'].lower().strip()
+                    weight = float(keyword.get('weight', len(term.split())))
+                else:
+                    term = keyword.lower().strip()
+                    weight = float(len(term.split()))
+                if term:
+                    self._keyword_topics.setdefault(term, []).append((topic_index, weight))
+
+        self._keywords = list(self._keyword_topics)
+        self._matcher = AhoCorasick(self._keywords)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'FallbackKnowledgeBase':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get('topics', []), **kwargs)
+
+    def score_topics(self, query: str) -> List[Tuple[Dict, float, List[str]]]:
+        """
+        Score every topic that has at least one keyword in the query
+
+        Returns:
+            List of (topic, score, matched keywords), best first
+        """
+        text = query.lower()
+        matched = set()
+        for index, start in self._matcher.find(text):
+            if start == 0 or not text[start - 1].isalnum():
+                matched.add(index)
+
+        scores: Dict[int, float] = {}
+        hits: Dict[int, List[str]] = {}
+        for index in matched:
+            keyword = self._keywords[index]
+            for topic_index, weight in self._keyword_topics[keyword]:
+                scores[topic_index] = scores.get(topic_index, 0.0) + weight
+                hits.setdefault(topic_index, []).append(keyword)
+
+        weighted = {i: score * float(self.topics[i].get('priority', 1.0)) for i, score in scores.items()}
+        # Ties keep table order, so earlier topics win like the old if/elif chain
+        order = sorted(weighted, key=lambda i: (-weighted[i], i))
+        return [(self.topics[i], weighted[i], hits[i]) for i in order]
+
+    def lookup(self, query: str) -> Optional[Tuple[str, List[Dict], List[str]]]:
+        """
+        Build fallback context for a query
+
+        Returns:
+            Tuple of (context, sources, topic ids), or None when no topic matches
+        """
+        ranked = self.score_topics(query)
+        if not ranked:
+            return None
+
+        best = ranked[0][1]
+        selected = [
+            topic for topic, score, _ in ranked[:self.max_topics]
+            if score >= best * self.min_relative_score
+        ]
+
+        context = "\n\n".join(topic['context'] for topic in selected)
+        sources = [dict(source) for topic in selected for source in topic.get('sources', [])]
+        return context, sources, [topic['id'] for topic in selected]
+
+
+# Global instance (loaded once at startup)
+_fallback_kb = None
+
+def get_fallback_kb() -> FallbackKnowledgeBase:
+    """Get or load the fallback knowledge base (empty if the topic file is missing)"""
+    global _fallback_kb
+    if _fallback_kb is None:
+        path = os.getenv('FALLBACK_TOPICS_PATH', DEFAULT_TOPICS_PATH)
+        options = {
+            'max_topics': int(os.getenv('FALLBACK_MAX_TOPICS', '2')),
+            'min_relative_score': float(os.getenv('FALLBACK_MIN_RELATIVE_SCORE', '0.5')),
+        }
+        try:
+            _fallback_kb = FallbackKnowledgeBase.load(path, **options)
+            log.info(f"Fallback knowledge base loaded: {len(_fallback_kb.topics)} topics from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Fallback knowledge base unavailable ({path}): {str(e)}")
+            _fallback_kb = FallbackKnowledgeBase([], **options)
+    return _fallback_kb
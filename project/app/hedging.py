@@ -0,0 +1,190 @@
+"""
+Nyaya-Sahayak Request Hedging
+Purpose: Cut tail latency of Vertex AI Search and short Gemini generations
+
+How it works:
+1. Every upstream call is timed; a rolling window per operation gives its p95
+2. With hedging enabled, if the first attempt has not answered by the observed p95,
+   an identical duplicate is sent
+3. The first successful attempt wins; the loser is cancelled (or, if already
+   running on a worker thread, its result is discarded)
+4. A global budget caps duplicates to a fraction of all calls (default 5%),
+   so hedging cannot amplify an overload
+
+Configuration (environment):
+- HEDGING_ENABLED: "True" to enable (default: False)
+- HEDGING_BUDGET_RATIO: max extra calls as a fraction of calls (default: 0.05)
+- HEDGING_PERCENTILE: latency percentile that triggers the duplicate (default: 0.95)
+- HEDGING_MIN_SAMPLES: observations needed before hedging an operation (default: 20)
+- HEDGE_MAX_OUTPUT_TOKENS: generations above this size are never hedged (default: 1024)
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FuturesTimeout, wait
+from typing import Callable, Dict, Optional
+
+from .concurrency import submit
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies for one upstream operation"""
+
+    def __init__(self, window: int = 500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0-1) of the window, or None if empty"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+    def mean(self) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            return sum(self._samples) / len(self._samples)
+
+
+class HedgingBudget:
+    """
+    Token bucket limiting hedged attempts to a fraction of primary calls
+
+    Each primary call deposits `ratio` tokens (capped at `burst`);
+    each hedge spends one token.
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    """Issues hedged upstream calls and keeps per-operation latency statistics"""
+
+    def __init__(self, enabled: bool = False, budget_ratio: float = 0.05,
+                 percentile: float = 0.95, min_samples: int = 20):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = HedgingBudget(ratio=budget_ratio)
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._trackers_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'hedges_sent': 0,
+            'hedge_wins': 0,
+            'budget_denied': 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> 'Hedger':
+        return cls(
+            enabled=os.getenv('HEDGING_ENABLED', 'False') == 'True',
+            budget_ratio=float(os.getenv('HEDGING_BUDGET_RATIO', '0.05')),
+            percentile=float(os.getenv('HEDGING_PERCENTILE', '0.95')),
+            min_samples=int(os.getenv('HEDGING_MIN_SAMPLES', '20')),
+        )
+
+    def tracker(self, op: str) -> LatencyTracker:
+        """Get the latency tracker for an operation (created on first use)"""
+        tracker = self._trackers.get(op)
+        if tracker is None:
+            with self._trackers_lock:
+                tracker = self._trackers.setdefault(op, LatencyTracker())
+        return tracker
+
+    def latency_percentiles(self, quantiles=(0.5, 0.95)) -> Dict[str, Dict[float, Optional[float]]]:
+        """Rolling latency percentiles for every tracked operation"""
+        with self._trackers_lock:
+            trackers = dict(self._trackers)
+        return {op: {q: tracker.percentile(q) for q in quantiles} for op, tracker in sorted(trackers.items())}
+
+    def _bump(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def timed(self, op: str, fn: Callable, *args, **kwargs):
+        """Call fn without hedging, recording its latency under op"""
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.tracker(op).observe(time.perf_counter() - start)
+        return result
+
+    def call(self, op: str, fn: Callable, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs), hedging it if it outlives the op's observed p95
+
+        Args:
+            op: Operation name used for latency tracking (e.g. 'vertex_search')
+            fn: Idempotent upstream call
+
+        Returns:
+            The result of whichever attempt finished first successfully
+        """
+        self._bump('calls')
+        self.budget.record_call()
+        tracker = self.tracker(op)
+
+        if not self.enabled or tracker.count() < self.min_samples:
+            return self.timed(op, fn, *args, **kwargs)
+
+        delay = tracker.percentile(self.percentile)
+        primary = submit(self.timed, op, fn, *args, **kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+
+        if not self.budget.try_acquire():
+            self._bump('budget_denied')
+            return primary.result()
+
+        self._bump('hedges_sent')
+        hedge = submit(self.timed, op, fn, *args, **kwargs)
+        pending = {primary, hedge}
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        self._bump('hedge_wins')
+                    return future.result()
+
+        # Both attempts failed - surface the primary's error
+        return primary.result()
+
+
+def hedge_max_output_tokens() -> int:
+    """Generations with max_output_tokens above this are never hedged"""
+    return int(os.getenv('HEDGE_MAX_OUTPUT_TOKENS', '1024'))
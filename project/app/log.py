@@ -0,0 +1,245 @@
+"""
+Nyaya-Sahayak Logging
+Purpose: Structured logs that never block the request path
+
+How it works:
+1. Components log through get_logger('component') (stdlib loggers under "nyaya.")
+2. The handler on the request thread only snapshots the record - message, level,
+   request id, endpoint, extra fields - and puts it on a bounded queue without waiting;
+   when the queue is full the record is dropped and counted instead of stalling the request
+3. One background writer thread drains the queue to stdout as JSON lines (Cloud Logging
+   picks up "severity", "message" and the trace) or as plain text for local development
+4. Each API request gets a correlation id (X-Request-ID, else the Cloud Run trace id,
+   else a fresh one); it is attached to every record logged while serving the request,
+   including from pool threads, and echoed in the X-Request-ID response header
+5. High-volume per-request messages are logged with extra=SAMPLED and kept for a fraction
+   of requests; the decision is made per request id so a sampled request keeps all its
+   lines. Warnings and errors are never sampled out
+6. Queued, dropped and sampled-out counts and the queue depth are exported on /metrics
+
+Configuration (environment):
+- LOG_LEVEL: Minimum level for app logs (default: INFO)
+- LOG_FORMAT: "json" or "text" (default: json on Cloud Run, text elsewhere)
+- LOG_SAMPLE_RATE: Fraction of requests whose high-volume messages are kept (default: 0.1)
+- LOG_QUEUE_SIZE: Records buffered for the writer before new ones are dropped (default: 10000)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+from . import request_context
+
+# Pass as extra= to mark a high-volume message for sampling
+SAMPLED = {'sampled': True}
+
+# LogRecord attributes that are not user-supplied extra fields
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled'}
+_CONTEXT_FIELDS = ('request_id', 'endpoint', 'trace')
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Snapshots records on the caller's thread and enqueues them without ever waiting"""
+
+    def __init__(self, record_queue: queue.Queue, sample_rate: float):
+        super().__init__(record_queue)
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.stats = {'queued': 0, 'dropped': 0, 'sampled_out': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _keep_sampled(self, request_id: Optional[str]) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        if request_id is None:
+            return random.random() < self.sample_rate
+        return zlib.crc32(request_id.encode('utf-8')) % 10000 < self.sample_rate * 10000
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        context = request_context.current_request()
+        request_id = context.request_id if context is not None else None
+        if getattr(record, 'sampled', False) and record.levelno < logging.WARNING \
+                and not self._keep_sampled(request_id):
+            self._count('sampled_out')
+            return False
+        # Context is read here: the writer thread has no access to the request's contextvars
+        if context is not None:
+            record.request_id = request_id
+            record.endpoint = context.endpoint
+            if context.trace:
+                record.trace = context.trace
+        return super().handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now; formatting proper happens on the writer thread
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self._count('queued')
+        except queue.Full:
+            self._count('dropped')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line in the shape Cloud Logging understands"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'severity': record.levelname,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                    + f".{int(record.msecs):03d}Z",
+            'logger': record.name,
+            'message': record.message,
+        }
+        for field in _CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        project = os.getenv('GOOGLE_CLOUD_PROJECT')
+        if project and entry.get('trace'):
+            entry['logging.googleapis.com/trace'] = f"projects/{project}/traces/{entry['trace']}"
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key not in _CONTEXT_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable single lines for local development"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, 'request_id', None)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name[6:] or record.name}"
+        line += f" [{request_id}] " if request_id else ' '
+        line += record.message
+        fields = {key: value for key, value in record.__dict__.items()
+                  if key not in _RESERVED and key not in _CONTEXT_FIELDS}
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class LogPipeline:
+    """The queue, the request-side handler and the background writer"""
+
+    def __init__(self, level: str = 'INFO', log_format: str = 'text', sample_rate: float = 0.1,
+                 queue_size: int = 10000):
+        self.level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+        if not isinstance(self.level, int):
+            self.level = logging.INFO
+        self.format = log_format if log_format in ('json', 'text') else 'text'
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.handler = NonBlockingQueueHandler(self.queue, sample_rate)
+        self.writer = logging.StreamHandler(sys.stdout)
+        self.writer.setFormatter(JsonFormatter() if self.format == 'json' else TextFormatter())
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    @classmethod
+    def from_env(cls) -> 'LogPipeline':
+        return cls(
+            level=os.getenv('LOG_LEVEL', 'INFO'),
+            log_format=os.getenv('LOG_FORMAT', 'json' if os.getenv('K_SERVICE') else 'text'),
+            sample_rate=float(os.getenv('LOG_SAMPLE_RATE', '0.1')),
+            queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+        )
+
+    def install(self) -> None:
+        root = logging.getLogger('nyaya')
+        root.setLevel(self.level)
+        root.addHandler(self.handler)
+        root.propagate = False
+        self.start()
+        atexit.register(self.stop)
+        # The writer thread does not survive a fork (gunicorn --preload): start a fresh one
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def start(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.queue, self.writer, respect_handler_level=False)
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the writer"""
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            try:
+                listener.stop()
+            except Exception:
+                pass
+
+    def _restart_in_child(self) -> None:
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.start()
+
+    def get_stats(self) -> Dict:
+        with self.handler._lock:
+            stats = dict(self.handler.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+
+# Global instance (loaded once at startup)
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> LogPipeline:
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                pipeline = LogPipeline.from_env()
+                pipeline.install()
+                _pipeline = pipeline
+    return _pipeline
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Logger for one component ('rag_engine' → "nyaya.rag_engine"); installs the pipeline on first use"""
+    get_pipeline()
+    return logging.getLogger(f"nyaya.{component}")
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Wait (bounded) until the writer has drained the queue - for commands that exit right after logging"""
+    if _pipeline is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not _pipeline.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def collect_metrics():
+    """Log pipeline counters for /metrics: (name, type, help, samples)"""
+    if _pipeline is None:
+        return
+    stats = _pipeline.get_stats()
+    yield ('nyaya_log_records_total', 'counter', 'Log records by outcome', [
+        ({'outcome': outcome}, stats[outcome]) for outcome in ('queued', 'dropped', 'sampled_out')
+    ])
+    yield ('nyaya_log_queue_depth', 'gauge', 'Log records waiting for the writer', [({}, stats['queue_depth'])])
@@ -0,0 +1,155 @@
+"""
+Process archived complaints (queries) and contracts (document paths) offline, resumably
+
+Records are streamed from JSONL or CSV through a process pool; results are appended to
+the output JSONL as they finish and a checkpoint remembers which lines succeeded, so
+rerunning the same command after an interruption only pays for the remaining records
+(and retries the failed ones). See app/offline_batch.py.
+
+Input records (JSONL objects or CSV columns):
+    {"id": "C-101", "query": "My employer has not paid salary for 3 months..."}
+    {"id": "K-7", "path": "contracts/lease-7.pdf"}
+
+Usage:
+    python manage.py batch_process archive.jsonl [--output results.jsonl] [--workers 4]
+                                   [--format auto|jsonl|csv] [--limit 100] [--restart]
+"""
+
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.offline_batch import Checkpoint, ResultWriter, init_worker, process_record, read_records
+
+
+class Command(BaseCommand):
+    help = "Run queries and contract files through the RAG pipeline with a resumable checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="JSONL or CSV file of records")
+        parser.add_argument('--output', help="Results JSONL (default: <input>.results.jsonl)")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint.json)")
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                            help="Worker processes (default: 4 or the CPU count if lower)")
+        parser.add_argument('--format', default='auto', choices=('auto', 'jsonl', 'csv'),
+                            help="Input format (default: by extension)")
+        parser.add_argument('--base-dir', help="Directory document paths are relative to (default: the input's)")
+        parser.add_argument('--limit', type=int, help="Stop after this many records have been processed")
+        parser.add_argument('--progress-every', type=int, default=25, help="Print progress every N records")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore the checkpoint and start over (truncates the output)")
+
+    def handle(self, *args, **options):
+        input_path = options['input']
+        if not os.path.isfile(input_path):
+            raise CommandError(f"Input file not found: {input_path}")
+        output_path = options['output'] or f"{os.path.splitext(input_path)[0]}.results.jsonl"
+        checkpoint_path = options['checkpoint'] or f"{output_path}.checkpoint.json"
+
+        if options['restart'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        try:
+            checkpoint = Checkpoint.load(checkpoint_path, input_path)
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"{str(e)} (use --restart to start over)")
+        recovered = 0 if options['restart'] else checkpoint.reconcile(output_path)
+        resuming = checkpoint.watermark > 0 or bool(checkpoint.done)
+        if resuming:
+            self.stdout.write(f"Resuming: {checkpoint.watermark + len(checkpoint.done)} record(s) already done"
+                              + (f" ({recovered} recovered from the output)" if recovered else ""))
+        checkpoint.stats['runs'] += 1
+        checkpoint.save()
+
+        writer = ResultWriter(output_path, truncate=options['restart'])
+        workers = max(1, options['workers'])
+        counts = {'success': 0, 'error': 0, 'skipped': 0}
+        start = time.perf_counter()
+        stopping = False
+
+        def record_result(result):
+            writer.write(result)
+            counts[result['status']] += 1
+            if result['status'] == 'success':
+                checkpoint.mark_done(result['line'])
+                checkpoint.stats['succeeded'] += 1
+            else:
+                checkpoint.stats['failed'] += 1
+                self.stderr.write(f"  FAILED line {result['line']}"
+                                  + (f" ({result['id']})" if result.get('id') else '')
+                                  + f": {result['message']}")
+            checkpoint.save()
+            done = counts['success'] + counts['error']
+            if done % max(1, options['progress_every']) == 0:
+                rate = done / max(time.perf_counter() - start, 1e-9)
+                self.stdout.write(f"  {done} processed ({counts['error']} failed), {rate:.2f} records/s")
+
+        # SIGTERM (job schedulers) stops like Ctrl-C: no new records, in-flight ones are kept
+        previous_sigterm = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.stdout.write(f"Processing {input_path} with {workers} worker(s) → {output_path}")
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        pending = {}
+        try:
+            records = read_records(input_path, options['format'], options['base_dir'])
+            submitted = 0
+            for record in records:
+                if checkpoint.is_done(record['line']):
+                    counts['skipped'] += 1
+                    continue
+                if options['limit'] is not None and submitted >= options['limit']:
+                    break
+                submitted += 1
+                if 'error' in record:
+                    record_result({'line': record['line'], 'id': record['id'], 'kind': record.get('kind'),
+                                   'status': 'error', 'message': record['error']})
+                    continue
+                # Bounded look-ahead: the input is streamed, never loaded whole
+                while len(pending) >= workers * 2:
+                    self._collect(pending, record_result)
+                pending[pool.submit(process_record, record)] = record
+            while pending:
+                self._collect(pending, record_result)
+        except KeyboardInterrupt:
+            stopping = True
+            for future in pending:
+                future.cancel()
+            running = {future: record for future, record in pending.items() if not future.cancelled()}
+            if running:
+                self.stdout.write(f"Interrupted - finishing {len(running)} in-flight record(s) "
+                                  f"(interrupt again to abort)")
+            try:
+                while running:
+                    self._collect(running, record_result)
+            except KeyboardInterrupt:
+                pass
+        finally:
+            pool.shutdown(wait=not stopping, cancel_futures=True)
+            signal.signal(signal.SIGTERM, previous_sigterm)
+            writer.close()
+            checkpoint.save()
+
+        seconds = time.perf_counter() - start
+        summary = (f"{counts['success']} succeeded, {counts['error']} failed, "
+                   f"{counts['skipped']} already done, in {seconds:.1f}s")
+        if stopping:
+            self.stdout.write(self.style.WARNING(f"Stopped: {summary}. Rerun the same command to resume."))
+        elif counts['error']:
+            self.stdout.write(self.style.WARNING(f"{summary}. Rerun to retry the failed records."))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    @staticmethod
+    def _collect(pending, record_result):
+        """Wait for at least one record and write what finished"""
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            record = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (BrokenProcessPool) or the result did not pickle
+                result = {'line': record['line'], 'id': record['id'], 'kind': record.get('kind'),
+                          'status': 'error', 'message': f"{type(e).__name__}: {str(e)}"}
+            record_result(result)
@@ -0,0 +1,87 @@
+"""
+Evaluate retrieval quality against latency for every available retriever configuration
+
+Each configuration (backend × top_k × adaptive depth × query expansion, plus shard
+routing when shards exist) runs the gold set through search_legal_db with the retrieval
+cache off; see app/retrieval_eval.py.
+
+Usage:
+    python manage.py evaluate_retrieval [--gold app/data/retrieval_gold.json] [--top-k 3,5]
+                                        [--cutoffs 1,3,5] [--backends local_corpus,topic_fallback]
+                                        [--config expanded] [--output report.json] [--per-query]
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.retrieval_eval import DEFAULT_GOLD_PATH, available_backends, build_configs, evaluate, load_gold
+
+
+def _int_list(value: str):
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise CommandError(f"Expected comma-separated integers, got '{value}'")
+
+
+class Command(BaseCommand):
+    help = "Report recall@k, MRR, latency and context tokens for each retriever configuration"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gold', default=DEFAULT_GOLD_PATH, help="Gold set JSON file")
+        parser.add_argument('--top-k', default='3,5', help="top_k values to evaluate (default: 3,5)")
+        parser.add_argument('--cutoffs', default='1,3,5', help="k values for recall@k (default: 1,3,5)")
+        parser.add_argument('--backends', default='',
+                            help="Subset of vertex,local_corpus,topic_fallback (default: all available)")
+        parser.add_argument('--config', default='', help="Only configurations whose name contains this")
+        parser.add_argument('--output', help="Write the full report (with per-query rows) as JSON")
+        parser.add_argument('--per-query', action='store_true', help="Print per-query ranks")
+
+    def handle(self, *args, **options):
+        try:
+            gold = load_gold(options['gold'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not load gold set: {str(e)}")
+        cutoffs = _int_list(options['cutoffs'])
+
+        from app.rag_engine import get_rag_engine
+        engine = get_rag_engine()
+
+        backends = available_backends(engine)
+        if options['backends']:
+            wanted = [name.strip() for name in options['backends'].split(',') if name.strip()]
+            missing = [name for name in wanted if name not in backends]
+            if missing:
+                raise CommandError(f"Backend(s) not available: {', '.join(missing)} "
+                                   f"(available: {', '.join(backends)})")
+            backends = wanted
+        configs = [config for config in build_configs(engine, backends, _int_list(options['top_k']))
+                   if options['config'] in config['name']]
+        if not configs:
+            raise CommandError("No configuration matches")
+
+        self.stdout.write(f"Evaluating {len(configs)} configuration(s) on {len(gold)} queries "
+                          f"(backends: {', '.join(backends)})")
+        results = evaluate(engine, gold, configs, cutoffs)
+
+        recall_columns = [f"recall@{k}" for k in cutoffs]
+        width = max(len(result['name']) for result in results) + 2
+        self.stdout.write(f"{'configuration':<{width}}" + ''.join(f"{column:>10}" for column in recall_columns)
+                          + f"{'MRR':>8}{'hit':>7}{'mean ms':>10}{'p95 ms':>9}{'tokens':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<{width}}"
+                + ''.join(f"{result[column]:>10.3f}" for column in recall_columns)
+                + f"{result['mrr']:>8.3f}{result['hit_rate']:>7.2f}"
+                f"{result['mean_seconds'] * 1000:>10.1f}{result['p95_seconds'] * 1000:>9.1f}{result['mean_tokens']:>8.0f}"
+            )
+            if options['per_query']:
+                for row in result['queries_detail']:
+                    rank = f"{1 / row['reciprocal_rank']:.0f}" if row['reciprocal_rank'] else '-'
+                    self.stdout.write(f"    {row['id']:<28} rank {rank:>2}  {', '.join(row['retrieved'][:5])}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'gold': options['gold'], 'cutoffs': cutoffs, 'results': results}, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,138 @@
+"""
+Ingest Bare Act PDFs into a section-level corpus artifact
+
+Only files whose content digest changed (or new files) are re-chunked; the rest keep
+their existing segments, and Acts whose files did not change keep their shard index.
+A running server maps the new version on its next manifest check.
+
+Usage:
+    python manage.py ingest_bare_acts path/to/acts/ [more.pdf ...] [--workers 8] [--full] [--prune]
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.corpus import (
+    DEFAULT_CORPUS_DIR, file_digest, parse_act_pdf, publish_corpus, read_manifest, write_segment,
+)
+
+
+class Command(BaseCommand):
+    help = "Parse Bare Act PDFs into section/sub-section chunks with page offsets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="PDF files or directories containing PDFs")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Parallel parser processes (default: CPU count)")
+        parser.add_argument('--output-dir', default=os.getenv('CORPUS_DIR', DEFAULT_CORPUS_DIR),
+                            help="Corpus artifact directory (default: CORPUS_DIR)")
+        parser.add_argument('--max-chunk-chars', type=int,
+                            default=int(os.getenv('CORPUS_MAX_CHUNK_CHARS', '1500')),
+                            help="Sections longer than this are split at sub-sections")
+        parser.add_argument('--full', action='store_true',
+                            help="Re-chunk every file even if its digest is unchanged")
+        parser.add_argument('--prune', action='store_true',
+                            help="Drop Acts from the corpus whose files were not given")
+
+    def handle(self, *args, **options):
+        sources = self._collect_pdfs(options['paths'])
+        files = list(sources)
+        if not files:
+            raise CommandError("No PDF files found")
+
+        corpus_dir = options['output_dir']
+        try:
+            manifest = read_manifest(corpus_dir) or {'files': {}}
+        except ValueError as e:
+            # Older corpus format - rebuild everything
+            self.stdout.write(f"{str(e)}; re-ingesting all files")
+            manifest = {'files': {}}
+        existing = manifest['files']
+
+        # Content digests decide what needs re-chunking
+        digests = {path: file_digest(path) for path in files}
+        changed = [
+            path for path in files
+            if options['full']
+            or sources[path] not in existing
+            or existing[sources[path]]['digest'] != digests[path]
+        ]
+
+        entries = dict(existing)
+        if options['prune']:
+            given = set(sources.values())
+            for source in list(entries):
+                if source not in given:
+                    self.stdout.write(f"  Pruned {source}")
+                    del entries[source]
+
+        self.stdout.write(
+            f"{len(files)} PDF(s): {len(changed)} new or changed, {len(files) - len(changed)} unchanged"
+        )
+        if not changed and entries == existing:
+            self.stdout.write(self.style.SUCCESS("Corpus is up to date"))
+            return
+
+        failures = 0
+        if changed:
+            workers = max(1, min(options['workers'], len(changed)))
+            self.stdout.write(f"Parsing {len(changed)} PDF(s) with {workers} worker(s)...")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(parse_act_pdf, path, options['max_chunk_chars'], sources[path]): path
+                    for path in changed
+                }
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        parsed = future.result()
+                    except Exception as e:
+                        failures += 1
+                        self.stderr.write(f"  FAILED {path}: {str(e)}")
+                        continue
+                    entries[parsed['source']] = {
+                        'digest': digests[path],
+                        'segment': write_segment(corpus_dir, parsed, digests[path]),
+                        'act': parsed['act'],
+                        'pages': parsed['pages'],
+                        'chunks': len(parsed['chunks']),
+                    }
+                    self.stdout.write(
+                        f"  {parsed['source']}: {parsed['act']} - "
+                        f"{len(parsed['chunks'])} chunks over {parsed['pages']} pages"
+                    )
+
+        if failures == len(changed) and entries == existing:
+            raise CommandError("Every changed file failed to parse")
+
+        # Deterministic manifest order regardless of which worker finished first;
+        # per-Act shard indexes are (re)built here, once, for changed Acts only
+        manifest = publish_corpus(corpus_dir, dict(sorted(entries.items())))
+        total = sum(entry['chunks'] for entry in entries.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Corpus version {manifest['version']}: {total} chunks from {len(entries)} Act(s)"
+            + (f" ({failures} file(s) failed)" if failures else "")
+        ))
+
+    def _collect_pdfs(self, paths):
+        """PDF path → corpus key: the path relative to a given directory, or the file name"""
+        sources = {}
+        taken = {}
+        for path in paths:
+            if os.path.isdir(path):
+                found = []
+                for root, _, names in os.walk(path):
+                    found.extend(os.path.join(root, name) for name in sorted(names)
+                                 if name.lower().endswith('.pdf'))
+                keys = [os.path.relpath(file_path, path).replace(os.sep, '/') for file_path in found]
+            elif path.lower().endswith('.pdf') and os.path.isfile(path):
+                found, keys = [path], [os.path.basename(path)]
+            else:
+                raise CommandError(f"Not a PDF file or directory: {path}")
+            for file_path, source in zip(found, keys):
+                if taken.setdefault(source, file_path) != file_path:
+                    raise CommandError(f"{taken[source]} and {file_path} would both be stored as {source}")
+                sources[file_path] = source
+        return sources
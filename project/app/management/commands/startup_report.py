@@ -0,0 +1,40 @@
+"""
+Measure this release's cold start: run the startup warmup in a fresh process and report
+the time of every phase and deferred import (see app/startup.py)
+
+Usage:
+    python manage.py startup_report [--output startup.json]
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from app.startup import warmup
+
+
+class Command(BaseCommand):
+    help = "Run the startup warmup and print the phase / import time breakdown"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Also write the report as JSON (to track across releases)")
+
+    def handle(self, *args, **options):
+        report = warmup()
+
+        self.stdout.write(f"State: {report['state']}" + (f" ({report['error']})" if report['error'] else ''))
+        self.stdout.write(f"{'phase':<24}{'seconds':>10}")
+        for phase in report['phases']:
+            self.stdout.write(f"{phase['phase']:<24}{phase['seconds']:>10.3f}")
+        self.stdout.write(f"{'total warmup':<24}{report['warmup_seconds']:>10.3f}")
+        if report['imports']:
+            self.stdout.write(f"\n{'deferred import':<40}{'seconds':>10}")
+            for name, seconds in sorted(report['imports'].items(), key=lambda item: -item[1]):
+                self.stdout.write(f"{name:<40}{seconds:>10.3f}")
+        self.stdout.write(f"\nReady {report['ready_after_seconds']:.3f}s after app load; "
+                          f"{report['modules_loaded']} modules loaded")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
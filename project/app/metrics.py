@@ -0,0 +1,282 @@
+"""
+Nyaya-Sahayak Metrics
+Purpose: Low-overhead counters and latency histograms exposed in Prometheus text format
+
+How it works:
+1. Pipeline stages run inside span('stage'): one perf_counter pair and a locked bucket
+   increment per stage, cheap enough to leave on in production
+2. A span that raises counts the exception class under nyaya_errors_total and re-raises
+3. Views are wrapped with observe_endpoint('name') for request latency and status codes;
+   it also opens the request context and its correlation id (X-Request-ID)
+4. Components that keep their own stats dicts (router, hedger, caches, ...) register a
+   collector; collectors are only called when /metrics is scraped
+5. /metrics is internal: with METRICS_TOKEN set a scrape must send it as a bearer token,
+   otherwise only loopback clients (a sidecar or local agent) are answered
+
+Configuration (environment):
+- METRICS_ENABLED: "False" turns spans into no-ops and hides /metrics (default: True)
+- METRICS_TOKEN: bearer token required to scrape /metrics (default: none, loopback only)
+"""
+
+import functools
+import hmac
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import request_context
+from .log import get_logger
+from .request_context import request_scope
+
+log = get_logger('metrics')
+
+# Latency buckets in seconds (upstream calls range from a few ms to tens of seconds)
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collected sample: (metric name, type, help, [(labels dict, value)])
+Collected = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    ]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels → [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = key + (('le', _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {counts[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Owns the process's metrics and the collectors polled at scrape time"""
+
+    def __init__(self, enabled: bool = True, token: str = ''):
+        self.enabled = enabled
+        self.token = token
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Collected]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def authorized(self, request) -> bool:
+        """Whether the request may scrape: the bearer token, or a loopback client when none is set"""
+        if not self.token:
+            return request.META.get('REMOTE_ADDR') in LOOPBACK_ADDRESSES
+        supplied = request.META.get('HTTP_AUTHORIZATION', '')
+        return hmac.compare_digest(supplied.encode(), f"Bearer {self.token}".encode())
+
+    def register_collector(self, collector: Callable[[], Iterable[Collected]]) -> None:
+        """Register a function yielding (name, type, help, [(labels, value)]) at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                log.warning(f"METRICS: Collector failed: {str(e)}")
+                continue
+            for name, metric_type, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(
+                    f"{name}{_format_labels(_labels(labels))} {_format_value(value)}"
+                    for labels, value in samples if value is not None
+                )
+        return '\n'.join(lines) + '\n'
+
+
+# Global instance (loaded once at startup)
+registry = Registry(enabled=os.getenv('METRICS_ENABLED', 'True') == 'True',
+                    token=os.getenv('METRICS_TOKEN', ''))
+
+STAGE_SECONDS = registry.histogram('nyaya_stage_seconds', 'Latency of RAG pipeline stages')
+REQUEST_SECONDS = registry.histogram('nyaya_request_seconds', 'Latency of API requests by endpoint')
+REQUESTS = registry.counter('nyaya_requests_total', 'API requests by endpoint and status code')
+ERRORS = registry.counter('nyaya_errors_total', 'Exceptions by stage and error class')
+EVENTS = registry.counter('nyaya_events_total', 'Pipeline outcomes (fast paths, cache hits, fallbacks)')
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage; exceptions are counted by class and re-raised"""
+    tracing = request_context.STAGE_TRACING
+    if not registry.enabled and not tracing:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if registry.enabled:
+            ERRORS.inc(stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if registry.enabled:
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+        if tracing:
+            # Per-request stage breakdown for profiled requests (see profiling.py)
+            context = request_context.current_request()
+            if context is not None:
+                context.record_stage(stage, start, elapsed)
+
+
+def count_event(event: str) -> None:
+    """Count a pipeline outcome such as 'answer_cache_hit' or 'web_fallback'"""
+    if registry.enabled:
+        EVENTS.inc(event=event)
+
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+
+def _correlation(request) -> Tuple[Optional[str], Optional[str]]:
+    """(request id, trace id) from X-Request-ID and the Cloud Run X-Cloud-Trace-Context header"""
+    trace_header = request.META.get('HTTP_X_CLOUD_TRACE_CONTEXT', '')
+    trace = trace_header.split('/', 1)[0] or None
+    request_id = request.META.get('HTTP_X_REQUEST_ID', '')
+    if not _REQUEST_ID.match(request_id):
+        request_id = trace[:16] if trace else None
+    return request_id, trace
+
+
+def observe_endpoint(endpoint: str) -> Callable:
+    """Decorator opening the request context and recording a view's latency and response status"""
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            request_id, trace = _correlation(request)
+            with request_scope(endpoint, request_id, trace) as context:
+                response = _observed(view, endpoint, request, *args, **kwargs)
+                response['X-Request-ID'] = context.request_id
+                return response
+        return wrapper
+    return decorator
+
+
+def _observed(view: Callable, endpoint: str, request, *args, **kwargs):
+    if not registry.enabled:
+        return view(request, *args, **kwargs)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = view(request, *args, **kwargs)
+        status = response.status_code
+        return response
+    except Exception as e:
+        ERRORS.inc(stage=endpoint, error=type(e).__name__)
+        raise
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=status)
+
+
+def stats_samples(stats: Dict, labels: Optional[Dict[str, str]] = None,
+                  path: str = '') -> List[Tuple[Dict[str, str], float]]:
+    """Flatten a (nested) stats dict of numbers into samples labelled key="outer.inner" """
+    samples = []
+    for key, value in stats.items():
+        name = f"{path}.{key}" if path else str(key)
+        if isinstance(value, dict):
+            samples.extend(stats_samples(value, labels, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            samples.append((dict(labels or {}, key=name), value))
+    return samples
+
+
+def count_error(stage: str, error: Exception) -> None:
+    """Count an exception that a stage handled itself (e.g. by falling back)"""
+    if registry.enabled:
+        ERRORS.inc(stage=stage, error=type(error).__name__)
@@ -0,0 +1,219 @@
+"""
+Nyaya-Sahayak Model Router
+Purpose: Send simple requests to a fast model and complex ones to a strong model
+
+Routing:
+1. A cheap local scorer rates each request's complexity (0.0 - 1.0) from
+   length, reasoning cues, factual cues, question count and attached evidence
+2. Score >= threshold → strong model, otherwise → fast model
+3. A low-confidence answer from the fast model (failure phrase, a chat answer
+   that is too short, unparseable JSON) is escalated once to the strong model
+4. Every decision, escalation and per-route latency is recorded so the
+   threshold can be tuned from real traffic; an escalated call counts toward
+   the strong route, which produced the answer
+
+Configuration (environment):
+- MODEL_ROUTING_ENABLED: "False" pins every request to the strong model (default: True)
+- FAST_MODEL: fast model name (default: gemini-flash-latest)
+- STRONG_MODEL: strong model name (default: gemini-pro-latest)
+- ROUTING_THRESHOLD: complexity score at which requests go strong (default: 0.5)
+- ESCALATION_MIN_CHARS: fast chat answers shorter than this are escalated (default: 200)
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .hedging import LatencyTracker
+from .log import SAMPLED, get_logger
+
+log = get_logger('model_router')
+
+FAST_ROUTE = 'fast'
+STRONG_ROUTE = 'strong'
+
+# Cues that the user wants interpretation, not a lookup
+REASONING_CUES = [
+    'valid', 'whether', 'can i', 'should i', 'should we', 'analy', 'compare',
+    'difference between', 'implication', 'strategy', 'defend', 'defence', 'defense',
+    'liable', 'liability', 'challenge', 'enforceable', 'remedies', 'options',
+    'chances', 'draft', 'explain why', 'what happens if', 'is it legal', 'loophole',
+]
+
+# Cues for short factual lookups
+FACTUAL_CUES = [
+    'what is', 'define', 'definition of', 'limitation period', 'how many days',
+    'punishment for', 'penalty for', 'which section', 'fine for', 'time limit',
+]
+
+CONDITIONAL_CUES = [' if ', ' but ', ' however', ' although', ' unless', ' whereas']
+
+SECTION_PATTERN = re.compile(r'\b(section|sec\.?|s\.)\s*\d+[a-z]?\b', re.IGNORECASE)
+
+# Default complexity for tasks that carry no user question
+TASK_BASE_SCORES = {
+    'chat': 0.0,
+    'evidence': 0.2,
+    'document_analysis': 0.0,
+    'clause_comparison': 0.2,
+}
+
+# Tasks whose short answers are suspect. Evidence answers ("What is the date?") are
+# legitimately short, and JSON tasks are checked by their caller's needs_escalation
+LENGTH_ESCALATION_TASKS = ('chat',)
+
+
+class ModelRouter:
+    """Classifies requests into fast/strong routes and records routing outcomes"""
+
+    def __init__(self, enabled: bool = True, fast_model: str = 'gemini-flash-latest',
+                 strong_model: str = 'gemini-pro-latest', threshold: float = 0.5,
+                 escalation_min_chars: int = 200):
+        self.enabled = enabled
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.threshold = threshold
+        self.escalation_min_chars = escalation_min_chars
+        self._lock = threading.Lock()
+        self._latency = {FAST_ROUTE: LatencyTracker(), STRONG_ROUTE: LatencyTracker()}
+        self.stats = {
+            'decisions': {FAST_ROUTE: 0, STRONG_ROUTE: 0},
+            'escalations': 0,
+            'by_task': {},
+        }
+
+    @classmethod
+    def from_env(cls) -> 'ModelRouter':
+        return cls(
+            enabled=os.getenv('MODEL_ROUTING_ENABLED', 'True') == 'True',
+            fast_model=os.getenv('FAST_MODEL', 'gemini-flash-latest'),
+            strong_model=os.getenv('STRONG_MODEL', 'gemini-pro-latest'),
+            threshold=float(os.getenv('ROUTING_THRESHOLD', '0.5')),
+            escalation_min_chars=int(os.getenv('ESCALATION_MIN_CHARS', '200')),
+        )
+
+    def score_complexity(self, query: str, task: str = 'chat',
+                         has_evidence: bool = False, input_size: int = 0) -> Tuple[float, List[str]]:
+        """
+        Score request complexity with cheap local heuristics
+
+        Args:
+            query: User question or clause text (may be empty)
+            task: 'chat', 'evidence', 'document_analysis' or 'clause_comparison'
+            has_evidence: Whether an uploaded document accompanies the question
+            input_size: Size of attached input in characters/bytes (0 if none)
+
+        Returns:
+            Tuple of (score between 0 and 1, list of reasons)
+        """
+        score = TASK_BASE_SCORES.get(task, 0.0)
+        reasons = [f"task={task}"]
+        text = f" {query.lower()} "
+        words = len(text.split())
+
+        if words > 80:
+            score += 0.5
+            reasons.append(f"long ({words} words)")
+        elif words > 40:
+            score += 0.3
+            reasons.append(f"medium ({words} words)")
+
+        reasoning_hits = [cue for cue in REASONING_CUES if cue in text]
+        if reasoning_hits:
+            score += min(0.5, 0.25 * len(reasoning_hits))
+            reasons.append(f"reasoning cues: {', '.join(reasoning_hits[:3])}")
+
+        factual_hits = [cue for cue in FACTUAL_CUES if cue in text]
+        if factual_hits or SECTION_PATTERN.search(text):
+            score -= 0.2
+            reasons.append("factual lookup")
+
+        if text.count('?') > 1:
+            score += 0.2
+            reasons.append("multiple questions")
+
+        conditionals = sum(text.count(cue) for cue in CONDITIONAL_CUES)
+        if conditionals:
+            score += min(0.3, 0.1 * conditionals)
+            reasons.append(f"{conditionals} conditional clause(s)")
+
+        if has_evidence:
+            score += 0.1
+            reasons.append("uploaded evidence")
+
+        if input_size > 200_000:
+            score += 0.5
+            reasons.append(f"large input ({input_size})")
+
+        return max(0.0, min(1.0, score)), reasons
+
+    def route(self, query: str, task: str = 'chat', has_evidence: bool = False,
+              input_size: int = 0) -> Dict:
+        """
+        Choose a model for a request
+
+        Returns:
+            Dict with 'route', 'model', 'score', 'reasons' and 'task' keys
+        """
+        score, reasons = self.score_complexity(query, task, has_evidence, input_size)
+
+        if not self.enabled:
+            route = STRONG_ROUTE
+            reasons.append("routing disabled")
+        else:
+            route = STRONG_ROUTE if score >= self.threshold else FAST_ROUTE
+
+        with self._lock:
+            self.stats['decisions'][route] += 1
+            task_stats = self.stats['by_task'].setdefault(task, {FAST_ROUTE: 0, STRONG_ROUTE: 0})
+            task_stats[route] += 1
+
+        log.info(f"ROUTER: {task} → {route} (score={score:.2f}; {'; '.join(reasons)})", extra=SAMPLED)
+        return {
+            'route': route,
+            'model': self.model_for(route),
+            'score': score,
+            'reasons': reasons,
+            'task': task,
+        }
+
+    def model_for(self, route: str) -> str:
+        return self.fast_model if route == FAST_ROUTE else self.strong_model
+
+    def should_escalate(self, decision: Dict, response_text: Optional[str],
+                        is_failure: bool = False) -> bool:
+        """A fast-route answer is escalated when it failed, came back empty or (chat) too short"""
+        if decision['route'] != FAST_ROUTE:
+            return False
+        if is_failure or not response_text:
+            return True
+        if decision['task'] not in LENGTH_ESCALATION_TASKS:
+            return False
+        return len(response_text.strip()) < self.escalation_min_chars
+
+    def record(self, decision: Dict, latency: float, escalated: bool = False) -> None:
+        """Record end-to-end generation latency for the route that answered (strong if escalated)"""
+        self._latency[STRONG_ROUTE if escalated else decision['route']].observe(latency)
+        if escalated:
+            with self._lock:
+                self.stats['escalations'] += 1
+            log.info(f"ROUTER: escalated {decision['task']} from fast to strong model")
+
+    def snapshot(self) -> Dict:
+        """Routing counters plus p50/p95 latency per route (seconds)"""
+        with self._lock:
+            snapshot = {
+                'decisions': dict(self.stats['decisions']),
+                'escalations': self.stats['escalations'],
+                'by_task': {task: dict(counts) for task, counts in self.stats['by_task'].items()},
+            }
+        snapshot['latency'] = {
+            route: {
+                'count': tracker.count(),
+                'p50': tracker.percentile(0.5),
+                'p95': tracker.percentile(0.95),
+            }
+            for route, tracker in self._latency.items()
+        }
+        return snapshot
@@ -0,0 +1,250 @@
+"""
+Nyaya-Sahayak Offline Batch Processing
+Purpose: Nightly reprocessing of archived complaints and contracts that survives interruption
+
+How it works:
+1. Input records are streamed from JSONL or CSV: a query ("query" / "message") goes through
+   LegalRAGEngine.process_legal_query, a document ("path" / "document") through the
+   contract verification used by /api/verify-contract/
+2. Records run on a process pool; each worker builds its own engine (and caches) once
+3. Every finished record is appended to the output JSONL and synced before the checkpoint
+   records it, so a result is never lost once the checkpoint says it is done
+4. The checkpoint keeps a watermark (every line up to it succeeded) plus the succeeded
+   lines beyond it; a rerun skips those and pays only for what is left. Failed records -
+   including answers the engine returns in place of an upstream error - are written with
+   status "error" and retried on the next run
+5. On resume the output file is also scanned, so records finished after the last
+   checkpoint write (a crash between the two) are not processed twice
+
+Run with: python manage.py batch_process archive.jsonl --output results.jsonl
+"""
+
+import csv
+import hashlib
+import json
+import os
+import signal
+import time
+from typing import Dict, Iterator, Optional, Set
+
+from .log import get_logger
+
+log = get_logger('offline_batch')
+
+QUERY = 'query'
+CONTRACT = 'contract'
+
+# Bytes of the input fingerprinted to notice a different file under the same name
+_HEAD_BYTES = 65536
+
+
+def read_records(path: str, input_format: str = 'auto', base_dir: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream records from a JSONL or CSV file
+
+    Args:
+        path: Input file
+        input_format: "jsonl", "csv" or "auto" (by extension)
+        base_dir: Directory relative document paths resolve against (default: the input's)
+
+    Returns:
+        Iterator of {'line', 'id', 'kind', 'query' | 'path'}; unreadable records carry 'error'
+    """
+    if input_format == 'auto':
+        input_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    base_dir = base_dir or os.path.dirname(os.path.abspath(path))
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if input_format == 'csv':
+            rows = ((line, row) for line, row in enumerate(csv.DictReader(f), 1))
+        else:
+            rows = _jsonl_rows(f)
+        for line, row in rows:
+            yield _record(line, row, base_dir)
+
+
+def _jsonl_rows(f) -> Iterator:
+    line = 0
+    for text in f:
+        if not text.strip():
+            continue
+        line += 1
+        try:
+            yield line, json.loads(text)
+        except ValueError as e:
+            yield line, e
+
+
+def _record(line: int, row, base_dir: str) -> Dict:
+    if isinstance(row, ValueError):
+        return {'line': line, 'id': None, 'error': f"Invalid JSON: {str(row)}"}
+    if not isinstance(row, dict):
+        return {'line': line, 'id': None, 'error': "Record must be an object"}
+    record = {'line': line, 'id': row.get('id') or None}
+
+    query = row.get('query') or row.get('message')
+    document = row.get('path') or row.get('document')
+    kind = row.get('kind') or (CONTRACT if document and not query else QUERY)
+    if kind == CONTRACT and document:
+        record.update(kind=CONTRACT, path=os.path.join(base_dir, document))
+    elif kind == QUERY and query and str(query).strip():
+        record.update(kind=QUERY, query=str(query))
+    else:
+        record.update(kind=kind, error="Record needs a 'query' or a document 'path'")
+    return record
+
+
+def input_fingerprint(path: str, head_bytes: int = _HEAD_BYTES) -> Dict:
+    """Digest of the file head; appending records to the input keeps it resumable"""
+    with open(path, 'rb') as f:
+        head = f.read(head_bytes)
+    return {'head_bytes': len(head), 'head_sha256': hashlib.sha256(head).hexdigest()}
+
+
+class Checkpoint:
+    """Which input lines already have a successful result"""
+
+    def __init__(self, path: str, input_path: str, fingerprint: Dict):
+        self.path = path
+        self.input_path = input_path
+        self.fingerprint = fingerprint
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.stats = {'succeeded': 0, 'failed': 0, 'runs': 0}
+
+    @classmethod
+    def load(cls, path: str, input_path: str) -> 'Checkpoint':
+        """
+        Open the checkpoint for input_path, or start a new one
+
+        Raises:
+            ValueError: When the checkpoint belongs to a different input file
+        """
+        if not os.path.exists(path):
+            return cls(path, input_path, input_fingerprint(input_path))
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        fingerprint = data['fingerprint']
+        if input_fingerprint(input_path, fingerprint['head_bytes']) != fingerprint:
+            raise ValueError(f"Checkpoint {path} was written for a different input than {input_path}")
+        checkpoint = cls(path, input_path, fingerprint)
+        checkpoint.watermark = data['watermark']
+        checkpoint.done = set(data['done'])
+        checkpoint.stats.update(data.get('stats', {}))
+        return checkpoint
+
+    def is_done(self, line: int) -> bool:
+        return line <= self.watermark or line in self.done
+
+    def mark_done(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark + 1 in self.done:
+            self.watermark += 1
+            self.done.discard(self.watermark)
+
+    def reconcile(self, output_path: str) -> int:
+        """Mark lines the output already has a success for; returns how many were new"""
+        if not os.path.exists(output_path):
+            return 0
+        recovered = 0
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for text in f:
+                try:
+                    result = json.loads(text)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if result.get('status') == 'success' and not self.is_done(result['line']):
+                    self.mark_done(result['line'])
+                    recovered += 1
+        return recovered
+
+    def save(self) -> None:
+        """Write atomically so an interruption never leaves a half-written checkpoint"""
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'input': os.path.abspath(self.input_path),
+                'fingerprint': self.fingerprint,
+                'watermark': self.watermark,
+                'done': sorted(self.done),
+                'stats': self.stats,
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+
+class ResultWriter:
+    """Appends one JSON line per result and syncs it before the checkpoint moves"""
+
+    def __init__(self, path: str, truncate: bool = False):
+        self.file = open(path, 'w' if truncate else 'a', encoding='utf-8')
+        # A line cut short by a crash must not swallow the next result
+        if self.file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def write(self, result: Dict) -> None:
+        self.file.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def init_worker() -> None:
+    """Pool initializer: Django for spawned workers; Ctrl-C is handled by the parent"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nyayasahayak.settings')
+        django.setup()
+
+
+def process_record(record: Dict) -> Dict:
+    """
+    Run one record in a worker process
+
+    Returns:
+        The output row: line, id, kind, status, seconds, usage and the answer or error
+    """
+    from .request_context import request_scope
+    from .usage import request_usage_summary
+
+    result = {'line': record['line'], 'id': record['id'], 'kind': record.get('kind')}
+    start = time.perf_counter()
+    with request_scope('batch_process', request_id=f"line-{record['line']}"):
+        try:
+            if record['kind'] == CONTRACT:
+                from .contract_verification import verify_contract_file
+                result['document'] = record['path']
+                if not os.path.isfile(record['path']):
+                    raise FileNotFoundError(f"No such document: {record['path']}")
+                result['data'] = verify_contract_file(record['path'])
+            else:
+                from .rag_engine import answer_failure, get_rag_engine
+                answer = get_rag_engine().process_legal_query(record['query'])
+                result.update(
+                    query=record['query'],
+                    response=answer['response'],
+                    sources=answer['sources'],
+                    confidence=answer.get('confidence', 'medium'),
+                    note=answer.get('note', ''),
+                )
+                # The engine reports upstream failures as answers; those must be retried
+                failure = answer_failure(answer)
+                if failure is not None:
+                    raise RuntimeError(failure)
+            result['status'] = 'success'
+        except Exception as e:
+            log.warning(f"BATCH PROCESS: Line {record['line']} failed: {type(e).__name__}: {str(e)}")
+            result.update(status='error', message=f"{type(e).__name__}: {str(e)}")
+        result['usage'] = request_usage_summary()
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
@@ -0,0 +1,274 @@
+"""
+Nyaya-Sahayak Request Profiling
+Purpose: Opt-in profiling of individual API requests, with reports kept for ops to fetch
+
+How it works:
+1. A request is profiled when it carries the X-Nyaya-Profile header with the configured
+   token, or when it is picked by PROFILING_SAMPLE_RATE
+2. A profiled request runs under cProfile (request thread) and tracemalloc, and every
+   metrics span it opens - including spans on worker pools - is recorded as a
+   wall-clock stage breakdown
+3. The report (stages, top functions by cumulative time, peak memory, top allocation
+   sites) is written as JSON to a bounded ring in PROFILING_DIR; the response carries
+   its id in the X-Nyaya-Profile-Id header
+4. One request is profiled at a time (cProfile and tracemalloc are process-wide);
+   requests arriving meanwhile run unprofiled. tracemalloc only runs when the profiled
+   request is the only one in flight, and its memory figures are dropped if another
+   request arrived before it finished, so they never include other requests' allocations
+5. A request whose view raises is still reported (status 500 and the error)
+6. When disabled the decorator returns the view unchanged - zero overhead
+
+Ops endpoints (X-Nyaya-Profile token required):
+- GET /ops/profiles/            list of reports, newest first
+- GET /ops/profiles/<id>/       one report
+
+Configuration (environment):
+- PROFILING_ENABLED: "True" installs the profiling hook (default: False)
+- PROFILING_TOKEN: header token that profiles a request and unlocks the ops endpoints
+- PROFILING_SAMPLE_RATE: fraction of requests profiled without the header (default: 0.0)
+- PROFILING_DIR: report directory (default: app/data/profiles)
+- PROFILING_MAX_REPORTS: reports kept before the oldest is deleted (default: 20)
+"""
+
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from . import request_context
+from .log import get_logger
+
+log = get_logger('profiling')
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'profiles')
+PROFILE_HEADER = 'HTTP_X_NYAYA_PROFILE'
+_REPORT_ID = re.compile(r'^\d{8}T\d{9}-[0-9a-f]{8}$')
+
+
+class RequestProfiler:
+    """Decides which requests to profile, profiles them and keeps the report ring"""
+
+    def __init__(self, enabled: bool = False, token: str = '', sample_rate: float = 0.0,
+                 directory: str = DEFAULT_PROFILE_DIR, max_reports: int = 20, top_functions: int = 40):
+        self.enabled = enabled
+        self.token = token
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.max_reports = max_reports
+        self.top_functions = top_functions
+        self._busy = threading.Lock()
+        # Requests in flight through the decorator; tracemalloc sees all of their allocations
+        self._in_flight = 0
+        self._tracing = False
+        self._overlapped = False
+        self._in_flight_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RequestProfiler':
+        return cls(
+            enabled=os.getenv('PROFILING_ENABLED', 'False') == 'True',
+            token=os.getenv('PROFILING_TOKEN', ''),
+            sample_rate=float(os.getenv('PROFILING_SAMPLE_RATE', '0.0')),
+            directory=os.getenv('PROFILING_DIR', DEFAULT_PROFILE_DIR),
+            max_reports=int(os.getenv('PROFILING_MAX_REPORTS', '20')),
+        )
+
+    def authorized(self, request) -> bool:
+        """Whether the request carries the profiling token"""
+        supplied = request.META.get(PROFILE_HEADER, '')
+        return bool(self.token) and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def should_profile(self, request) -> bool:
+        return self.authorized(request) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def enter(self) -> None:
+        """Count a request in flight (called by the decorator for every request)"""
+        with self._in_flight_lock:
+            self._in_flight += 1
+            if self._tracing:
+                self._overlapped = True
+
+    def exit(self) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _start_memory_trace(self) -> bool:
+        """Start tracemalloc when no other request is in flight; returns whether it started"""
+        with self._in_flight_lock:
+            self._overlapped = False
+            if self._in_flight > 1:
+                return False
+            tracemalloc.start(10)
+            self._tracing = True
+            return True
+
+    def run(self, view: Callable, request, *args, **kwargs):
+        """Run a view under the profilers and store the report (also when the view raises)"""
+        if not self._busy.acquire(blocking=False):
+            return view(request, *args, **kwargs)
+
+        context = request_context.current_request()
+        if context is not None:
+            context.stages = []
+        profile = cProfile.Profile()
+        traced = self._start_memory_trace()
+        start = time.perf_counter()
+        response = None
+        error = None
+        report_id = None
+        try:
+            profile.enable()
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                profile.disable()
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            try:
+                status = response.status_code if response is not None else 500
+                report_id = self._finish(profile, start, request, status, context, traced, error)
+            finally:
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                self._tracing = False
+                self._busy.release()
+        return self._attach(response, report_id)
+
+    def _attach(self, response, report_id: Optional[str]):
+        if report_id:
+            response['X-Nyaya-Profile-Id'] = report_id
+        return response
+
+    def _finish(self, profile: cProfile.Profile, start: float, request, status: int, context,
+                traced: bool, error: Optional[str]) -> Optional[str]:
+        wall = time.perf_counter() - start
+        memory = {'traced': False, 'reason': 'other requests in flight'}
+        if traced:
+            current, peak = tracemalloc.get_traced_memory()
+            allocations = tracemalloc.take_snapshot().statistics('lineno')[:15]
+            tracemalloc.stop()
+            with self._in_flight_lock:
+                self._tracing = False
+                overlapped = self._overlapped
+            if not overlapped:
+                memory = {
+                    'traced': True,
+                    'peak_bytes': peak,
+                    'current_bytes': current,
+                    'top_allocations': [
+                        {'site': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                        for stat in allocations
+                    ],
+                }
+
+        stats_text = io.StringIO()
+        stats = pstats.Stats(profile, stream=stats_text)
+        stats.sort_stats('cumulative').print_stats(self.top_functions)
+
+        stages = sorted(context.stages or [], key=lambda stage: stage[1]) if context is not None else []
+        totals: Dict[str, float] = {}
+        for stage, _, seconds in stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+
+        # Millisecond timestamps keep ids in creation order for the ring
+        now = time.time()
+        report_id = (f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}"
+                     f"-{uuid.uuid4().hex[:8]}")
+        report = {
+            'id': report_id,
+            'endpoint': context.endpoint if context is not None else request.path,
+            'path': request.path,
+            'method': request.method,
+            'status': status,
+            'error': error,
+            'trigger': 'header' if self.authorized(request) else 'sample',
+            'wall_seconds': round(wall, 6),
+            'stages': [
+                {'stage': stage, 'offset': round(offset, 6), 'seconds': round(seconds, 6)}
+                for stage, offset, seconds in stages
+            ],
+            'stage_totals': {stage: round(seconds, 6) for stage, seconds in sorted(totals.items())},
+            'memory': memory,
+            'cpu_profile': stats_text.getvalue(),
+        }
+        try:
+            self._write(report)
+        except OSError as e:
+            log.warning(f"PROFILING: Could not write report: {str(e)}")
+            return None
+        peak_text = f"peak {memory['peak_bytes'] / 1_048_576:.1f} MiB" if memory['traced'] else "memory not traced"
+        log.info(f"PROFILING: {report['endpoint']} took {wall:.3f}s ({peak_text}) - report {report_id}")
+        return report_id
+
+    def _write(self, report: Dict) -> None:
+        """Write a report atomically and drop the oldest beyond max_reports"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{report['id']}.json")
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        os.replace(path + '.tmp', path)
+        for report_id in self.list_reports()[self.max_reports:]:
+            try:
+                os.remove(os.path.join(self.directory, f"{report_id}.json"))
+            except OSError:
+                pass
+
+    def list_reports(self) -> List[str]:
+        """Report ids, newest first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith('.json') and _REPORT_ID.match(name[:-5])]
+        return sorted(ids, reverse=True)
+
+    def read_report(self, report_id: str) -> Optional[Dict]:
+        if not _REPORT_ID.match(report_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{report_id}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+# Global instance (loaded once at startup)
+_profiler = None
+
+def get_profiler() -> RequestProfiler:
+    """Get or create the request profiler (stage tracing is switched on when enabled)"""
+    global _profiler
+    if _profiler is None:
+        _profiler = RequestProfiler.from_env()
+        request_context.STAGE_TRACING = _profiler.enabled
+    return _profiler
+
+
+def profile_request(view: Callable) -> Callable:
+    """Decorator profiling selected requests; returns the view unchanged when profiling is off"""
+    profiler = get_profiler()
+    if not profiler.enabled:
+        return view
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        profiler.enter()
+        try:
+            if profiler.should_profile(request):
+                return profiler.run(view, request, *args, **kwargs)
+            return view(request, *args, **kwargs)
+        finally:
+            profiler.exit()
+    return wrapper
@@ -0,0 +1,189 @@
+"""
+Nyaya-Sahayak Prompt Packing
+Purpose: Assemble retrieved chunks into the prompt without duplicated text, within a token budget
+
+How it works:
+1. Exact duplicates (same text after whitespace/case normalization) and chunks whose text
+   is contained in an earlier chunk (overlapping snippets of one document) are dropped
+2. Near duplicates are found with MinHash signatures over word shingles; a chunk whose
+   estimated Jaccard similarity to a kept chunk reaches the threshold is dropped
+3. Remaining chunks are ordered by relevance (retrieval order when scores are missing)
+4. Chunks are packed greedily into the routed model's context budget using the local
+   token estimator; the best chunk is always kept
+
+Configuration (environment):
+- PROMPT_PACKING_ENABLED: "False" passes retrieved context through unchanged (default: True)
+- PACK_BUDGET_FAST: context token budget for the fast model (default: 2000)
+- PACK_BUDGET_STRONG: context token budget for the strong model (default: 4000)
+- PACK_NEAR_DUP_THRESHOLD: estimated Jaccard similarity treated as duplicate (default: 0.8)
+"""
+
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from .log import SAMPLED, get_logger
+from .tokens import estimate_tokens
+
+log = get_logger('prompt_packing')
+
+# Separator between chunks in a retrieved context
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+_SOURCE_MARKER = re.compile(r'^\[Source:[^\]]*\]\s*')
+_WORD = re.compile(r'\w+')
+
+SHINGLE_SIZE = 3
+NUM_HASHES = 32
+_MAX_HASH = 0xFFFFFFFF
+# Fixed odd multipliers/offsets give independent-enough hash permutations of crc32
+_PERMUTATIONS = [
+    (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode()))
+    for i in range(NUM_HASHES)
+]
+
+
+def chunk_body(chunk: str) -> str:
+    """Chunk text without its leading [Source: ...] marker"""
+    return _SOURCE_MARKER.sub('', chunk, count=1)
+
+
+def normalize_text(text: str) -> str:
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Hashed word shingles of normalized text (the whole text when shorter than size)"""
+    words = text.split()
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode())} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set: Set[int]) -> Tuple[int, ...]:
+    """MinHash signature of a shingle set"""
+    if not shingle_set:
+        return ()
+    return tuple(
+        min(((a * value + b) & _MAX_HASH) for value in shingle_set)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(signature_a: Tuple[int, ...], signature_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    if not signature_a or not signature_b:
+        return 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+class ContextPacker:
+    """Deduplicates, orders and budgets retrieved chunks for one prompt"""
+
+    def __init__(self, enabled: bool = True, budgets: Optional[Dict[str, int]] = None,
+                 near_dup_threshold: float = 0.8):
+        self.enabled = enabled
+        self.budgets = budgets or {'fast': 2000, 'strong': 4000}
+        self.near_dup_threshold = near_dup_threshold
+        self._lock = threading.Lock()
+        self.stats = {'prompts': 0, 'chunks_in': 0, 'chunks_out': 0, 'duplicates': 0,
+                      'over_budget': 0, 'tokens_in': 0, 'tokens_out': 0}
+
+    @classmethod
+    def from_env(cls) -> 'ContextPacker':
+        return cls(
+            enabled=os.getenv('PROMPT_PACKING_ENABLED', 'True') == 'True',
+            budgets={
+                'fast': int(os.getenv('PACK_BUDGET_FAST', '2000')),
+                'strong': int(os.getenv('PACK_BUDGET_STRONG', '4000')),
+            },
+            near_dup_threshold=float(os.getenv('PACK_NEAR_DUP_THRESHOLD', '0.8')),
+        )
+
+    def pack(self, context: str, sources: List[Dict], route: str = 'strong') -> Tuple[str, List[Dict], Dict]:
+        """
+        Pack a retrieved context for the model on a route
+
+        Args:
+            context: Retrieved chunks joined with CHUNK_SEPARATOR
+            sources: Source per chunk (as returned by search_legal_db)
+            route: Model route ('fast' or 'strong') whose budget applies
+
+        Returns:
+            Tuple of (packed_context, sources_of_kept_chunks, report)
+        """
+        chunks = [chunk for chunk in context.split(CHUNK_SEPARATOR) if chunk.strip()] if context else []
+        budget = self.budgets.get(route, max(self.budgets.values()))
+        tokens_in = estimate_tokens(context)
+        # Fallback contexts are not one chunk per source; keep their sources as they are
+        aligned = len(chunks) == len(sources)
+
+        if not self.enabled or not chunks:
+            return context, sources, {'chunks_in': len(chunks), 'chunks_out': len(chunks),
+                                      'tokens_in': tokens_in, 'tokens_out': tokens_in}
+
+        candidates = self._order(chunks, sources if aligned else [{}] * len(chunks))
+        kept, duplicates = self._deduplicate(candidates)
+
+        packed: List[Tuple[str, Dict]] = []
+        used = 0
+        over_budget = 0
+        for chunk, source in kept:
+            cost = estimate_tokens(chunk)
+            if packed and used + cost > budget:
+                over_budget += 1
+                continue
+            packed.append((chunk, source))
+            used += cost
+
+        packed_context = CHUNK_SEPARATOR.join(chunk for chunk, _ in packed)
+        packed_sources = [source for _, source in packed] if aligned else sources
+        report = {
+            'chunks_in': len(chunks),
+            'chunks_out': len(packed),
+            'duplicates': duplicates,
+            'over_budget': over_budget,
+            'budget': budget,
+            'tokens_in': tokens_in,
+            'tokens_out': estimate_tokens(packed_context),
+        }
+        with self._lock:
+            self.stats['prompts'] += 1
+            for key in ('chunks_in', 'chunks_out', 'duplicates', 'over_budget', 'tokens_in', 'tokens_out'):
+                self.stats[key] += report[key]
+
+        if len(packed) < len(chunks):
+            log.info(f"PROMPT PACKING: {len(packed)}/{len(chunks)} chunk(s) "
+                     f"({duplicates} duplicate, {over_budget} over budget), "
+                     f"~{report['tokens_in']} → ~{report['tokens_out']} tokens", extra=SAMPLED)
+        return packed_context, packed_sources, report
+
+    def _order(self, chunks: List[str], sources: List[Dict]) -> List[Tuple[str, Dict]]:
+        """Highest relevance first; retrieval order is kept when scores are missing"""
+        pairs = list(zip(chunks, sources))
+        scores = [source.get('relevance_score') for source in sources]
+        if all(isinstance(score, (int, float)) for score in scores):
+            pairs.sort(key=lambda pair: pair[1]['relevance_score'], reverse=True)
+        return pairs
+
+    def _deduplicate(self, pairs: List[Tuple[str, Dict]]) -> Tuple[List[Tuple[str, Dict]], int]:
+        """Drop exact, contained and near-duplicate chunks, keeping the first (best) copy"""
+        kept = []
+        kept_texts: List[str] = []
+        kept_signatures: List[Tuple[int, ...]] = []
+        duplicates = 0
+        for chunk, source in pairs:
+            text = normalize_text(chunk_body(chunk))
+            if any(text in other for other in kept_texts):
+                duplicates += 1
+                continue
+            signature = minhash(shingles(text))
+            if any(similarity(signature, other) >= self.near_dup_threshold for other in kept_signatures):
+                duplicates += 1
+                continue
+            kept.append((chunk, source))
+            kept_texts.append(text)
+            kept_signatures.append(signature)
+        return kept, duplicates
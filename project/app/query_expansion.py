@@ -0,0 +1,196 @@
+"""
+Nyaya-Sahayak Query Expansion
+Purpose: Turn one question into a few focused sub-queries and fuse their retrieval results
+
+How it works:
+1. Key terms are extracted locally: offences, remedies and procedures from fixed
+   vocabularies, plus the most distinctive remaining words (and caller hints such as a
+   contract clause's title and critical terms)
+2. Templates turn them into sub-queries ("punishment for cheating",
+   "remedy of refund", "procedure for legal notice"); the original query always comes first
+3. The sub-queries are retrieved concurrently on the 'fanout' pool (each retrieval
+   uses the 'upstream'/'shards' pools itself), so wall-clock time is about one retrieval
+4. Results are fused with reciprocal rank fusion and exact duplicates are dropped;
+   near duplicates are left to prompt packing
+
+Configuration (environment):
+- QUERY_EXPANSION_ENABLED: "False" retrieves with the single query only (default: True)
+- QUERY_EXPANSION_MAX: maximum sub-queries including the original (default: 4)
+- QUERY_EXPANSION_DEADLINE: seconds after fan-out the extra sub-queries may take; the
+  original query is always waited for (default: 8.0)
+- FANOUT_POOL_SIZE: worker threads for concurrent sub-query retrieval (default: 16)
+"""
+
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .binary_index import tokenize
+from .concurrency import submit
+from .context_compression import split_sentences
+from .log import SAMPLED, get_logger
+from .prompt_packing import CHUNK_SEPARATOR, chunk_body, normalize_text
+
+log = get_logger('query_expansion')
+
+# Key-term vocabularies → sub-query templates
+OFFENCE_TERMS = [
+    'cheating', 'fraud', 'forgery', 'theft', 'extortion', 'defamation', 'criminal breach of trust',
+    'criminal intimidation', 'harassment', 'cruelty', 'dowry', 'assault', 'trespass',
+    'dishonour of cheque', 'cheque bounce', 'bribery', 'identity theft', 'hacking', 'data theft',
+    'misappropriation', 'negligence', 'stalking', 'obscenity',
+]
+REMEDY_TERMS = [
+    'compensation', 'refund', 'damages', 'injunction', 'specific performance', 'replacement',
+    'reinstatement', 'maintenance', 'bail', 'eviction', 'rescission', 'penalty', 'interest',
+    'termination', 'indemnity', 'gratuity', 'wages',
+]
+PROCEDURE_TERMS = [
+    'legal notice', 'notice', 'complaint', 'fir', 'appeal', 'limitation', 'limitation period',
+    'arbitration', 'jurisdiction', 'summons', 'registration', 'consumer commission', 'mediation',
+    'stamp duty', 'lock-in', 'notice period', 'probation', 'non-compete', 'confidentiality',
+]
+TEMPLATES = {
+    'offence': "punishment for {term}",
+    'remedy': "remedy of {term}",
+    'procedure': "procedure for {term}",
+}
+
+# Words that carry no retrieval signal in questions and clauses
+_FILLER = {
+    'legal', 'law', 'laws', 'provisions', 'provision', 'relevant', 'requirements', 'restrictions',
+    'party', 'parties', 'agreement', 'contract', 'clause', 'hereby', 'herein', 'thereof', 'said',
+    'per', 'please', 'tell', 'want', 'know', 'need', 'get', 'also', 'about', 'whether', 'would',
+    'should', 'may', 'must', 'has', 'have', 'was', 'were', 'not', 'no', 'all', 'their', 'there',
+    'they', 'them', 'we', 'our', 'you', 'your', 'he', 'she', 'his', 'her',
+}
+
+
+def _find_terms(text: str, vocabulary: List[str]) -> List[str]:
+    """Whole-word (or plural) vocabulary terms in text, longest first, skipping terms inside a longer match"""
+    found = []
+    for term in sorted(vocabulary, key=len, reverse=True):
+        # 'fir' must not match "first" or "firm"
+        if re.search(rf'(?<!\w){re.escape(term)}s?(?!\w)', text) and not any(term in other for other in found):
+            found.append(term)
+    return found
+
+
+class QueryExpander:
+    """Local sub-query generation and concurrent fan-out retrieval"""
+
+    def __init__(self, enabled: bool = True, max_queries: int = 4, deadline: float = 8.0):
+        self.enabled = enabled
+        self.max_queries = max_queries
+        self.deadline = deadline
+
+    @classmethod
+    def from_env(cls) -> 'QueryExpander':
+        return cls(
+            enabled=os.getenv('QUERY_EXPANSION_ENABLED', 'True') == 'True',
+            max_queries=int(os.getenv('QUERY_EXPANSION_MAX', '4')),
+            deadline=float(os.getenv('QUERY_EXPANSION_DEADLINE', '8.0')),
+        )
+
+    def expand(self, query: str, hints: Optional[List[str]] = None) -> List[str]:
+        """
+        Generate sub-queries for a question
+
+        Args:
+            query: The question (or clause text) to retrieve for
+            hints: Extra key terms from the caller (e.g. a clause title and critical terms)
+
+        Returns:
+            Sub-queries, the original query first, at most max_queries
+        """
+        if not self.enabled or self.max_queries <= 1:
+            return [query]
+
+        text = f"{query} {' '.join(hints or [])}".lower()
+        candidates = []
+        for kind, vocabulary in (('offence', OFFENCE_TERMS), ('remedy', REMEDY_TERMS),
+                                 ('procedure', PROCEDURE_TERMS)):
+            candidates.extend(TEMPLATES[kind].format(term=term) for term in _find_terms(text, vocabulary)[:2])
+
+        # Distinctive words not already covered by a template
+        covered = set(tokenize(' '.join(candidates)))
+        words = [word for word in tokenize(text) if word not in _FILLER and word not in covered
+                 and len(word) > 3 and not word.isdigit()]
+        top_words = [word for word, _ in Counter(words).most_common(4)]
+        if len(top_words) >= 2:
+            candidates.append(' '.join(top_words))
+
+        queries = [query]
+        seen = {normalize_text(query)}
+        for candidate in candidates:
+            key = normalize_text(candidate)
+            if key not in seen:
+                seen.add(key)
+                queries.append(candidate)
+        return queries[:self.max_queries]
+
+    def retrieve(self, queries: List[str], search: Callable[[str], Tuple[str, List[Dict]]],
+                 limit: int) -> Tuple[str, List[Dict], Dict]:
+        """
+        Run search for every sub-query concurrently and fuse the results
+
+        Args:
+            queries: Sub-queries (original first)
+            search: Retrieval function returning (context, sources) for one query
+            limit: Maximum fused chunks
+
+        Returns:
+            Tuple of (context, sources, report)
+        """
+        if len(queries) == 1:
+            context, sources = search(queries[0])
+            return context, sources, {'queries': queries, 'completed': 1}
+
+        deadline = time.monotonic() + self.deadline
+        futures = [submit(search, query, pool='fanout') for query in queries]
+        # The original query is always waited for; the extra sub-queries share one deadline
+        wait(futures[:1])
+        wait(futures[1:], timeout=max(0.0, deadline - time.monotonic()))
+        results = []
+        for query, future in zip(queries, futures):
+            if not future.done():
+                future.cancel()
+                log.warning(f"QUERY EXPANSION: Sub-query timed out: {query[:60]}")
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                log.warning(f"QUERY EXPANSION: Sub-query failed ({query[:60]}): {str(e)}")
+
+        # Reciprocal rank fusion over chunk text; fallback contexts without one source
+        # per chunk are fused as a single unit
+        fused: Dict[str, List] = {}
+        for context, sources in results:
+            chunks = [chunk for chunk in context.split(CHUNK_SEPARATOR) if chunk.strip()] if context else []
+            units = (list(zip(chunks, ([source] for source in sources)))
+                     if len(chunks) == len(sources) else ([(context, sources)] if context else []))
+            for rank, (chunk, chunk_sources) in enumerate(units):
+                key = normalize_text(chunk_body(chunk))
+                entry = fused.setdefault(key, [0.0, chunk, chunk_sources])
+                entry[0] += 1.0 / (60 + rank)
+
+        ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:limit]
+        context = CHUNK_SEPARATOR.join(chunk for _, chunk, _ in ranked)
+        sources = [source for _, _, chunk_sources in ranked for source in chunk_sources]
+        report = {'queries': queries, 'completed': len(results), 'chunks': len(ranked)}
+        log.info(f"QUERY EXPANSION: {len(results)}/{len(queries)} sub-queries → {len(ranked)} fused chunk(s)",
+                 extra=SAMPLED)
+        return context, sources, report
+
+
+def clause_hints(clause: Dict) -> List[str]:
+    """Expansion hints from an extracted contract clause (title, critical terms, first sentence)"""
+    hints = [clause.get('title', '')]
+    hints.extend(term for term in clause.get('critical_terms', []) if isinstance(term, str))
+    sentences = split_sentences(clause.get('text', ''))
+    if sentences:
+        hints.append(sentences[0][:300])
+    return [hint for hint in hints if hint]
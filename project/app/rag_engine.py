@@ -11,15 +11,62 @@ Core Principles:
 """
 
 import os
-from typing import List, Dict, Optional, Tuple
+import time
+import threading
+from typing import Callable, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
-import google.generativeai as genai
-from google.cloud import discoveryengine_v1beta as discoveryengine
-from google.api_core.client_options import ClientOptions
+
+from .cassettes import get_cassette
+from .concurrency import submit
+from .context_compression import ContextCompressor
+from .caches import TTLCache
+from .corpus import DEFAULT_CORPUS_DIR, CorpusWatcher, get_corpus, page_label, set_corpus
+from .fallback_kb import get_fallback_kb
+from .hedging import Hedger, hedge_max_output_tokens
+from .log import SAMPLED, get_logger
+from .metrics import STAGE_SECONDS, count_error, count_event, span, stats_samples
+from .model_router import ModelRouter
+from .prompt_packing import CHUNK_SEPARATOR, ContextPacker
+from .query_expansion import QueryExpander
+from .retrieval_depth import DepthPolicy
+from .retrieval_gate import LOCAL, get_retrieval_gate
+from .shard_router import ShardRouter, parse_data_store_shards
+from .startup import LazyModule
+from .statute_index import get_statute_index
+from .usage import get_usage_ledger, record_model_call
+from .web_fallback import WebFallback, normalize_query
+
+# Heavy client libraries are imported on first use (see startup.py)
+genai = LazyModule('google.generativeai')
+discoveryengine = LazyModule('google.cloud.discoveryengine_v1beta')
+
+log = get_logger('rag_engine')
 
 # Load environment variables
 load_dotenv()
 
+# Phrases that mark a grounded answer as OUT OF SCOPE
+FAILURE_PHRASES = [
+    "OUT OF SCOPE",
+    "outside the scope of the indexed",
+    "I do not have enough information",
+    "insufficient information in the context",
+    "not found in the retrieved context"
+]
+
+# Notes on answers that stand in for an upstream failure rather than answering
+GENERATION_ERROR_NOTE = "Generation error"
+WEB_SEARCH_ERROR_NOTE = "Out of scope - web search error"
+
+
+def answer_failure(answer: Dict) -> Optional[str]:
+    """The failure an answer reports instead of raising (generation or web fallback error), else None"""
+    note = answer.get('note') or ''
+    if answer.get('confidence') == 'error' or note.startswith(WEB_SEARCH_ERROR_NOTE):
+        return note or 'Generation error'
+    return None
+
+
 class LegalRAGEngine:
     """
     Strict RAG Engine for Legal Document Retrieval and Generation
@@ -32,9 +79,81 @@ class LegalRAGEngine:
         self.data_store_id = os.getenv('DATA_STORE_ID')  # Vertex AI Search data store
         self.api_key = os.getenv('GOOGLE_API_KEY')
         
-        # Configure Gemini
+        # Upstream traffic can be recorded to / replayed from a cassette (see cassettes.py)
+        self.cassette = get_cassette()
+        
+        # Configure Gemini (fast/strong model routing)
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro-latest')
+        self.router = ModelRouter.from_env()
+        self._models = {}
+        self.model = self.get_model(self.router.strong_model)
+        
+        # Hedged upstream calls (optional) + per-operation latency tracking
+        self.hedger = Hedger.from_env()
+        self._search_client = None
+        
+        # Locally ingested Bare Act corpus (manage.py ingest_bare_acts), if any
+        self.corpus = get_corpus()
+        
+        # Retrieval and answer caches, tagged with the Acts they cite so a corpus
+        # update invalidates only the affected entries (TTL 0 disables a cache)
+        self.retrieval_cache_ttl = float(os.getenv('RETRIEVAL_CACHE_TTL', '600'))
+        self.answer_cache_ttl = float(os.getenv('ANSWER_CACHE_TTL', '600'))
+        self.retrieval_cache = TTLCache(maxsize=int(os.getenv('RETRIEVAL_CACHE_SIZE', '1024')),
+                                        ttl=self.retrieval_cache_ttl)
+        self.answer_cache = TTLCache(maxsize=int(os.getenv('ANSWER_CACHE_SIZE', '512')),
+                                     ttl=self.answer_cache_ttl)
+        
+        # New corpus versions are picked up in the background without a restart
+        # (not with Vertex AI Search, where retrieval never reads the local corpus)
+        self._corpus_watcher = None
+        reload_interval = float(os.getenv('CORPUS_RELOAD_INTERVAL', '30'))
+        if reload_interval > 0 and not self.data_store_id:
+            self._corpus_watcher = CorpusWatcher(
+                os.getenv('CORPUS_DIR', DEFAULT_CORPUS_DIR),
+                self.corpus,
+                self._on_corpus_reload,
+                interval=reload_interval
+            )
+            self._corpus_watcher.start()
+        
+        # Fallback topic table for when Vertex AI Search is not configured
+        self.fallback_kb = get_fallback_kb()
+        
+        # Web fallback providers (raced under a deadline, results cached by normalized query)
+        self.web_fallback = WebFallback.from_env()
+        
+        # Speculative web fallback: when retrieval scores are weak, start the web
+        # search alongside generation and cut the stream on the first failure phrase
+        self.speculative_fallback = os.getenv('SPECULATIVE_FALLBACK_ENABLED', 'True') == 'True'
+        self.speculative_score_threshold = float(os.getenv('SPECULATIVE_SCORE_THRESHOLD', '0.5'))
+        self.speculation_stats = {'launched': 0, 'used': 0, 'discarded': 0}
+        self._stats_lock = threading.Lock()
+        
+        # Explicit section citations ("Section 420 IPC") skip semantic search:
+        # auto = pure lookups answered without the LLM, others with a compact prompt
+        # prompt = always a compact prompt, off = disabled
+        self.statute_index = get_statute_index()
+        self.statute_fastpath = os.getenv('STATUTE_FASTPATH', 'auto')
+        
+        # Act-sharded retrieval: local corpus shards and optional per-Act data stores
+        self.shard_router = ShardRouter.from_env(self.statute_index, self.fallback_kb)
+        self.data_store_shards = parse_data_store_shards(os.getenv('DATA_STORE_SHARDS', ''))
+        
+        # Adaptive top-k: fetch a wider candidate set, keep as many as the scores justify
+        self.depth_policy = DepthPolicy.from_env()
+        
+        # Prompt assembly: drop duplicate chunks, pack the rest into the model's budget
+        self.context_packer = ContextPacker.from_env()
+        
+        # Extractive compression: keep only the sentences relevant to the question
+        self.context_compressor = ContextCompressor.from_env()
+        
+        # Multi-query retrieval for clause verification and uploaded evidence
+        self.query_expander = QueryExpander.from_env()
+        
+        # Evidence questions answerable from the upload alone skip retrieval
+        self.retrieval_gate = get_retrieval_gate()
         
         # System prompt for strict RAG with crisp lawyer persona
         self.SYSTEM_PROMPT = """You are a Senior Legal Counsel specializing in Indian Law. Respond in a CRISP, LAWYER-LIKE manner.
@@ -79,64 +198,105 @@ MANDATORY TONE & TERMINOLOGY:
 
 Respond using ONLY the retrieved context below. Maximum brevity. Legal precision."""
 
-    def search_legal_db(self, query: str, top_k: int = 3) -> Tuple[str, List[Dict]]:
+    def search_legal_db(self, query: str, top_k: int = 3,
+                        depth_info: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
         """
         Search Vertex AI Data Store for relevant legal provisions
         
         Args:
             query: User's legal query
-            top_k: Number of top results to retrieve (default: 3)
+            top_k: Baseline number of results; the depth policy may keep fewer or more
+            depth_info: Optional dict filled with the retrieval depth decision
+            
+        Returns:
+            Tuple of (concatenated_context, list_of_sources)
+        """
+        if self.retrieval_cache_ttl <= 0:
+            context, sources, depth = self._search_legal_db(query, top_k)
+        else:
+            key = (normalize_query(query), top_k)
+            cached = self.retrieval_cache.get(key)
+            if cached is not None:
+                context, sources, depth = cached
+                depth = dict(depth, cached=True) if depth else depth
+            else:
+                context, sources, depth = self._search_legal_db(query, top_k)
+                if context:
+                    self.retrieval_cache.set(key, (context, sources, depth),
+                                             tags=self._source_tags(sources))
+        
+        if depth_info is not None:
+            if depth:
+                depth_info.update(depth)
+            elif context:
+                # Fallback knowledge base / web results: curated text, not retrieved chunks
+                depth_info['fallback'] = True
+        return context, sources
+    
+    def search_legal_db_expanded(self, query: str, top_k: int = 3, hints: Optional[List[str]] = None,
+                                 depth_info: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
+        """
+        Retrieve with locally generated sub-queries searched concurrently, results fused
+        
+        Args:
+            query: User's legal query (always searched)
+            top_k: Baseline results per sub-query
+            hints: Extra key terms for sub-query generation (e.g. clause title and terms)
+            depth_info: Optional dict filled with the expansion report (and 'fallback'
+                        when any sub-query was answered from the fallback chain)
             
         Returns:
             Tuple of (concatenated_context, list_of_sources)
         """
+        if self.data_store_id or self.corpus is not None:
+            queries = self.query_expander.expand(query, hints)
+        else:
+            # No retriever backend: every sub-query would land on the same fallback chain
+            # (topic table, then web search), so it runs once for the original query
+            queries = [query]
+        sub_depths = []
+        
+        def search(sub_query: str) -> Tuple[str, List[Dict]]:
+            info = {}
+            sub_depths.append(info)
+            return self.search_legal_db(sub_query, top_k, depth_info=info)
+        
+        context, sources, report = self.query_expander.retrieve(queries, search, limit=top_k * 2)
+        if depth_info is not None:
+            depth_info['expansion'] = report
+            if any(info.get('fallback') for info in sub_depths):
+                depth_info['fallback'] = True
+        return context, sources
+    
+    def _search_legal_db(self, query: str, top_k: int) -> Tuple[str, List[Dict], Optional[Dict]]:
+        """Uncached retrieval: Vertex AI Search, else the local corpus, else fallbacks"""
+        fetch_k = self.depth_policy.fetch_size(top_k)
         try:
             # Check if data store is configured
             if not self.data_store_id:
-                return self._fallback_context(query)
-            
-            # Create Discovery Engine client
-            client_options = ClientOptions(
-                api_endpoint=f"{self.location}-discoveryengine.googleapis.com"
-            )
-            client = discoveryengine.SearchServiceClient(client_options=client_options)
-            
-            # Configure search request
-            serving_config = f"projects/{self.project_id}/locations/{self.location}/collections/default_collection/dataStores/{self.data_store_id}/servingConfigs/default_config"
-            
-            # Content search request
-            content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
-                snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
-                    return_snippet=True,
-                    max_snippet_count=5
-                ),
-                extractive_content_spec=discoveryengine.SearchRequest.ContentSearchSpec.ExtractiveContentSpec(
-                    max_extractive_segment_count=3,
-                    max_extractive_answer_count=1
-                )
-            )
+                return self._search_local_corpus(query, top_k, fetch_k)
             
-            request = discoveryengine.SearchRequest(
-                serving_config=serving_config,
-                query=query,
-                page_size=top_k,
-                content_search_spec=content_search_spec,
-                query_expansion_spec=discoveryengine.SearchRequest.QueryExpansionSpec(
-                    condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
-                ),
-                spell_correction_spec=discoveryengine.SearchRequest.SpellCorrectionSpec(
-                    mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
+            # Per-Act data stores: search only the shards the router predicts
+            shards = None
+            if self.data_store_shards:
+                shards = self.shard_router.route(query, list(self.data_store_shards))
+            if shards:
+                results = self._vertex_search_shards(
+                    query, fetch_k, [self.data_store_shards[name] for name in shards]
                 )
-            )
-            
-            # Execute search
-            response = client.search(request)
+                if not results:
+                    log.info("SHARD ROUTER: No results in predicted shards - searching all")
+                    results = self._vertex_search(query, fetch_k, self.data_store_id)
+            else:
+                results = self._vertex_search(query, fetch_k, self.data_store_id)
             
             # Extract context and sources
             context_chunks = []
             sources = []
+            # Search result each chunk came from (a document yields several snippets)
+            groups = []
             
-            for result in response.results:
+            for rank, result in enumerate(results):
                 document = result.document
                 
                 # Extract metadata
@@ -149,28 +309,292 @@ Respond using ONLY the retrieved context below. Maximum brevity. Legal precision
                 # Extract content
                 if hasattr(document.derived_struct_data, 'extractive_answers'):
                     for answer in document.derived_struct_data.extractive_answers:
-                        context_chunks.append(f"[Source: {source_info['filename']}, Page {source_info['page']}]\n{answer.content}")
-                        sources.append(source_info)
+                        source = self._locate_in_corpus(source_info, answer.content)
+                        context_chunks.append(f"[Source: {self._source_label(source)}]\n{answer.content}")
+                        sources.append(source)
+                        groups.append(rank)
                 elif hasattr(document.derived_struct_data, 'snippets'):
                     for snippet in document.derived_struct_data.snippets:
-                        context_chunks.append(f"[Source: {source_info['filename']}, Page {source_info['page']}]\n{snippet.snippet}")
-                        sources.append(source_info)
+                        source = self._locate_in_corpus(source_info, snippet.snippet)
+                        context_chunks.append(f"[Source: {self._source_label(source)}]\n{snippet.snippet}")
+                        sources.append(source)
+                        groups.append(rank)
                 else:
                     # Fallback to structured data
                     content = self._extract_content(document.struct_data)
                     if content:
-                        context_chunks.append(f"[Source: {source_info['filename']}, Page {source_info['page']}]\n{content}")
-                        sources.append(source_info)
+                        source = self._locate_in_corpus(source_info, content)
+                        context_chunks.append(f"[Source: {self._source_label(source)}]\n{content}")
+                        sources.append(source)
+                        groups.append(rank)
             
-            # Combine context
-            full_context = "\n\n---\n\n".join(context_chunks) if context_chunks else ""
-            
-            return full_context, sources
+            return self._cut_to_depth(context_chunks, sources, top_k, groups)
             
         except Exception as e:
-            print(f"Error in search_legal_db: {str(e)}")
+            log.warning(f"Error in search_legal_db: {str(e)}")
+            count_error('retrieval', e)
             # Fallback if Discovery Engine not set up yet
-            return self._fallback_context(query)
+            return self._fallback_context(query) + (None,)
+    
+    def _cut_to_depth(self, context_chunks: List[str], sources: List[Dict], top_k: int,
+                      groups: Optional[List[int]] = None) -> Tuple[str, List[Dict], Dict]:
+        """Keep as many ranked chunks as the depth policy chooses and combine them"""
+        depth = self.depth_policy.choose(
+            context_chunks, [source.get('relevance_score') for source in sources], top_k, groups
+        )
+        kept = depth['depth']
+        if depth['candidates']:
+            log.info(f"RETRIEVAL DEPTH: {kept}/{depth['candidates']} chunk(s) ({depth['reason']}, "
+                     f"~{depth['tokens']} tokens, {depth['tokens_saved']:+d} vs top_k={top_k})", extra=SAMPLED)
+        
+        # Combine context
+        full_context = CHUNK_SEPARATOR.join(context_chunks[:kept]) if kept else ""
+        return full_context, sources[:kept], depth
+    
+    def _vertex_search(self, query: str, top_k: int, data_store_id: str) -> List:
+        """Run one Vertex AI Search request against a data store and return its results"""
+        # Create Discovery Engine client (reused across requests)
+        client = self._get_search_client()
+        
+        # Configure search request
+        serving_config = f"projects/{self.project_id}/locations/{self.location}/collections/default_collection/dataStores/{data_store_id}/servingConfigs/default_config"
+        
+        # Content search request
+        content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
+            snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
+                return_snippet=True,
+                max_snippet_count=5
+            ),
+            extractive_content_spec=discoveryengine.SearchRequest.ContentSearchSpec.ExtractiveContentSpec(
+                max_extractive_segment_count=3,
+                max_extractive_answer_count=1
+            )
+        )
+        
+        request = discoveryengine.SearchRequest(
+            serving_config=serving_config,
+            query=query,
+            page_size=top_k,
+            content_search_spec=content_search_spec,
+            query_expansion_spec=discoveryengine.SearchRequest.QueryExpansionSpec(
+                condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
+            ),
+            spell_correction_spec=discoveryengine.SearchRequest.SpellCorrectionSpec(
+                mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
+            )
+        )
+        
+        # Execute search (hedged if enabled and the call outlives the observed p95)
+        response = self.hedger.call('vertex_search', client.search, request)
+        return list(response.results)
+    
+    def _vertex_search_shards(self, query: str, top_k: int, data_store_ids: List[str]) -> List:
+        """Search several per-Act data stores in parallel; merge by relevance (or interleave)"""
+        futures = [
+            submit(self._vertex_search, query, top_k, data_store_id, pool='shards')
+            for data_store_id in data_store_ids
+        ]
+        per_shard = [future.result() for future in futures]
+        merged = [result for results in per_shard for result in results]
+        
+        if merged and all(getattr(result, 'relevance_score', None) is not None for result in merged):
+            merged.sort(key=lambda result: result.relevance_score, reverse=True)
+        else:
+            # No comparable scores - take each shard's best results in turn
+            merged = [
+                results[rank]
+                for rank in range(max((len(results) for results in per_shard), default=0))
+                for results in per_shard if rank < len(results)
+            ]
+        return merged[:top_k]
+    
+    def _search_local_corpus(self, query: str, top_k: int = 3,
+                             fetch_k: Optional[int] = None) -> Tuple[str, List[Dict], Optional[Dict]]:
+        """
+        BM25 search over the ingested Bare Act corpus (used when no DATA_STORE_ID is set)
+        
+        Fetches fetch_k candidates and cuts them with the depth policy. Falls back to the
+        topic knowledge base when no corpus exists or nothing matches.
+        """
+        corpus = self.corpus
+        if corpus is None:
+            return self._fallback_context(query) + (None,)
+        
+        fetch_k = fetch_k or top_k
+        shards = self.shard_router.route(query, corpus.shard_names)
+        hits = corpus.search(query, top_k=fetch_k, shards=shards)
+        if shards and not hits:
+            log.info("SHARD ROUTER: No hits in predicted shards - searching all")
+            hits = corpus.search(query, top_k=fetch_k)
+        if not hits:
+            return self._fallback_context(query) + (None,)
+        
+        context_chunks = []
+        sources = []
+        for chunk, relevance in hits:
+            source = {
+                'filename': chunk['act'],
+                'page': page_label(chunk),
+                'section': chunk['section'],
+                'relevance_score': relevance
+            }
+            context_chunks.append(f"[Source: {self._source_label(source)}]\n{chunk['text']}")
+            sources.append(source)
+        
+        return self._cut_to_depth(context_chunks, sources, top_k)
+    
+    def _locate_in_corpus(self, source_info: Dict, text: str) -> Dict:
+        """Fill a missing page number (and the section) from the ingested corpus"""
+        if self.corpus is None or source_info['page'] != 'N/A':
+            return source_info
+        chunk = self.corpus.locate(source_info['filename'], text)
+        if chunk is None:
+            return source_info
+        return {**source_info, 'page': page_label(chunk), 'section': chunk['section']}
+    
+    def _source_label(self, source: Dict) -> str:
+        """Context header for a source: 'Act, Section X, Page N'"""
+        if source.get('section'):
+            return f"{source['filename']}, Section {source['section']}, Page {source['page']}"
+        return f"{source['filename']}, Page {source['page']}"
+    
+    def _source_tags(self, sources: List[Dict]) -> List[str]:
+        """Cache tags for the documents a result depends on (lowercase Act / file names)"""
+        tags = set()
+        for source in sources:
+            name = source.get('filename') or source.get('document')
+            if name:
+                tags.add(name.lower())
+        return sorted(tags)
+    
+    def _on_corpus_reload(self, corpus, changed_tags) -> None:
+        """Swap in a new corpus version and drop cache entries citing changed Acts"""
+        self.corpus = corpus
+        set_corpus(corpus)
+        removed = (self.retrieval_cache.invalidate_tags(changed_tags)
+                   + self.answer_cache.invalidate_tags(changed_tags))
+        log.info(f"Corpus version {corpus.version} live; invalidated {removed} cached entries")
+    
+    def collect_metrics(self):
+        """Component stats for /metrics: (name, type, help, samples)"""
+        yield ('nyaya_router', 'gauge', 'Model router decisions and escalations',
+               stats_samples(self.router.snapshot()))
+        yield ('nyaya_hedger', 'gauge', 'Hedged upstream call counters', stats_samples(self.hedger.stats))
+        yield ('nyaya_upstream_latency_seconds', 'gauge', 'Rolling upstream latency per operation', [
+            ({'op': op, 'quantile': str(q)}, value)
+            for op, percentiles in self.hedger.latency_percentiles().items()
+            for q, value in percentiles.items()
+        ])
+        yield ('nyaya_speculation', 'gauge', 'Speculative web fallback outcomes',
+               stats_samples(self.speculation_stats))
+        yield ('nyaya_cache', 'gauge', 'Cache hits, misses and sizes', [
+            ({'cache': name, 'key': key}, value)
+            for name, cache in (('retrieval', self.retrieval_cache), ('answer', self.answer_cache),
+                                ('web', self.web_fallback.cache))
+            for key, value in (('hits', cache.hits), ('misses', cache.misses), ('size', len(cache)))
+        ])
+        yield ('nyaya_shard_router', 'gauge', 'Shard routing counters', stats_samples(self.shard_router.stats))
+        yield ('nyaya_retrieval_depth', 'gauge', 'Adaptive retrieval depth totals',
+               stats_samples(self.depth_policy.stats))
+        yield ('nyaya_prompt_packing', 'gauge', 'Prompt packing totals', stats_samples(self.context_packer.stats))
+        yield ('nyaya_compression', 'gauge', 'Context compression totals',
+               stats_samples(self.context_compressor.stats))
+        yield ('nyaya_retrieval_gate', 'gauge', 'Evidence retrieval gate decisions and seconds',
+               stats_samples(self.retrieval_gate.snapshot()))
+        if self.cassette.active:
+            yield ('nyaya_cassette', 'gauge', 'Recorded / replayed upstream interactions',
+                   stats_samples(self.cassette.snapshot(), {'mode': self.cassette.mode}))
+        yield ('nyaya_model_usage', 'counter', 'Model calls, tokens and estimated cost by endpoint and stage', [
+            ({'endpoint': endpoint, 'stage': stage, 'key': key}, value)
+            for (endpoint, stage), totals in sorted(get_usage_ledger().snapshot().items())
+            for key, value in totals.items()
+        ])
+    
+    def _get_search_client(self):
+        """Create the Discovery Engine client once and reuse it"""
+        if self._search_client is None:
+            client = None
+            if self.cassette.mode != 'replay':
+                from google.api_core.client_options import ClientOptions
+                client_options = ClientOptions(
+                    api_endpoint=f"{self.location}-discoveryengine.googleapis.com"
+                )
+                client = discoveryengine.SearchServiceClient(client_options=client_options)
+            self._search_client = self.cassette.wrap_search_client(client)
+        return self._search_client
+    
+    def get_model(self, model_name: str):
+        """Get a cached GenerativeModel instance by name"""
+        model = self._models.get(model_name)
+        if model is None:
+            model = self.cassette.wrap_model(genai.GenerativeModel(model_name), model_name)
+            self._models[model_name] = model
+        return model
+    
+    def is_out_of_scope(self, response_text: str) -> bool:
+        """Check whether a generated answer contains an OUT OF SCOPE trigger"""
+        text_lower = response_text.lower()
+        return any(phrase.lower() in text_lower for phrase in FAILURE_PHRASES)
+    
+    def generate_routed(self, decision: Dict, contents, generation_config=None, op: str = 'gemini',
+                        needs_escalation: Optional[Callable[[str], bool]] = None):
+        """
+        Generate on the model chosen by the router, escalating weak fast-model answers once
+        
+        Args:
+            decision: Routing decision from self.router.route()
+            contents: Prompt (string or list of parts)
+            generation_config: Optional GenerationConfig
+            op: Operation name for latency tracking
+            needs_escalation: Optional check marking an answer as low-confidence
+            
+        Returns:
+            The Gemini response object that was kept
+        """
+        start = time.perf_counter()
+        response = self.generate_content(self.get_model(decision['model']), contents,
+                                         generation_config, op=op)
+        response_text = response.text
+        is_failure = needs_escalation(response_text) if needs_escalation else False
+        
+        escalated = self.router.should_escalate(decision, response_text, is_failure)
+        if escalated:
+            response = self.generate_content(self.get_model(self.router.strong_model), contents,
+                                             generation_config, op=op)
+        
+        self.router.record(decision, time.perf_counter() - start, escalated)
+        return response
+    
+    def generate_content(self, model, contents, generation_config=None, op: str = 'gemini'):
+        """
+        Call model.generate_content, hedging short generations
+        
+        Args:
+            model: genai.GenerativeModel to call
+            contents: Prompt (string or list of parts)
+            generation_config: Optional GenerationConfig
+            op: Operation name for latency tracking
+            
+        Returns:
+            The Gemini response object
+        """
+        max_tokens = getattr(generation_config, 'max_output_tokens', None)
+        model_name = getattr(model, 'model_name', '')
+        
+        def attempt(*args, **kwargs):
+            # Recorded per attempt: a hedged duplicate and a failed call are billed too
+            try:
+                response = model.generate_content(*args, **kwargs)
+            except Exception:
+                record_model_call(op, model_name, contents, failed=True)
+                raise
+            record_model_call(op, model_name, contents, response)
+            return response
+        
+        with span(op):
+            if max_tokens and max_tokens <= hedge_max_output_tokens():
+                return self.hedger.call(f'{op}_short', attempt, contents, generation_config=generation_config)
+            return self.hedger.timed(op, attempt, contents, generation_config=generation_config)
     
     def _extract_filename(self, struct_data) -> str:
         """Extract PDF filename from document metadata"""
@@ -211,161 +635,38 @@ Respond using ONLY the retrieved context below. Maximum brevity. Legal precision
         Fallback when Vertex AI Search is not configured yet
         Provides basic legal context for common queries until Data Store is set up
         """
-        print("WARNING: Using fallback context - Vertex AI Search not configured")
-        
-        # Temporary knowledge base for common legal queries
-        # TODO: Replace with proper Vertex AI Search Data Store
-        query_lower = query.lower()
-        
-        # Landlord-Tenant Law
-        if any(keyword in query_lower for keyword in ['landlord', 'tenant', 'rent', 'security deposit', 'lease', 'eviction']):
-            context = """[Source: Transfer of Property Act, 1882 - Section 108]
-
-**Security Deposit and Rental Agreements**
-
-Section 108 of the Transfer of Property Act, 1882 governs the rights and liabilities of lessors and lessees.
-
-**Lessee's Rights:**
-(j) The lessee has the right to be repaid all non-default money paid to the lessor which the lessor, by law or contract, is bound to repay to the lessee;
-
-**Lessor's Obligations:**
-- The lessor is bound to  refund the security deposit to the lessee after the lease period ends, subject to deductions for:
-  1. Unpaid rent or charges
-  2. Damages to the property beyond normal wear and tear
-  3. Other valid contractual deductions
-
-**Legal Remedy:**
-If a landlord wrongfully withholds the security deposit, the tenant can:
-1. Send a legal notice demanding refund (typically 15-30 days notice)
-2. File a civil suit for recovery of money in Small Causes Court or Civil Court
-3. Claim interest on the withheld amount as per Contract Act, 1872
-4. In case of rental control areas, approach the Rent Control Authority
-
-**Applicable Provisions:**
-- Transfer of Property Act, 1882 (Section 108)
-- Contract Act, 1872 (Section 73 - Damages for breach of contract)
-- State-specific Rent Control Acts (varies by state)
-- Consumer Protection Act, 2019 (if rental services are involved)
-
-**Time Limit for Refund:**
-While there's no specific statutory limit, courts generally expect refund within a reasonable time (typically 30-60 days after lease termination and property handover)."""
-
-            sources = [{
-                'filename': 'Transfer of Property Act, 1882',
-                'page': 'Section 108',
-                'relevance_score': 0.9
-            }]
-            return context, sources
-        
-        # Consumer Rights
-        elif any(keyword in query_lower for keyword in ['consumer', 'defective product', 'refund', 'warranty', 'e-commerce']):
-            context = """[Source: Consumer Protection Act, 2019]
-
-**Consumer Rights under Consumer Protection Act, 2019**
-
-**Consumer Rights:**
-1. Right to be protected against hazardous goods/services
-2. Right to be informed about quality, quantity, potency, purity, standard and price
-3. Right to be assured of access to variety of goods/services at competitive prices
-4. Right to seek redressal against unfair trade practices
-
-**Remedies Available:**
-- Replacement of defective goods
-- Removal of defects in goods
-- Refund of price paid
-- Compensation for any loss or injury suffered
-
-**E-Commerce Protections:**
-E-commerce platforms must display details of sellers, terms of contract, grievance officer details, and expeditious redressal of complaints."""
-
-            sources = [{
-                'filename': 'Consumer Protection Act, 2019',
-                'page': 'Sections 2, 16, 18',
-                'relevance_score': 0.9
-            }]
-            return context, sources
-        
-        # Cheque Bounce
-        elif any(keyword in query_lower for keyword in ['cheque', 'bounce', 'dishonor', 'check']):
-            context = """[Source: Negotiable Instruments Act, 1881 - Section 138]
-
-**Cheque Dishonour - Section 138**
-
-Offence when cheque is returned unpaid due to insufficient funds or signature mismatch.
-
-**Punishment:**
-- Imprisonment up to 2 years, OR
-- Fine up to twice the cheque amount, OR
-- Both
-
-**Legal Procedure:**
-1. Cheque bounces → Bank issues memo
-2. Legal Notice within 30 days of bounce memo
-3. 15-day window for drawer to make payment
-4. File complaint within 30 days after 15-day period expires"""
-
-            sources = [{
-                'filename': 'Negotiable Instruments Act, 1881',
-                'page': 'Section 138',
-                'relevance_score': 0.9
-            }]
-            return context, sources
+        log.warning("Using fallback context - Vertex AI Search not configured")
+        count_event('topic_fallback')
         
-        # Labor Law
-        elif any(keyword in query_lower for keyword in ['salary', 'wage', 'termination', 'employee', 'employer', 'resignation']):
-            context = """[Source: Industrial Disputes Act, 1947 & Payment of Wages Act, 1936]
-
-**Employment Rights**
-
-**Salary Payment:**
-- Must be paid by 7th-10th of next month
-- Delayed payment attracts interest
-
-**Termination:**
-- Workers with 240+ days require one month notice or wages in lieu
-- Retrenchment compensation: 15 days average pay per completed year
-
-**Resignation:**
-- Employee must provide notice as per contract
-- Employer cannot withhold salary/certificates illegally"""
-
-            sources = [{
-                'filename': 'Industrial Disputes Act, 1947',
-                'page': 'Section 25F',
-                'relevance_score': 0.85
-            }]
+        # Topic table matched with one compiled automaton (see fallback_kb.py)
+        match = self.fallback_kb.lookup(query)
+        if match is not None:
+            context, sources, topic_ids = match
+            log.info(f"FALLBACK: Matched topic(s): {', '.join(topic_ids)}", extra=SAMPLED)
             return context, sources
         
         # For truly out-of-scope queries
-        else:
-            print(f"Query topic not in temporary knowledge base: {query[:100]}")
-            # Try Google Search as final fallback
-            return self._google_search_fallback(query)
+        log.info(f"Query topic not in temporary knowledge base: {query[:100]}", extra=SAMPLED)
+        # Try Google Search as final fallback
+        return self._google_search_fallback(query)
     
     def _google_search_fallback(self, query: str) -> Tuple[str, List[Dict]]:
         """
-        Final fallback using Google Search for verifiable legal sources
-        Filters for .gov.in and indiankanoon.org domains
+        Final fallback using web search for verifiable legal sources
+        Providers are raced under a deadline and results are cached (see web_fallback.py)
         """
-        try:
-            from googlesearch import search
-            
-            print(f"FALLBACK: Attempting Google Search for: {query[:100]}")
-            
-            # Construct search query with legal domain filters
-            search_query = f"{query} site:gov.in OR site:indiankanoon.org OR site:legislative.gov.in"
-            
-            # Get top 3 results
-            search_results = []
-            for url in search(search_query, num_results=3, sleep_interval=1):
-                search_results.append(url)
-            
-            if not search_results:
-                print("No results from Google Search fallback")
-                return "", []
-            
-            # Build context from search results
-            context = f"""[Google Search Results - Verifiable Legal Sources]
+        log.info(f"FALLBACK: Attempting web search for: {query[:100]}")
+        count_event('web_search_context')
+        
+        with span('web_fallback'):
+            search_results = self.web_fallback.search(query)['results'][:3]
+        
+        if not search_results:
+            log.info("No results from web search fallback")
+            return "", []
+        
+        # Build context from search results
+        context = f"""[Web Search Results - Verifiable Legal Sources]
 
 **DISCLAIMER:** The following information is sourced from external legal databases. For definitive legal advice, consult a qualified advocate.
 
@@ -373,30 +674,23 @@ Offence when cheque is returned unpaid due to insufficient funds or signature mi
 
 **Relevant Legal Resources Found:**
 """
-            
-            sources = []
-            for idx, url in enumerate(search_results, 1):
-                context += f"\n{idx}. {url}"
-                sources.append({
-                    'filename': f'External Source {idx}',
-                    'page': url,
-                    'relevance_score': 0.7 - (idx * 0.1)
-                })
-            
-            context += f"""\n\n**Recommendation:**
+        
+        sources = []
+        for idx, result in enumerate(search_results, 1):
+            context += f"\n{idx}. {result['href']}"
+            sources.append({
+                'filename': f'External Source {idx}',
+                'page': result['href'],
+                'relevance_score': 0.7 - (idx * 0.1)
+            })
+        
+        context += f"""\n\n**Recommendation:**
 • Review the above government/legal database sources
 • Verify applicability to your specific case
 • Consult an advocate for personalized legal guidance
 • Check for recent amendments or case law updates"""
 
-            return context, sources
-            
-        except ImportError:
-            print("ERROR: googlesearch-python not installed. Install with: pip install googlesearch-python")
-            return "", []
-        except Exception as e:
-            print(f"ERROR in Google Search fallback: {str(e)}")
-            return "", []
+        return context, sources
     
     def _perform_web_search_fallback(self, query: str) -> Dict:
         """
@@ -408,17 +702,18 @@ Offence when cheque is returned unpaid due to insufficient funds or signature mi
         Returns:
             Dict with web search results formatted for legal context
         """
-        print(f"FALLBACK MODE: Performing web search for query: {query}")
+        log.info(f"FALLBACK MODE: Performing web search for query: {query}")
+        count_event('web_fallback')
         
         try:
-            from duckduckgo_search import DDGS
-            
-            # Construct Indian law-focused search query
-            search_query = f"Indian law {query} legal penalty provisions sections"
+            # Providers raced under a deadline; repeated queries are served from cache
+            with span('web_fallback'):
+                outcome = self.web_fallback.search(query)
+            results = outcome['results']
             
-            # Perform web search
-            ddgs = DDGS()
-            results = ddgs.text(search_query, max_results=5)
+            # Providers failed or timed out: reported as an error, not as "no results"
+            if outcome.get('error'):
+                raise RuntimeError(outcome['error'])
             
             if not results:
                 return {
@@ -436,7 +731,7 @@ Offence when cheque is returned unpaid due to insufficient funds or signature mi
             
             for idx, result in enumerate(results[:3], 1):
                 formatted_response += f"**Source {idx}: {result.get('title', 'Legal Resource')}**\n"
-                formatted_response += f"{result.get('body', 'No description available')}\n"
+                formatted_response += f"{result.get('body') or 'No description available'}\n"
                 formatted_response += f"🔗 {result.get('href', '')}\n\n"
             
             formatted_response += "═══════════════════════════════════════════════════════════\n\n"
@@ -455,16 +750,17 @@ Offence when cheque is returned unpaid due to insufficient funds or signature mi
                 "response": formatted_response,
                 "sources": web_sources,
                 "confidence": "medium-web",
-                "note": "Fallback: Retrieved from web search (not indexed documents)"
+                "note": f"Fallback: Retrieved from web search via {outcome['provider']}"
+                        f"{' (cached)' if outcome['cached'] else ''} (not indexed documents)"
             }
             
         except Exception as e:
-            print(f"Web search fallback failed: {str(e)}")
+            log.warning(f"Web search fallback failed: {str(e)}")
             return {
                 "response": "⚠️ **INFORMATION UNAVAILABLE**\n\nThis query is outside the scope of the indexed legal documents, and the fallback web search encountered an error.\n\n**RECOMMENDATION:** Please consult a qualified legal professional for accurate legal guidance on this matter.",
                 "sources": [],
                 "confidence": "low",
-                "note": f"Out of scope - web search error: {str(e)}"
+                "note": f"{WEB_SEARCH_ERROR_NOTE}: {str(e)}"
             }
     
     def generate_lawyer_response(self, query: str, context: str, sources: List[Dict]) -> Dict:
@@ -483,9 +779,15 @@ Offence when cheque is returned unpaid due to insufficient funds or signature mi
             # STRICT MODE: No fallback to general knowledge
             if not context or context.strip() == "":
                 # Trigger web search fallback immediately
-                print("WARNING: RAG retrieval empty. Triggering web search fallback...")
+                log.warning("RAG retrieval empty. Triggering web search fallback...")
                 return self._perform_web_search_fallback(query)
             
+            # Simple factual questions go to the fast model, escalated if it fails
+            decision = self.router.route(query, task='chat')
+            
+            # Deduplicate and budget the retrieved chunks for the routed model
+            context, sources, _ = self.context_packer.pack(context, sources, decision['route'])
+            
             # Construct the strict RAG prompt
             full_prompt = f"""{self.SYSTEM_PROMPT}
 
@@ -499,86 +801,336 @@ User Query: {query}
 Respond in the mandatory format (bullet points, legal terminology, no filler):"""
             
             # Generate response with maximum strictness (temperature 0.0)
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.0,  # Zero temperature for maximum determinism
-                    top_p=0.8,
-                    top_k=20,
-                    max_output_tokens=2048,
+            generation_config = genai.types.GenerationConfig(
+                temperature=0.0,  # Zero temperature for maximum determinism
+                top_p=0.8,
+                top_k=20,
+                max_output_tokens=2048,
+            )
+            
+            # SPECULATIVE MODE: weak retrieval → web fallback races the generation
+            if self.speculative_fallback and self._is_weak_retrieval(sources):
+                return self._generate_with_speculative_fallback(
+                    query, decision, full_prompt, generation_config, sources
                 )
+            
+            response = self.generate_routed(
+                decision,
+                full_prompt,
+                generation_config=generation_config,
+                needs_escalation=self.is_out_of_scope
             )
             
             # Extract response text
             response_text = response.text
             
             # FAILURE DETECTION: Check for OUT OF SCOPE triggers
-            failure_phrases = [
-                "OUT OF SCOPE",
-                "outside the scope of the indexed",
-                "I do not have enough information",
-                "insufficient information in the context",
-                "not found in the retrieved context"
-            ]
-            
-            # Check if response contains any failure phrase
-            is_failure = any(phrase.lower() in response_text.lower() for phrase in failure_phrases)
-            
-            if is_failure:
-                print("DETECTED OUT OF SCOPE RESPONSE - Triggering web search fallback...")
+            if self.is_out_of_scope(response_text):
+                log.info("DETECTED OUT OF SCOPE RESPONSE - Triggering web search fallback...")
                 return self._perform_web_search_fallback(query)
             
             # Extract and structure response (success path)
-            lawyer_response = {
-                "response": response_text,
-                "sources": self._format_sources(sources),
-                "confidence": "high" if sources else "low",
-                "note": f"Response grounded in {len(sources)} retrieved document(s)"
-            }
-            
-            return lawyer_response
+            return self._grounded_response(response_text, sources)
             
         except Exception as e:
             # Error handling
+            count_error('generation', e)
             return {
                 "response": f"An error occurred while generating the legal analysis: {str(e)}. Please try again or consult a qualified lawyer.",
                 "sources": [],
                 "confidence": "error",
-                "note": "Generation error"
+                "note": GENERATION_ERROR_NOTE
             }
     
+    def _grounded_response(self, response_text: str, sources: List[Dict]) -> Dict:
+        """Structure a successful grounded answer for the client"""
+        return {
+            "response": response_text,
+            "sources": self._format_sources(sources),
+            "confidence": "high" if sources else "low",
+            "note": f"Response grounded in {len(sources)} retrieved document(s)"
+        }
+    
+    def _is_weak_retrieval(self, sources: List[Dict]) -> bool:
+        """
+        Retrieval is weak when every known relevance score is below the speculative threshold
+        
+        Sources without scores give no signal, so they never trigger speculation.
+        """
+        scores = [s.get('relevance_score') for s in sources
+                  if isinstance(s.get('relevance_score'), (int, float))]
+        return bool(scores) and max(scores) < self.speculative_score_threshold
+    
+    def _count_speculation(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.speculation_stats[outcome] += 1
+    
+    def _stream_until_failure(self, model, prompt: str, generation_config) -> Tuple[str, bool]:
+        """
+        Stream a generation, stopping as soon as an OUT OF SCOPE phrase appears
+        
+        Returns:
+            Tuple of (text generated so far, whether a failure phrase cut it off)
+        """
+        start = time.perf_counter()
+        longest_phrase = max(len(phrase) for phrase in FAILURE_PHRASES)
+        text = ""
+        chunks = None
+        
+        try:
+            stream = model.generate_content(prompt, generation_config=generation_config, stream=True)
+            chunks = iter(stream)
+            for chunk in chunks:
+                try:
+                    piece = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. safety metadata only)
+                    continue
+                
+                # Only the new text plus a phrase-length overlap needs checking
+                window_start = max(0, len(text) - longest_phrase)
+                text += piece
+                if self.is_out_of_scope(text[window_start:]):
+                    self.hedger.tracker('gemini_stream').observe(time.perf_counter() - start)
+                    # Cut off early: no usage metadata, so tokens are estimated
+                    record_model_call('gemini_stream', getattr(model, 'model_name', ''), prompt, output_text=text)
+                    return text, True
+        except Exception:
+            record_model_call('gemini_stream', getattr(model, 'model_name', ''), prompt, output_text=text,
+                              failed=True)
+            raise
+        finally:
+            # A stream cut off early is closed now rather than whenever it is garbage collected
+            # (this is also what runs a cassette recording's finalizer)
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+        
+        self.hedger.tracker('gemini_stream').observe(time.perf_counter() - start)
+        record_model_call('gemini_stream', getattr(model, 'model_name', ''), prompt, stream, output_text=text)
+        return text, False
+    
+    def _generate_with_speculative_fallback(self, query: str, decision: Dict, prompt: str,
+                                            generation_config, sources: List[Dict]) -> Dict:
+        """
+        Run the web fallback speculatively alongside a streamed grounded generation
+        
+        - Failure phrase in the stream → cut it off, use the web result straight away
+        - Grounded answer succeeds → discard the web result
+        """
+        log.info("SPECULATIVE MODE: Weak retrieval scores - starting web search alongside generation")
+        self._count_speculation('launched')
+        speculative = submit(self._perform_web_search_fallback, query)
+        
+        try:
+            start = time.perf_counter()
+            response_text, cut_off = self._stream_until_failure(
+                self.get_model(decision['model']), prompt, generation_config
+            )
+            
+            if cut_off:
+                log.info("DETECTED OUT OF SCOPE IN STREAM - Using speculative web search result")
+                self.router.record(decision, time.perf_counter() - start)
+                self._count_speculation('used')
+                return speculative.result()
+            
+            # Grounded answer succeeded (escalate a weak fast answer like the normal path)
+            escalated = self.router.should_escalate(decision, response_text)
+            if escalated:
+                response_text = self.generate_content(
+                    self.get_model(self.router.strong_model), prompt, generation_config
+                ).text
+            self.router.record(decision, time.perf_counter() - start, escalated)
+            
+            if self.is_out_of_scope(response_text):
+                self._count_speculation('used')
+                return speculative.result()
+            
+            speculative.cancel()
+            self._count_speculation('discarded')
+            return self._grounded_response(response_text, sources)
+            
+        except Exception:
+            speculative.cancel()
+            raise
+    
     def _format_sources(self, sources: List[Dict]) -> List[Dict]:
         """Format sources for client response"""
         formatted = []
         seen = set()
         
         for source in sources:
-            key = (source['filename'], source['page'])
+            key = (source['filename'], source['page'], source.get('section'))
             if key not in seen:
-                formatted.append({
+                entry = {
                     "document": source['filename'],
                     "page": source['page'],
                     "relevance": source.get('relevance_score', 'N/A')
-                })
+                }
+                if source.get('section'):
+                    entry["section"] = source['section']
+                formatted.append(entry)
                 seen.add(key)
         
         return formatted
     
-    def process_legal_query(self, query: str) -> Dict:
+    def _answer_from_statute_index(self, query: str) -> Optional[Dict]:
+        """
+        Answer a query that cites specific sections directly from the statute index
+        
+        Returns:
+            Response dict, or None when the query has no citations, cites a section
+            missing from the index, or the compact generation comes back out of scope
+        """
+        citations = self.statute_index.parse_citations(query)
+        if not citations or not all(key in self.statute_index.sections for key in citations):
+            return None
+        
+        provisions = self.statute_index.resolve(query)
+        sources = [
+            {
+                'filename': p['act_name'],
+                'page': f"Section {p['section']}",
+                'relevance_score': 1.0,
+            }
+            for p in provisions
+        ]
+        cited = ', '.join(f"Section {p['section']} {p['act']}" for p in provisions if not p['cross_ref_of'])
+        
+        if self.statute_fastpath == 'auto' and self.statute_index.is_pure_lookup(query):
+            log.info(f"STATUTE INDEX: Direct answer for {cited} (no retrieval, no generation)", extra=SAMPLED)
+            return {
+                "response": self._format_statute_answer(provisions),
+                "sources": self._format_sources(sources),
+                "confidence": "high",
+                "note": "Answered from statute index (exact section text)"
+            }
+        
+        log.info(f"STATUTE INDEX: Compact prompt for {cited} (no retrieval)", extra=SAMPLED)
+        provision_text = "\n\n".join(
+            f"Section {p['section']} of {p['act_name']} - {p['title']}:\n{p['text']}"
+            for p in provisions
+        )
+        prompt = f"""You are a Senior Legal Counsel specializing in Indian Law.
+Answer ONLY from the provisions below, citing "Section X of [Act Name]". No filler.
+If they do not answer the question, reply exactly: "The query is outside the scope of the indexed legal documents."
+
+[PROVISIONS]:
+{provision_text}
+
+User Query: {query}
+
+Respond with **APPLICABLE PROVISIONS**, **ANALYSIS** and **CONCLUSION** bullet points:"""
+        
+        try:
+            decision = self.router.route(query, task='chat')
+            response = self.generate_routed(
+                decision,
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.0,
+                    top_p=0.8,
+                    top_k=20,
+                    max_output_tokens=1024,
+                ),
+                op='gemini_statute',
+                needs_escalation=self.is_out_of_scope
+            )
+            response_text = response.text
+        except Exception as e:
+            log.warning(f"Statute fast path generation failed: {str(e)}")
+            return None
+        
+        if self.is_out_of_scope(response_text):
+            return None
+        
+        result = self._grounded_response(response_text, sources)
+        result["note"] = f"Response grounded in {len(sources)} statute index section(s)"
+        return result
+    
+    def _format_statute_answer(self, provisions: List[Dict]) -> str:
+        """Render exact section text in the mandatory response format"""
+        cited = [p for p in provisions if not p['cross_ref_of']]
+        corresponding = [p for p in provisions if p['cross_ref_of']]
+        
+        lines = ["**LEGAL ISSUE**"]
+        lines.append("• Text and scope of " + "; ".join(
+            f"Section {p['section']} of the {p['act_name']}" for p in cited
+        ))
+        lines.append("")
+        lines.append("**APPLICABLE PROVISIONS**")
+        for p in cited:
+            lines.append(f"• Section {p['section']} of {p['act_name']} ({p['title']}): \"{p['text']}\"")
+        
+        if corresponding:
+            lines.append("")
+            lines.append("**CROSS-REFERENCED PROVISIONS**")
+            for p in corresponding:
+                act, section = p['cross_ref_of']
+                lines.append(
+                    f"• Section {p['section']} of {p['act_name']} ({p['title']}), "
+                    f"cross-referenced from Section {section} {act}: \"{p['text']}\""
+                )
+        
+        lines.append("")
+        lines.append("**CONCLUSION**")
+        lines.append("• The provision(s) above are reproduced from the statute text; "
+                     "consult the full Bare Act for explanations, illustrations and exceptions.")
+        return "\n".join(lines)
+    
+    def process_legal_query(self, query: str, expansion_hints: Optional[List[str]] = None) -> Dict:
         """
         Main RAG pipeline: Retrieve → Generate → Return
         
         Args:
             query: User's legal question
+            expansion_hints: Key terms for multi-query retrieval; None retrieves with the query alone
             
         Returns:
             Complete response with lawyer's answer and citations
         """
+        # Fast path: explicit section citations answered from exact section text
+        if self.statute_fastpath != 'off':
+            with span('statute_fastpath'):
+                direct = self._answer_from_statute_index(query)
+            if direct is not None:
+                count_event('statute_fastpath')
+                return direct
+        
+        # Repeated questions are served from the answer cache (hints change the retrieval)
+        key = normalize_query(query)
+        if expansion_hints is not None:
+            key = (key, tuple(normalize_query(hint) for hint in expansion_hints))
+        if self.answer_cache_ttl > 0:
+            cached = self.answer_cache.get(key)
+            if cached is not None:
+                count_event('answer_cache_hit')
+                return cached
+        
         # Step 1: Retrieve relevant legal provisions
-        context, sources = self.search_legal_db(query, top_k=3)
+        depth = {}
+        with span('retrieval'):
+            if expansion_hints is not None:
+                context, sources = self.search_legal_db_expanded(query, top_k=3, hints=expansion_hints,
+                                                                 depth_info=depth)
+            else:
+                context, sources = self.search_legal_db(query, top_k=3, depth_info=depth)
+        
+        # Step 2: Drop the sentences that do not bear on the question (retrieved chunks only;
+        # fallback knowledge base and web contexts are passed through whole)
+        if depth and not depth.get('fallback'):
+            with span('compression'):
+                context, depth['compression'] = self.context_compressor.compress(query, context)
         
-        # Step 2: Generate response grounded in retrieved context
-        response = self.generate_lawyer_response(query, context, sources)
+        # Step 3: Generate response grounded in retrieved context
+        with span('generation'):
+            response = self.generate_lawyer_response(query, context, sources)
+        if depth:
+            response['retrieval'] = depth
+        
+        # Only grounded answers are cached (web fallbacks and errors are not)
+        if self.answer_cache_ttl > 0 and response.get('confidence') == 'high':
+            self.answer_cache.set(key, response, tags=self._source_tags(response['sources']))
         
         return response
     
@@ -614,26 +1166,58 @@ Respond in the mandatory format (bullet points, legal terminology, no filler):""
         Returns:
             Complete response using primarily the uploaded document
         """
-        print(f"HYBRID MODE: Processing query with LOCAL CONTEXT PRIORITY")
-        print(f"Uploaded evidence length: {len(current_evidence)} chars")
+        log.info("HYBRID MODE: Processing query with LOCAL CONTEXT PRIORITY",
+                 extra=dict(SAMPLED, evidence_chars=len(current_evidence)))
         
         # STEP 1: Try to search Vertex AI for legal provisions (OPTIONAL - can be empty)
         legal_provisions = ""
         legal_sources = []
+        depth = {}
         
-        try:
-            # Search for LEGAL PROVISIONS (not the document itself)
-            legal_query = f"What laws, acts, and legal provisions are relevant to: {query}"
-            legal_provisions, legal_sources = self.search_legal_db(legal_query, top_k=2)
-            
-            if legal_provisions:
-                print(f"Found {len(legal_sources)} legal provisions from Vertex AI")
-            else:
-                print("No legal provisions found in Vertex AI - will answer from uploaded document only")
+        # Document-local questions ("What is the date in this notice?") skip the lookup
+        gate = self.retrieval_gate.classify(query)
+        depth['gate'] = gate
+        if gate['label'] == LOCAL:
+            log.info(f"RETRIEVAL GATE: Skipping legal database lookup ({gate['reason']})", extra=SAMPLED)
+            count_event('retrieval_skipped')
+            saved = (self.hedger.tracker('evidence_retrieval').mean()
+                     or self.hedger.tracker('vertex_search').mean())
+            self.retrieval_gate.record(gate, saved)
+        else:
+            start = time.perf_counter()
+            try:
+                # Search for LEGAL PROVISIONS (not the document itself)
+                legal_query = f"What laws, acts, and legal provisions are relevant to: {query}"
+                # Sub-queries also draw on the offences/remedies named in the document itself
+                legal_provisions, legal_sources = self.search_legal_db_expanded(
+                    legal_query, top_k=2, hints=[current_evidence[:1000]], depth_info=depth
+                )
                 
-        except Exception as e:
-            print(f"Vertex AI search failed (non-critical): {str(e)}")
-            # Continue anyway - we have the uploaded document
+                if legal_provisions:
+                    log.info(f"Found {len(legal_sources)} legal provisions from Vertex AI", extra=SAMPLED)
+                    if not depth.get('fallback'):
+                        legal_provisions, depth['compression'] = self.context_compressor.compress(
+                            query, legal_provisions
+                        )
+                else:
+                    log.info("No legal provisions found in Vertex AI - will answer from uploaded document only")
+                    
+            except Exception as e:
+                log.warning(f"Vertex AI search failed (non-critical): {str(e)}")
+                count_error('evidence_retrieval', e)
+                # Continue anyway - we have the uploaded document
+            
+            elapsed = time.perf_counter() - start
+            self.hedger.tracker('evidence_retrieval').observe(elapsed)
+            STAGE_SECONDS.observe(elapsed, stage='evidence_retrieval')
+            self.retrieval_gate.record(gate, elapsed)
+        
+        # Document-local questions ("What is the date?") go to the fast model
+        decision = self.router.route(query, task='evidence', has_evidence=True)
+        if legal_provisions:
+            legal_provisions, legal_sources, _ = self.context_packer.pack(
+                legal_provisions, legal_sources, decision['route']
+            )
         
         # STEP 2: Build prompt with LOCAL CONTEXT as PRIMARY source
         enhanced_prompt = f"""You are a senior legal expert analyzing a document uploaded by the user.
@@ -675,15 +1259,16 @@ INSTRUCTIONS:
 
         # STEP 3: Generate response using Gemini (with local context priority)
         try:
-            model = genai.GenerativeModel('gemini-pro-latest')
-            response = model.generate_content(
+            response = self.generate_routed(
+                decision,
                 enhanced_prompt,
                 generation_config=genai.GenerationConfig(
                     temperature=0.1,  # Slightly higher for document interpretation
                     max_output_tokens=2048,
                     top_k=1,
                     top_p=0.2
-                )
+                ),
+                op='gemini_evidence'
             )
             
             generated_response = response.text
@@ -705,11 +1290,13 @@ INSTRUCTIONS:
                 "confidence_score": 0.95,  # High confidence - we have the actual document
                 "note": f"LOCAL CONTEXT MODE: Answered from uploaded document ({len(current_evidence)} chars)",
                 "mode": "local_context_priority",
-                "has_vertex_ai_supplement": bool(legal_provisions)
+                "has_vertex_ai_supplement": bool(legal_provisions),
+                "retrieval": depth
             }
             
         except Exception as e:
-            print(f"ERROR in local context analysis: {str(e)}")
+            log.error(f"ERROR in local context analysis: {str(e)}")
+            count_error('evidence', e)
             return {
                 "response": f"**ERROR ANALYZING UPLOADED DOCUMENT**\n\nCould not process the uploaded document: {str(e)}\n\nPlease try uploading the file again or contact support.",
                 "sources": [],
@@ -722,10 +1309,20 @@ INSTRUCTIONS:
 
 # Global instance (singleton pattern)
 _rag_engine = None
+_rag_engine_lock = threading.Lock()
 
 def get_rag_engine() -> LegalRAGEngine:
-    """Get or create RAG engine instance"""
+    """Get or create RAG engine instance (requests arriving during warmup wait for it)"""
     global _rag_engine
     if _rag_engine is None:
-        _rag_engine = LegalRAGEngine()
+        with _rag_engine_lock:
+            if _rag_engine is None:
+                _rag_engine = LegalRAGEngine()
     return _rag_engine
+
+
+def collect_metrics():
+    """Engine component stats for /metrics (registered once in apps.py; empty until the engine exists)"""
+    if _rag_engine is None:
+        return
+    yield from _rag_engine.collect_metrics()
@@ -0,0 +1,69 @@
+"""
+Nyaya-Sahayak Request Context
+Purpose: Per-request state (endpoint name, correlation id, usage recorder) visible anywhere in the pipeline
+
+The state lives in contextvars, so it follows a request's work onto the shared worker
+pools (concurrency.submit runs tasks inside a copy of the caller's context) without
+being threaded through every function signature.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+_current = contextvars.ContextVar('nyaya_request', default=None)
+
+# Set once at startup when request profiling is enabled; metrics spans only look up
+# the request context to record stage timings while this is True
+STAGE_TRACING = False
+
+
+class RequestContext:
+    """State of one API request; model calls on pool threads append concurrently"""
+
+    def __init__(self, endpoint: str, request_id: Optional[str] = None, trace: Optional[str] = None):
+        self.endpoint = endpoint
+        # Correlation id carried by every log line of the request
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.trace = trace
+        self.model_calls: List[Dict] = []
+        # (stage, start offset, seconds) while the request is being profiled, else None
+        self.stages: Optional[List[Tuple[str, float, float]]] = None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_model_call(self, call: Dict) -> None:
+        with self._lock:
+            self.model_calls.append(call)
+
+    def calls(self) -> List[Dict]:
+        with self._lock:
+            return list(self.model_calls)
+
+    def record_stage(self, stage: str, start: float, seconds: float) -> None:
+        if self.stages is not None:
+            with self._lock:
+                self.stages.append((stage, start - self.started, seconds))
+
+
+def current_request() -> Optional[RequestContext]:
+    """The active request's context, or None outside a request (e.g. management commands)"""
+    return _current.get()
+
+
+def current_endpoint() -> str:
+    context = _current.get()
+    return context.endpoint if context is not None else 'background'
+
+
+@contextmanager
+def request_scope(endpoint: str, request_id: Optional[str] = None, trace: Optional[str] = None):
+    """Open a request context for the duration of a view"""
+    token = _current.set(RequestContext(endpoint, request_id, trace))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
@@ -0,0 +1,139 @@
+"""
+Nyaya-Sahayak Adaptive Retrieval Depth
+Purpose: Choose how many retrieved chunks to keep from the relevance-score distribution
+
+How it works:
+1. Retrieval fetches a wider candidate set (ADAPTIVE_CANDIDATES) than any fixed top_k
+2. Walking down the ranked candidates, the cut happens at the first of:
+   - a score gap: the next score falls below ADAPTIVE_GAP_RATIO x the previous one
+   - cumulative mass: kept scores reach ADAPTIVE_MASS of the candidate total
+   - the token budget: the next chunk would exceed ADAPTIVE_TOKEN_BUDGET
+3. Clear-cut queries (one dominant hit) stop early; ambiguous ones (flat scores) go deeper
+4. Without relevance scores there is no signal, so the caller's top_k is kept (within budget).
+   When chunks are grouped by search result (Vertex AI Search returns several snippets
+   per document), top_k counts results: every chunk of the first top_k documents is kept
+
+Configuration (environment):
+- ADAPTIVE_TOP_K_ENABLED: "False" restores fixed top_k retrieval (default: True)
+- ADAPTIVE_CANDIDATES: candidates fetched before cutting (default: 8)
+- ADAPTIVE_MIN_K: chunks always kept when available (default: 1)
+- ADAPTIVE_GAP_RATIO: relative score drop that ends the context (default: 0.6)
+- ADAPTIVE_MASS: share of total candidate score to cover (default: 0.8)
+- ADAPTIVE_TOKEN_BUDGET: maximum estimated context tokens (default: 2500)
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+
+from .tokens import estimate_tokens
+
+
+class DepthPolicy:
+    """Score-aware cut of a ranked candidate list"""
+
+    def __init__(self, enabled: bool = True, candidates: int = 8, min_k: int = 1,
+                 gap_ratio: float = 0.6, mass: float = 0.8, token_budget: int = 2500):
+        self.enabled = enabled
+        self.candidates = candidates
+        self.min_k = min_k
+        self.gap_ratio = gap_ratio
+        self.mass = mass
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self.stats = {'queries': 0, 'candidates': 0, 'kept': 0, 'tokens': 0, 'tokens_saved': 0}
+
+    @classmethod
+    def from_env(cls) -> 'DepthPolicy':
+        return cls(
+            enabled=os.getenv('ADAPTIVE_TOP_K_ENABLED', 'True') == 'True',
+            candidates=int(os.getenv('ADAPTIVE_CANDIDATES', '8')),
+            min_k=int(os.getenv('ADAPTIVE_MIN_K', '1')),
+            gap_ratio=float(os.getenv('ADAPTIVE_GAP_RATIO', '0.6')),
+            mass=float(os.getenv('ADAPTIVE_MASS', '0.8')),
+            token_budget=int(os.getenv('ADAPTIVE_TOKEN_BUDGET', '2500')),
+        )
+
+    def fetch_size(self, top_k: int) -> int:
+        """How many candidates to retrieve for a caller asking for top_k"""
+        return max(top_k, self.candidates) if self.enabled else top_k
+
+    def choose(self, chunks: List[str], scores: List[Optional[float]], top_k: int,
+               groups: Optional[List[int]] = None) -> Dict:
+        """
+        Decide how many of the ranked chunks to keep
+
+        Args:
+            chunks: Candidate context chunks, best first
+            scores: Relevance score per chunk (None when the backend gave none)
+            top_k: The fixed depth the caller would have used
+            groups: Search result (document) index per chunk, when a result yields several
+                chunks; top_k then counts results rather than chunks
+
+        Returns:
+            Dict with 'depth', 'reason', 'candidates', 'tokens' (kept) and
+            'tokens_saved' (versus the fixed top_k; negative when it went deeper)
+        """
+        tokens = [estimate_tokens(chunk) for chunk in chunks]
+        fixed_depth = self._fixed_depth(len(chunks), top_k, groups)
+        fixed_tokens = sum(tokens[:fixed_depth])
+        known = [s for s in scores if isinstance(s, (int, float))]
+
+        if not self.enabled or not chunks:
+            depth, reason = fixed_depth, 'fixed'
+        elif len(known) != len(scores) or sum(known) <= 0:
+            depth, reason = self._budget_cut(tokens, fixed_depth), 'no scores'
+        else:
+            depth, reason = self._score_cut(tokens, scores)
+
+        kept_tokens = sum(tokens[:depth])
+        with self._lock:
+            self.stats['queries'] += 1
+            self.stats['candidates'] += len(chunks)
+            self.stats['kept'] += depth
+            self.stats['tokens'] += kept_tokens
+            self.stats['tokens_saved'] += fixed_tokens - kept_tokens
+        return {
+            'depth': depth,
+            'reason': reason,
+            'candidates': len(chunks),
+            'tokens': kept_tokens,
+            'tokens_saved': fixed_tokens - kept_tokens,
+        }
+
+    @staticmethod
+    def _fixed_depth(count: int, top_k: int, groups: Optional[List[int]]) -> int:
+        """Chunks a fixed top_k covers: top_k chunks, or every chunk of the first top_k groups"""
+        if groups is None:
+            return min(top_k, count)
+        seen = set()
+        for i, group in enumerate(groups[:count]):
+            if group not in seen:
+                if len(seen) == top_k:
+                    return i
+                seen.add(group)
+        return count
+
+    def _budget_cut(self, tokens: List[int], limit: int) -> int:
+        used = 0
+        for i in range(limit):
+            if i >= self.min_k and used + tokens[i] > self.token_budget:
+                return i
+            used += tokens[i]
+        return limit
+
+    def _score_cut(self, tokens: List[int], scores: List[float]):
+        total = sum(scores)
+        kept_mass = scores[0]
+        used = tokens[0]
+        for i in range(1, len(scores)):
+            if i >= self.min_k:
+                if scores[i] < scores[i - 1] * self.gap_ratio:
+                    return i, f"score gap at {i}"
+                if kept_mass / total >= self.mass:
+                    return i, f"mass {kept_mass / total:.2f}"
+                if used + tokens[i] > self.token_budget:
+                    return i, "token budget"
+            kept_mass += scores[i]
+            used += tokens[i]
+        return len(scores), 'all candidates'
@@ -0,0 +1,240 @@
+"""
+Nyaya-Sahayak Retrieval Evaluation
+Purpose: Judge retrieval configurations on quality and speed against a gold set
+
+How it works:
+1. The gold set lists legal questions with the (Act, Section) provisions a good
+   retrieval must surface (app/data/retrieval_gold.json)
+2. Every available configuration - backend × top_k × adaptive depth × query expansion
+   (× shard routing when there are shards) - runs each question through
+   LegalRAGEngine.search_legal_db (search_legal_db_expanded for expansion) with the
+   retrieval cache off
+3. Retrieved chunks are mapped to provisions: the source's Act and section, else the
+   "Section N" / "N." the chunk starts with. Act names are canonicalised through the
+   statute index aliases, and old/new code cross-references (IPC 420 ↔ BNS 318) count
+   as the same provision
+4. Per configuration: recall@k, MRR, hit rate, mean/p95 retrieval latency and context
+   tokens per query
+
+Backends:
+- vertex: Vertex AI Search (DATA_STORE_ID set)
+- local_corpus: BM25 over the ingested Bare Act corpus (manage.py ingest_bare_acts)
+- topic_fallback: the fallback topic table (always available; web fallback is
+  switched off during evaluation so the run stays offline and comparable)
+
+Run with: python manage.py evaluate_retrieval
+"""
+
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from .prompt_packing import CHUNK_SEPARATOR
+from .shard_router import normalize_act
+from .statute_index import StatuteIndex, normalize_section
+from .tokens import estimate_tokens
+
+DEFAULT_GOLD_PATH = os.path.join(os.path.dirname(__file__), 'data', 'retrieval_gold.json')
+
+Provision = Tuple[str, str]
+
+_SOURCE_HEADER = re.compile(r'^\[Source:([^\]]*)\]\s*')
+_SECTION_REFS = re.compile(r'\bSections?\s+((?:\d+[A-Z]{0,3}\s*(?:,|and|&)\s*)*\d+[A-Z]{0,3})', re.IGNORECASE)
+_SECTION_NUMBER = re.compile(r'\d+[A-Z]{0,3}', re.IGNORECASE)
+_LEADING_SECTION = re.compile(r'^\s*(\d+[A-Z]{0,3})\.\s')
+
+
+def load_gold(path: str = DEFAULT_GOLD_PATH) -> List[Dict]:
+    """Gold queries: [{'id', 'query', 'expected': [{'act', 'section'}]}]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['queries']
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(fraction * len(ordered) + 0.5) - 1))]
+
+
+class ProvisionMatcher:
+    """Maps Act names and retrieved chunks to canonical (act, section) provisions"""
+
+    def __init__(self, statute_index: StatuteIndex):
+        self.statute_index = statute_index
+
+    def canonical_act(self, name: str) -> str:
+        """Statute index code for known Acts ('Indian Penal Code, 1860' → 'IPC'), else the normalized name"""
+        codes = self.statute_index.mentioned_acts(name)
+        return codes[0] if codes else normalize_act(name)
+
+    def provision(self, act: str, section: str) -> Provision:
+        return self.canonical_act(act), normalize_section(section)
+
+    def equivalents(self, provision: Provision) -> Set[Provision]:
+        """The provision plus its old/new code counterparts"""
+        return {provision, *self.statute_index.cross_refs.get(provision, [])}
+
+    def provisions(self, source: Dict, chunk: str = '') -> List[Provision]:
+        """Provisions a retrieved chunk stands for"""
+        act = source.get('filename') or source.get('document') or ''
+        sections = []
+        if source.get('section'):
+            sections = [str(source['section'])]
+        else:
+            # Fallback topics carry "Section 108" / "Sections 2, 16, 18" in the page field
+            for text in (str(source.get('page', '')), self._chunk_head(chunk)):
+                sections = [number for refs in _SECTION_REFS.findall(text)
+                            for number in _SECTION_NUMBER.findall(refs)]
+                if sections:
+                    break
+            if not sections:
+                leading = _LEADING_SECTION.match(_SOURCE_HEADER.sub('', chunk, count=1))
+                sections = [leading.group(1)] if leading else []
+        return [self.provision(act, section) for section in sections] if act else []
+
+    @staticmethod
+    def _chunk_head(chunk: str) -> str:
+        """The [Source: ...] header and the first line of the chunk body"""
+        header = _SOURCE_HEADER.match(chunk)
+        body = _SOURCE_HEADER.sub('', chunk, count=1).lstrip().split('\n', 1)[0]
+        return f"{header.group(1) if header else ''} {body}"
+
+
+def ranked_provisions(context: str, sources: List[Dict], matcher: ProvisionMatcher) -> List[List[Provision]]:
+    """Provisions per retrieval rank (chunks align with sources for search backends)"""
+    chunks = context.split(CHUNK_SEPARATOR) if context else []
+    if len(chunks) != len(sources):
+        chunks = [''] * len(sources)
+    return [matcher.provisions(source, chunk) for source, chunk in zip(sources, chunks)]
+
+
+def score_query(ranked: List[List[Provision]], expected: List[Provision], matcher: ProvisionMatcher,
+                cutoffs: List[int]) -> Dict:
+    """recall@k for each cutoff and the reciprocal rank of the first relevant chunk"""
+    wanted = [matcher.equivalents(provision) for provision in expected]
+    first_rank: List[Optional[int]] = [None] * len(wanted)
+    for rank, provisions in enumerate(ranked, 1):
+        for i, alternatives in enumerate(wanted):
+            if first_rank[i] is None and alternatives.intersection(provisions):
+                first_rank[i] = rank
+
+    found = [rank for rank in first_rank if rank is not None]
+    scores = {
+        f"recall@{k}": sum(1 for rank in found if rank <= k) / len(wanted) if wanted else 0.0
+        for k in cutoffs
+    }
+    scores['reciprocal_rank'] = 1.0 / min(found) if found else 0.0
+    return scores
+
+
+def available_backends(engine) -> List[str]:
+    backends = []
+    if engine.data_store_id:
+        backends.append('vertex')
+    if engine.corpus is not None:
+        backends.append('local_corpus')
+    backends.append('topic_fallback')
+    return backends
+
+
+def build_configs(engine, backends: List[str], top_ks: List[int]) -> List[Dict]:
+    """Cross product of the retriever settings that apply to each backend"""
+    configs = []
+    for backend in backends:
+        sharded = ((backend == 'vertex' and bool(engine.data_store_shards))
+                   or (backend == 'local_corpus' and len(engine.corpus.shard_names) > 1))
+        for top_k in top_ks:
+            for adaptive in (False, True):
+                for expansion in (False, True):
+                    for shard_routing in ((False, True) if sharded else (None,)):
+                        name = f"{backend}/k={top_k}/{'adaptive' if adaptive else 'fixed'}"
+                        name += '/expanded' if expansion else ''
+                        if shard_routing is not None:
+                            name += '/sharded' if shard_routing else '/all-shards'
+                        configs.append({'name': name, 'backend': backend, 'top_k': top_k, 'adaptive': adaptive,
+                                        'expansion': expansion, 'shard_routing': shard_routing})
+    return configs
+
+
+@contextmanager
+def _overrides(*assignments: Tuple[object, str, object]):
+    """Temporarily set (object, attribute, value) triples"""
+    saved = [(target, name, getattr(target, name)) for target, name, _ in assignments]
+    try:
+        for target, name, value in assignments:
+            setattr(target, name, value)
+        yield
+    finally:
+        for target, name, value in reversed(saved):
+            setattr(target, name, value)
+
+
+def configured(engine, config: Dict):
+    """Engine settings for one configuration (retrieval cache always off)"""
+    assignments = [
+        (engine, 'retrieval_cache_ttl', 0),
+        (engine.depth_policy, 'enabled', config['adaptive']),
+        (engine.query_expander, 'enabled', config['expansion']),
+    ]
+    if config['shard_routing'] is not None:
+        assignments.append((engine.shard_router, 'enabled', config['shard_routing']))
+    if config['backend'] != 'vertex':
+        assignments.append((engine, 'data_store_id', None))
+    if config['backend'] == 'topic_fallback':
+        assignments += [(engine, 'corpus', None), (engine.web_fallback, 'providers', [])]
+    return _overrides(*assignments)
+
+
+def evaluate(engine, gold: List[Dict], configs: List[Dict], cutoffs: List[int],
+             matcher: Optional[ProvisionMatcher] = None) -> List[Dict]:
+    """
+    Run every gold query under every configuration
+
+    Args:
+        engine: LegalRAGEngine (its settings are restored after each configuration)
+        gold: Gold queries from load_gold()
+        configs: Configurations from build_configs()
+        cutoffs: k values for recall@k
+
+    Returns:
+        One summary per configuration, plus its per-query rows under 'queries'
+    """
+    matcher = matcher or ProvisionMatcher(engine.statute_index)
+    results = []
+    for config in configs:
+        rows = []
+        with configured(engine, config):
+            for item in gold:
+                expected = [matcher.provision(entry['act'], entry['section']) for entry in item['expected']]
+                start = time.perf_counter()
+                if config['expansion']:
+                    context, sources = engine.search_legal_db_expanded(item['query'], config['top_k'])
+                else:
+                    context, sources = engine.search_legal_db(item['query'], config['top_k'])
+                seconds = time.perf_counter() - start
+                ranked = ranked_provisions(context, sources, matcher)
+                rows.append({
+                    'id': item.get('id', item['query'][:40]),
+                    'seconds': seconds,
+                    'tokens': estimate_tokens(context) if context else 0,
+                    'retrieved': [f"{act} {section}" for provisions in ranked for act, section in provisions],
+                    **score_query(ranked, expected, matcher, cutoffs),
+                })
+
+        latencies = [row['seconds'] for row in rows]
+        summary = dict(config, queries=len(rows))
+        for k in cutoffs:
+            summary[f"recall@{k}"] = round(sum(row[f"recall@{k}"] for row in rows) / len(rows), 4)
+        summary.update({
+            'mrr': round(sum(row['reciprocal_rank'] for row in rows) / len(rows), 4),
+            'hit_rate': round(sum(1 for row in rows if row['reciprocal_rank'] > 0) / len(rows), 4),
+            'mean_seconds': round(sum(latencies) / len(latencies), 5),
+            'p95_seconds': round(percentile(latencies, 0.95), 5),
+            'mean_tokens': round(sum(row['tokens'] for row in rows) / len(rows), 1),
+            'queries_detail': rows,
+        })
+        results.append(summary)
+    return results
@@ -0,0 +1,194 @@
+"""
+Nyaya-Sahayak Retrieval Gate
+Purpose: Decide whether a question about an uploaded document needs a legal-database lookup
+
+How it works:
+1. Rules first: a legal cue ("valid", "section", "appeal", "entitled") always retrieves
+2. Everything else goes to a multinomial naive Bayes model trained at startup on the
+   labelled examples in the gate file; retrieval is skipped when P(local) reaches
+   RETRIEVAL_GATE_THRESHOLD. A document-local cue ("this notice", "what is the date",
+   "summarize") lowers that bar to LOCAL_CUE_THRESHOLD but never skips on its own -
+   "What is the date by which I must file an appeal?" still needs the model to agree
+3. Anything uncertain retrieves - a wasted lookup costs latency, a missed one costs grounding
+4. Decisions are counted per class; skips record the retrieval time saved, estimated
+   from the observed mean latency of evidence-path retrieval
+
+Gate file format:
+    {"local_cues": [...], "legal_cues": [...], "examples": [["local" | "retrieve", "question"], ...]}
+
+Configuration (environment):
+- RETRIEVAL_GATE_ENABLED: "False" always retrieves (default: True)
+- RETRIEVAL_GATE_PATH: path to the gate file (default: app/data/retrieval_gate.json)
+- RETRIEVAL_GATE_THRESHOLD: P(local) needed to skip retrieval (default: 0.8)
+- RETRIEVAL_GATE_CUE_THRESHOLD: P(local) needed when a document cue matched (default: 0.5)
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger('retrieval_gate')
+
+DEFAULT_GATE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'retrieval_gate.json')
+
+LOCAL = 'local'
+RETRIEVE = 'retrieve'
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(question: str) -> str:
+    # Padded so cues match at word starts and "act " matches a final "Act"
+    return ' ' + ' '.join(_WORD.findall(question.lower())) + ' '
+
+
+def _features(question: str) -> List[str]:
+    """Unigrams and bigrams; question words are kept, they carry most of the signal"""
+    words = _WORD.findall(question.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes with Laplace smoothing over unigram/bigram features"""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        self.classes = sorted({label for label, _ in examples})
+        self.counts = {label: Counter() for label in self.classes}
+        docs = Counter(label for label, _ in examples)
+        for label, text in examples:
+            self.counts[label].update(_features(text))
+        self.vocabulary = set().union(*self.counts.values()) if self.counts else set()
+        self.totals = {label: sum(counts.values()) for label, counts in self.counts.items()}
+        self.priors = {label: math.log(docs[label] / len(examples)) for label in self.classes}
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Posterior probability per class"""
+        if not self.classes:
+            return {}
+        features = [feature for feature in _features(text) if feature in self.vocabulary]
+        size = len(self.vocabulary)
+        log_scores = {
+            label: self.priors[label] + sum(
+                math.log((self.counts[label][feature] + 1) / (self.totals[label] + size))
+                for feature in features
+            )
+            for label in self.classes
+        }
+        top = max(log_scores.values())
+        exp = {label: math.exp(score - top) for label, score in log_scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+
+class RetrievalGate:
+    """Rules plus a naive Bayes model deciding local-only vs retrieval for evidence questions"""
+
+    def __init__(self, local_cues: List[str], legal_cues: List[str], examples: List[Tuple[str, str]],
+                 enabled: bool = True, threshold: float = 0.8, cue_threshold: float = 0.5):
+        self.local_cues = [cue.lower() for cue in local_cues]
+        self.legal_cues = [cue.lower() for cue in legal_cues]
+        self.model = NaiveBayes(examples)
+        self.enabled = enabled
+        self.threshold = threshold
+        self.cue_threshold = cue_threshold
+        self._lock = threading.Lock()
+        self.stats = {
+            LOCAL: {'count': 0, 'saved_seconds': 0.0},
+            RETRIEVE: {'count': 0, 'retrieval_seconds': 0.0},
+            'by_reason': {},
+        }
+
+    @classmethod
+    def load(cls, path: str, **options) -> 'RetrievalGate':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        examples = [(label, text) for label, text in data.get('examples', [])]
+        return cls(data.get('local_cues', []), data.get('legal_cues', []), examples, **options)
+
+    def _cue(self, text: str, cues: List[str]) -> Optional[str]:
+        for cue in cues:
+            if f" {cue}" in text:
+                return cue
+        return None
+
+    def classify(self, question: str) -> Dict:
+        """
+        Classify an evidence question
+
+        Returns:
+            Dict with 'label' ('local' skips retrieval, 'retrieve' does not),
+            'p_local' and 'reason'
+        """
+        if not self.enabled:
+            return {'label': RETRIEVE, 'p_local': None, 'reason': 'gate disabled'}
+
+        text = _normalize(question)
+        legal = self._cue(text, self.legal_cues)
+        if legal:
+            return {'label': RETRIEVE, 'p_local': 0.0, 'reason': f"rule: legal cue '{legal.strip()}'"}
+        local = self._cue(text, self.local_cues)
+        p_local = self.model.predict_proba(question).get(LOCAL, 0.0)
+        if local:
+            label = LOCAL if p_local >= self.cue_threshold else RETRIEVE
+            return {'label': label, 'p_local': round(p_local, 3), 'reason': f"model: document cue '{local}'"}
+
+        label = LOCAL if p_local >= self.threshold else RETRIEVE
+        return {'label': label, 'p_local': round(p_local, 3), 'reason': 'model'}
+
+    def record(self, decision: Dict, seconds: Optional[float]) -> None:
+        """
+        Count a decision
+
+        Args:
+            decision: Result of classify()
+            seconds: Retrieval time spent (retrieve) or estimated saved (local), if known
+        """
+        label = decision['label']
+        reason = decision['reason'].split(':')[0]
+        with self._lock:
+            self.stats[label]['count'] += 1
+            if seconds is not None:
+                self.stats[label]['saved_seconds' if label == LOCAL else 'retrieval_seconds'] += seconds
+            by_reason = self.stats['by_reason'].setdefault(reason, {LOCAL: 0, RETRIEVE: 0})
+            by_reason[label] += 1
+
+    def snapshot(self) -> Dict:
+        """Copy of the stats with mean seconds per class"""
+        with self._lock:
+            snapshot = json.loads(json.dumps(self.stats))
+        local, retrieve = snapshot[LOCAL], snapshot[RETRIEVE]
+        local['mean_saved_seconds'] = local['saved_seconds'] / local['count'] if local['count'] else None
+        retrieve['mean_retrieval_seconds'] = (
+            retrieve['retrieval_seconds'] / retrieve['count'] if retrieve['count'] else None
+        )
+        return snapshot
+
+
+# Global instance (loaded once at startup)
+_retrieval_gate = None
+
+def get_retrieval_gate() -> RetrievalGate:
+    """Get or load the retrieval gate (rules only, always retrieving, if the gate file is missing)"""
+    global _retrieval_gate
+    if _retrieval_gate is None:
+        path = os.getenv('RETRIEVAL_GATE_PATH', DEFAULT_GATE_PATH)
+        options = {
+            'enabled': os.getenv('RETRIEVAL_GATE_ENABLED', 'True') == 'True',
+            'threshold': float(os.getenv('RETRIEVAL_GATE_THRESHOLD', '0.8')),
+            'cue_threshold': float(os.getenv('RETRIEVAL_GATE_CUE_THRESHOLD', '0.5')),
+        }
+        try:
+            _retrieval_gate = RetrievalGate.load(path, **options)
+            log.info(f"Retrieval gate loaded: {len(_retrieval_gate.local_cues) + len(_retrieval_gate.legal_cues)} "
+                     f"cues, model over {len(_retrieval_gate.model.vocabulary)} features from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Retrieval gate unavailable ({str(e)}) - evidence questions always retrieve")
+            options['enabled'] = False
+            _retrieval_gate = RetrievalGate([], [], [], **options)
+    return _retrieval_gate
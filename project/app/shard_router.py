@@ -0,0 +1,138 @@
+"""
+Nyaya-Sahayak Shard Router
+Purpose: Predict which per-Act shards a query needs so retrieval searches only those
+
+Signals (cheap, local):
+1. Acts named in the query ("under the NI Act", "IPC") via statute index aliases → confidence 1.0
+2. Fallback knowledge base topics (tenancy, consumer, cheque, employment, ...) → the Acts
+   their sources cite; confidence grows with the topic's keyword score, but only once
+   at least two of the topic's keywords match - one generic word ("rent", "notice")
+   never narrows the search on its own
+3. Below the confidence threshold every shard is searched, so routing can only
+   narrow a search when it is sure
+
+Shard names are Act names ("Negotiable Instruments Act, 1881"); predictions are matched
+to the available shards ignoring case, punctuation and the year.
+
+Configuration (environment):
+- SHARD_ROUTING_ENABLED: "False" always searches every shard (default: True)
+- SHARD_ROUTER_MIN_CONFIDENCE: confidence needed to narrow the search (default: 0.5)
+- DATA_STORE_SHARDS: per-Act Vertex AI Search data stores, "Act name=data-store-id;..."
+      (optional; DATA_STORE_ID remains the all-Acts store used on low confidence)
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from .fallback_kb import FallbackKnowledgeBase
+from .log import SAMPLED, get_logger
+from .statute_index import StatuteIndex
+
+log = get_logger('shard_router')
+
+_YEAR = re.compile(r'\b\d{4}\b')
+_NON_WORD = re.compile(r'[^a-z]+')
+
+# Distinct topic keywords a query needs before the topic contributes confidence
+MIN_TOPIC_KEYWORDS = 2
+
+
+def normalize_act(name: str) -> str:
+    """'The Negotiable Instruments Act, 1881' → 'negotiable instruments act'"""
+    name = _YEAR.sub(' ', name.lower())
+    name = _NON_WORD.sub(' ', name).strip()
+    if name.startswith('the '):
+        name = name[4:]
+    return name
+
+
+def parse_data_store_shards(value: str) -> Dict[str, str]:
+    """Parse DATA_STORE_SHARDS ("Act name=data-store-id;...") into {act name: data store id}"""
+    shards = {}
+    for entry in value.split(';'):
+        if '=' in entry:
+            act, data_store = entry.split('=', 1)
+            if act.strip() and data_store.strip():
+                shards[act.strip()] = data_store.strip()
+    return shards
+
+
+class ShardRouter:
+    """Maps a query to the per-Act shards worth searching"""
+
+    def __init__(self, statute_index: StatuteIndex, fallback_kb: FallbackKnowledgeBase,
+                 enabled: bool = True, min_confidence: float = 0.5):
+        self.statute_index = statute_index
+        self.fallback_kb = fallback_kb
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.stats = {'routed': 0, 'all_shards': 0, 'shards_searched': 0, 'shards_available': 0}
+
+    @classmethod
+    def from_env(cls, statute_index: StatuteIndex, fallback_kb: FallbackKnowledgeBase) -> 'ShardRouter':
+        return cls(
+            statute_index,
+            fallback_kb,
+            enabled=os.getenv('SHARD_ROUTING_ENABLED', 'True') == 'True',
+            min_confidence=float(os.getenv('SHARD_ROUTER_MIN_CONFIDENCE', '0.5')),
+        )
+
+    def predict(self, query: str) -> Dict:
+        """
+        Predict relevant Acts for a query
+
+        Returns:
+            Dict with 'acts' (Act names, best first), 'confidence' (0-1) and 'reasons'
+        """
+        acts: List[str] = []
+        reasons = []
+        confidence = 0.0
+
+        mentioned = self.statute_index.mentioned_acts(query)
+        if mentioned:
+            acts.extend(self.statute_index.act_name(code) for code in mentioned)
+            confidence = 1.0
+            reasons.append(f"named: {', '.join(mentioned)}")
+
+        for topic, score, keywords in self.fallback_kb.score_topics(query)[:2]:
+            topic_acts = [source['filename'] for source in topic.get('sources', [])]
+            acts.extend(act for act in topic_acts if act not in acts)
+            if len(set(keywords)) >= MIN_TOPIC_KEYWORDS:
+                confidence = max(confidence, min(1.0, score / 2))
+            reasons.append(f"topic {topic['id']} ({', '.join(keywords[:3])})")
+
+        return {'acts': acts, 'confidence': confidence, 'reasons': reasons}
+
+    def route(self, query: str, shard_names: List[str]) -> Optional[List[str]]:
+        """
+        Choose shards to search
+
+        Args:
+            query: User's legal question
+            shard_names: Available shards (Act names)
+
+        Returns:
+            The shards to search, or None to search all of them
+        """
+        selected = None
+        prediction = None
+        if self.enabled and len(shard_names) > 1:
+            prediction = self.predict(query)
+            if prediction['confidence'] >= self.min_confidence:
+                wanted = {normalize_act(act) for act in prediction['acts']}
+                matched = [name for name in shard_names if normalize_act(name) in wanted]
+                selected = matched or None
+
+        with self._lock:
+            self.stats['routed' if selected else 'all_shards'] += 1
+            self.stats['shards_searched'] += len(selected) if selected else len(shard_names)
+            self.stats['shards_available'] += len(shard_names)
+
+        if selected:
+            log.info(f"SHARD ROUTER: {len(selected)}/{len(shard_names)} shard(s) "
+                     f"(confidence={prediction['confidence']:.2f}; {'; '.join(prediction['reasons'])})",
+                     extra=SAMPLED)
+        return selected
@@ -0,0 +1,206 @@
+"""
+Nyaya-Sahayak Startup
+Purpose: Short cold starts - heavy imports deferred, an explicit warmup phase, a readiness probe
+
+How it works:
+1. google.generativeai and the Discovery Engine client library are bound as LazyModule
+   proxies; the real import happens on first attribute access and is timed
+2. When a server process starts (gunicorn via wsgi/asgi, or the runserver child), the
+   warmup runs: URL resolver and views, the RAG engine (router, caches, corpus, statute
+   index, fallback table, retrieval gate), the Gemini models and the search client
+3. /readyz answers 503 while warming and 200 once the warmup has finished, so Cloud Run
+   (startup probe) only routes traffic to a warm instance; /healthz is plain liveness
+4. Every phase and deferred import is timed; the breakdown is logged, returned by
+   /readyz, exported on /metrics and printed by `manage.py startup_report`
+5. A failed warmup does not block serving: the instance reports ready (status
+   "degraded", with the error) and builds what it needs on the first request, as before
+
+Configuration (environment):
+- WARMUP_MODE: "background" (warm in a thread, not ready until done), "blocking" (warm
+  before the server accepts requests) or "off" (lazy, ready immediately) (default: background)
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .log import get_logger
+
+log = get_logger('startup')
+
+# Reference point for "ready after": this module is imported while Django sets up apps
+_PROCESS_REFERENCE = time.perf_counter()
+
+COLD = 'cold'
+WARMING = 'warming'
+READY = 'ready'
+DEGRADED = 'degraded'
+
+
+class StartupReport:
+    """Phase and import timings of this process's startup"""
+
+    def __init__(self, mode: str = 'background'):
+        self.mode = mode if mode in ('background', 'blocking', 'off') else 'background'
+        self.state = READY if self.mode == 'off' else COLD
+        self.phases: List[Dict] = []
+        self.imports: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.ready_after: Optional[float] = None
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'StartupReport':
+        return cls(mode=os.getenv('WARMUP_MODE', 'background'))
+
+    @property
+    def ready(self) -> bool:
+        return self.state in (READY, DEGRADED)
+
+    def record_import(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.imports[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one warmup phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append({'phase': name, 'seconds': round(time.perf_counter() - start, 4)})
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'mode': self.mode,
+                'phases': [dict(phase) for phase in self.phases],
+                'imports': dict(self.imports),
+                'warmup_seconds': round(sum(phase['seconds'] for phase in self.phases), 4),
+                'ready_after_seconds': self.ready_after,
+                'modules_loaded': len(sys.modules),
+                'error': self.error,
+            }
+
+
+# Global instance (loaded once at startup)
+startup_report = StartupReport.from_env()
+
+
+class LazyModule:
+    """Stands in for a heavy module and imports it on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    startup_report.record_import(self._name, time.perf_counter() - start)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}' ({'loaded' if self._module is not None else 'deferred'})>"
+
+
+# Serialises warmups (background thread vs. an explicit call)
+_warmup_lock = threading.Lock()
+
+
+def warmup() -> Dict:
+    """
+    Build everything the first request would otherwise build (runs once per process)
+
+    Returns:
+        The startup report snapshot
+    """
+    with _warmup_lock:
+        if startup_report.ready_after is not None:
+            return startup_report.snapshot()
+        return _warmup()
+
+
+def _warmup() -> Dict:
+    startup_report.state = WARMING
+    log.info(f"STARTUP: Warming up ({startup_report.mode})")
+    try:
+        with startup_report.phase('url_resolver'):
+            from django.urls import get_resolver
+            get_resolver().url_patterns
+        with startup_report.phase('pipeline_import'):
+            from .rag_engine import discoveryengine, get_rag_engine
+        with startup_report.phase('rag_engine'):
+            engine = get_rag_engine()
+        with startup_report.phase('gemini_models'):
+            for model_name in dict.fromkeys((engine.router.fast_model, engine.router.strong_model)):
+                engine.get_model(model_name)
+        if engine.data_store_id:
+            with startup_report.phase('search_client'):
+                discoveryengine.SearchRequest
+                engine._get_search_client()
+        startup_report.state = READY
+    except Exception as e:
+        # Serve anyway: whatever failed is built lazily on the first request
+        startup_report.error = f"{type(e).__name__}: {str(e)}"
+        startup_report.state = DEGRADED
+        log.warning(f"STARTUP: Warmup failed, serving lazily: {startup_report.error}")
+    startup_report.ready_after = round(time.perf_counter() - _PROCESS_REFERENCE, 4)
+
+    snapshot = startup_report.snapshot()
+    breakdown = ', '.join(f"{phase['phase']} {phase['seconds']:.2f}s" for phase in snapshot['phases'])
+    imports = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in snapshot['imports'].items())
+    log.info(f"STARTUP: {snapshot['state']} after {snapshot['ready_after_seconds']:.2f}s "
+             f"(warmup {snapshot['warmup_seconds']:.2f}s: {breakdown}; imports: {imports or 'none'})")
+    return snapshot
+
+
+def start_warmup() -> None:
+    """Run the warmup as WARMUP_MODE says; called once a server process has loaded Django"""
+    if startup_report.mode == 'off' or startup_report.state != COLD:
+        return
+    if startup_report.mode == 'blocking':
+        warmup()
+    else:
+        # Not ready from this point until the thread finishes
+        startup_report.state = WARMING
+        threading.Thread(target=warmup, name='nyaya-warmup', daemon=True).start()
+
+
+def is_dev_server_child() -> bool:
+    """True in the runserver process that serves requests (not the autoreloader parent)"""
+    return len(sys.argv) > 1 and sys.argv[1] == 'runserver' and (
+        os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    )
+
+
+def collect_metrics():
+    """Startup breakdown for /metrics: (name, type, help, samples)"""
+    snapshot = startup_report.snapshot()
+    yield ('nyaya_startup_phase_seconds', 'gauge', 'Warmup phase durations of this process', [
+        ({'phase': phase['phase']}, phase['seconds']) for phase in snapshot['phases']
+    ])
+    yield ('nyaya_startup_import_seconds', 'gauge', 'Deferred import durations', [
+        ({'module': name}, seconds) for name, seconds in snapshot['imports'].items()
+    ])
+    yield ('nyaya_startup_ready_seconds', 'gauge', 'Seconds from app load until ready', [
+        ({}, snapshot['ready_after_seconds'])
+    ])
+    yield ('nyaya_ready', 'gauge', 'Whether the instance reports ready', [
+        ({'state': snapshot['state']}, 1 if startup_report.ready else 0)
+    ])
@@ -0,0 +1,223 @@
+"""
+Nyaya-Sahayak Statute Index
+Purpose: Answer explicit section citations ("Section 420 IPC") from exact section text
+
+How it works:
+1. A compact JSON file of (Act, Section) → title/text is loaded once at startup
+2. Old ↔ new code equivalents (IPC ↔ BNS, CrPC ↔ BNSS, "equivalent" on disk) are linked
+   both ways; ordinary "see" links to related sections are kept separately, one way
+3. Citations in a query are parsed with Act aliases ("u/s 138 NI Act",
+   "Sec. 302 of the Indian Penal Code", "420 IPC", "Sections 406 and 420 IPC")
+4. The RAG engine uses the resolved sections instead of semantic search -
+   answered directly for pure lookups, or with a small prompt otherwise
+
+Configuration (environment):
+- STATUTE_INDEX_PATH: path to the statute JSON file (default: app/data/statutes.json)
+- STATUTE_FASTPATH: read by the RAG engine (default: auto)
+      auto    - pure lookups answered without the LLM, other cited queries with a compact prompt
+      prompt  - every cited query answered with a compact prompt
+      off     - citations go through normal retrieval
+"""
+
+import os
+import re
+import json
+from typing import Dict, List, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger('statute_index')
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'data', 'statutes.json')
+
+# Words that may surround a citation in a pure "show me the section" lookup
+LOOKUP_WORDS = {
+    'what', 'is', 'are', 'the', 'of', 'under', 'section', 'sections', 'sec', 'explain',
+    'text', 'show', 'me', 'tell', 'about', 'give', 'provision', 'provisions', 'and',
+    'please', 'does', 'say', 'says', 'state', 'states', 'quote', 'full', 'bare', 'act',
+    'a', 'an', 'in', 'read', 'meaning',
+}
+
+_PARENTHETICAL = re.compile(r'\([^)]*\)')
+_SECTION_NUMBER = re.compile(r'\d+(?:-?[a-z]{1,3}(?![a-z]))?', re.IGNORECASE)
+_NUMBER = r'\d+(?:-?[a-z]{1,3}(?![a-z]))?(?:\s*\([^)]*\))*'
+_NUMBER_LIST = rf'{_NUMBER}(?:\s*(?:,|and|&|/)\s*{_NUMBER})*'
+_SECTION_WORD = r'(?<!\w)(?:sections?|secs?\.?|ss?\.|u/s\.?)'
+
+StatuteKey = Tuple[str, str]
+
+
+def normalize_section(section: str) -> str:
+    """Normalize a section number: '498-a' → '498A', '154(1)' → '154'"""
+    section = _PARENTHETICAL.sub('', str(section))
+    return re.sub(r'[\s\-]', '', section).upper()
+
+
+class StatuteIndex:
+    """In-memory (Act, Section) → section text index with citation parsing"""
+
+    def __init__(self, data: Dict):
+        self.acts: Dict[str, Dict] = data.get('acts', {})
+        self.sections: Dict[StatuteKey, Dict] = {}
+        self.cross_refs: Dict[StatuteKey, List[StatuteKey]] = {}
+        self.see_also: Dict[StatuteKey, List[StatuteKey]] = {}
+
+        for entry in data.get('sections', []):
+            key = (entry['act'].upper(), normalize_section(entry['section']))
+            self.sections[key] = entry
+
+        # Equivalents are stored one way on disk and linked both ways here
+        for key, entry in self.sections.items():
+            for act, section in entry.get('equivalent', []):
+                other = (act.upper(), normalize_section(section))
+                self._link(self.cross_refs, key, other)
+                self._link(self.cross_refs, other, key)
+            for act, section in entry.get('see', []):
+                self._link(self.see_also, key, (act.upper(), normalize_section(section)))
+
+        self._alias_to_act = {}
+        self._alias_pattern = None
+        for code, act in self.acts.items():
+            for alias in [code] + act.get('aliases', []):
+                self._alias_to_act[alias.lower()] = code
+        self._patterns = self._compile_patterns()
+
+    @classmethod
+    def load(cls, path: str) -> 'StatuteIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _link(links: Dict[StatuteKey, List[StatuteKey]], source: StatuteKey, target: StatuteKey) -> None:
+        refs = links.setdefault(source, [])
+        if target != source and target not in refs:
+            refs.append(target)
+
+    def _compile_patterns(self) -> List[Tuple[re.Pattern, int, int]]:
+        """Build citation regexes as (pattern, numbers group, act group)"""
+        if not self._alias_to_act:
+            return []
+        # Longest aliases first so "ni act" wins over a shorter overlapping alias
+        aliases = sorted(self._alias_to_act, key=len, reverse=True)
+        alias = r'(?<!\w)(' + '|'.join(re.escape(a) for a in aliases) + r')(?!\w)'
+        flags = re.IGNORECASE
+        self._alias_pattern = re.compile(alias, flags)
+        return [
+            # Section 420 IPC / Sec. 138 of the NI Act / u/s 406 and 420 IPC
+            (re.compile(rf'{_SECTION_WORD}\s*({_NUMBER_LIST})\s*,?\s*(?:of\s+(?:the\s+)?)?{alias}', flags), 1, 2),
+            # IPC Section 420
+            (re.compile(rf'{alias}\s*,?\s*{_SECTION_WORD}\s*({_NUMBER_LIST})', flags), 2, 1),
+            # 420 IPC
+            (re.compile(rf'(?<!\w)({_NUMBER})\s+{alias}', flags), 1, 2),
+        ]
+
+    def _find_citations(self, query: str) -> List[Tuple[StatuteKey, Tuple[int, int]]]:
+        found = []
+        taken = []
+        for pattern, numbers_group, act_group in self._patterns:
+            for match in pattern.finditer(query):
+                span = match.span()
+                if any(start < span[1] and span[0] < end for start, end in taken):
+                    continue
+                taken.append(span)
+                act = self._alias_to_act[match.group(act_group).lower()]
+                numbers = _PARENTHETICAL.sub('', match.group(numbers_group))
+                for number in _SECTION_NUMBER.findall(numbers):
+                    found.append(((act, normalize_section(number)), span))
+        return found
+
+    def parse_citations(self, query: str) -> List[StatuteKey]:
+        """
+        Extract explicit (Act, Section) citations from a query
+
+        Args:
+            query: User's legal question
+
+        Returns:
+            Unique (act code, section) keys in order of appearance (resolved or not)
+        """
+        keys = []
+        for key, _ in sorted(self._find_citations(query), key=lambda item: item[1][0]):
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def is_pure_lookup(self, query: str) -> bool:
+        """True when the query is nothing but citations plus filler words ("What is Section 420 IPC?")"""
+        citations = self._find_citations(query)
+        if not citations:
+            return False
+        remainder = query
+        for start, end in sorted({span for _, span in citations}, reverse=True):
+            remainder = remainder[:start] + ' ' + remainder[end:]
+        words = re.findall(r'[a-z]+', remainder.lower())
+        return all(word in LOOKUP_WORDS for word in words)
+
+    def mentioned_acts(self, query: str) -> List[str]:
+        """Act codes named anywhere in the query ("... under the NI Act"), in order of appearance"""
+        if self._alias_pattern is None:
+            return []
+        codes = []
+        for match in self._alias_pattern.finditer(query):
+            code = self._alias_to_act[match.group(1).lower()]
+            if code not in codes:
+                codes.append(code)
+        return codes
+
+    def act_name(self, code: str) -> str:
+        return self.acts.get(code, {}).get('name', code)
+
+    def get(self, act: str, section: str) -> Optional[Dict]:
+        return self.sections.get((act.upper(), normalize_section(section)))
+
+    def resolve(self, query: str, include_cross_refs: bool = True) -> List[Dict]:
+        """
+        Resolve a query's citations to section entries
+
+        Returns:
+            List of dicts with 'act', 'act_name', 'section', 'title', 'text' and
+            'cross_ref_of' (the cited key for old/new code equivalents and "see" sections, else None)
+        """
+        resolved = []
+        seen = set()
+
+        def add(key: StatuteKey, cross_ref_of: Optional[StatuteKey] = None):
+            entry = self.sections.get(key)
+            if entry is None or key in seen:
+                return
+            seen.add(key)
+            resolved.append({
+                'act': key[0],
+                'act_name': self.acts.get(key[0], {}).get('name', key[0]),
+                'section': entry['section'],
+                'title': entry.get('title', ''),
+                'text': entry['text'],
+                'cross_ref_of': cross_ref_of,
+            })
+
+        cited = self.parse_citations(query)
+        for key in cited:
+            add(key)
+        if include_cross_refs:
+            for key in cited:
+                if key in self.sections:
+                    for ref in self.cross_refs.get(key, []) + self.see_also.get(key, []):
+                        add(ref, cross_ref_of=key)
+        return resolved
+
+
+# Global instance (loaded once at startup)
+_statute_index = None
+
+def get_statute_index() -> StatuteIndex:
+    """Get or load the statute index (an empty index if the file is missing)"""
+    global _statute_index
+    if _statute_index is None:
+        path = os.getenv('STATUTE_INDEX_PATH', DEFAULT_INDEX_PATH)
+        try:
+            _statute_index = StatuteIndex.load(path)
+            log.info(f"Statute index loaded: {len(_statute_index.sections)} sections from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Statute index unavailable ({path}): {str(e)}")
+            _statute_index = StatuteIndex({})
+    return _statute_index
@@ -1,3 +1,1523 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from benchmarks.fakes import FakeGenerativeModel, FakeUpstreamError, LatencyModel, fake_answer
+from benchmarks.run import compare, percentile
+from django.core.management.base import CommandError
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from .binary_index import HEADER, BinaryIndex, _decode_varints, _encode_varint, build_index
+from .caches import TTLCache
+from .cassettes import Cassette, CassetteError, CassetteMiss, scrub
+from .chat_batch import ERROR, SUCCESS, TIMEOUT, BatchRunner, BatchValidationError
+from .context_compression import ContextCompressor, split_sentences
+from .contract_verification import verify_contract_file
+from .corpus import Corpus, CorpusWatcher, chunk_act_text, detect_act_name, get_corpus, page_label, publish_corpus
+from .hedging import Hedger, HedgingBudget, LatencyTracker
+from .log import SAMPLED, JsonFormatter, NonBlockingQueueHandler
+from .management.commands.ingest_bare_acts import Command as IngestCommand
+from .metrics import ERRORS, Registry, observe_endpoint, registry, span, stats_samples
+from .model_router import FAST_ROUTE, STRONG_ROUTE, ModelRouter
+from .fallback_kb import AhoCorasick, FallbackKnowledgeBase, get_fallback_kb
+from .offline_batch import CONTRACT, QUERY, Checkpoint, ResultWriter, process_record, read_records
+from .profiling import RequestProfiler
+from .prompt_packing import CHUNK_SEPARATOR, ContextPacker, minhash, shingles, similarity
+from .query_expansion import QueryExpander, _find_terms
+from .rag_engine import FAILURE_PHRASES, GENERATION_ERROR_NOTE, WEB_SEARCH_ERROR_NOTE, LegalRAGEngine
+from .retrieval_depth import DepthPolicy
+from .retrieval_eval import ProvisionMatcher, build_configs, evaluate, score_query
+from .retrieval_gate import LOCAL, RETRIEVE, RetrievalGate
+from .shard_router import ShardRouter, normalize_act
+from . import request_context
+from .request_context import request_scope
+from .startup import DEGRADED, READY, LazyModule, StartupReport
+from .statute_index import StatuteIndex, get_statute_index, normalize_section
+from .tokens import estimate_tokens
+from .usage import UsageLedger, request_usage_summary
+from .web_fallback import WebFallback, normalize_query
+
+
+class _StubEngine:
+    """Stands in for LegalRAGEngine with a canned answer"""
+
+    def __init__(self, answer):
+        self.answer = answer
+
+    def process_legal_query(self, query, expansion_hints=None):
+        return dict(self.answer)
+
+
+class OfflineBatchTests(SimpleTestCase):
+    def _process(self, answer):
+        with mock.patch('app.rag_engine.get_rag_engine', return_value=_StubEngine(answer)):
+            return process_record({'line': 1, 'id': 'C-1', 'kind': 'query', 'query': 'What is bail?'})
+
+    def test_grounded_answer_succeeds(self):
+        result = self._process({'response': 'Section 436 CrPC', 'sources': [{'document': 'CrPC'}],
+                                'confidence': 'high'})
+        self.assertEqual(result['status'], 'success')
+
+    def test_generation_error_answer_is_a_failure(self):
+        result = self._process({'response': 'An error occurred', 'sources': [], 'confidence': 'error',
+                                'note': GENERATION_ERROR_NOTE})
+        self.assertEqual(result['status'], 'error')
+        self.assertIn(GENERATION_ERROR_NOTE, result['message'])
+
+    def test_web_fallback_error_answer_is_a_failure(self):
+        result = self._process({'response': 'INFORMATION UNAVAILABLE', 'sources': [], 'confidence': 'low',
+                                'note': f"{WEB_SEARCH_ERROR_NOTE}: timeout"})
+        self.assertEqual(result['status'], 'error')
+
+    def test_failed_lines_are_not_checkpointed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, 'in.jsonl')
+            output_path = os.path.join(directory, 'out.jsonl')
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write('{"query": "a"}\n{"query": "b"}\n{"query": "c"}\n')
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for line, status in ((1, 'error'), (2, 'success'), (3, 'success')):
+                    f.write(json.dumps({'line': line, 'status': status}) + '\n')
+
+            checkpoint = Checkpoint.load(os.path.join(directory, 'cp.json'), input_path)
+            self.assertEqual(checkpoint.reconcile(output_path), 2)
+            self.assertEqual(checkpoint.watermark, 0)
+            self.assertFalse(checkpoint.is_done(1))
+            self.assertTrue(checkpoint.is_done(3))
+
+            checkpoint.mark_done(1)
+            self.assertEqual(checkpoint.watermark, 3)
+            checkpoint.save()
+            self.assertEqual(Checkpoint.load(checkpoint.path, input_path).watermark, 3)
+
+
+class ContractVerificationTests(SimpleTestCase):
+    def test_malformed_clause_verdicts_are_skipped(self):
+        clauses = [{'title': title, 'text': f'{title} clause'} for title in ('Rent', 'Deposit', 'Notice')]
+        verdicts = iter(['{"risks": 5}', '["not", "an", "object"]', '{"compliance": "COMPLIANT"}'])
+        rag = mock.Mock()
+        rag.generate_content.return_value = SimpleNamespace(text=json.dumps({'clauses': clauses}))
+        rag.process_legal_query.return_value = {'response': 'provisions'}
+        rag.generate_routed.side_effect = lambda *args, **kwargs: SimpleNamespace(text=next(verdicts))
+        with mock.patch.dict(os.environ, {'GOOGLE_API_KEY': 'test'}), \
+                mock.patch('app.contract_verification.genai'):
+            result = verify_contract_file('contract.pdf', rag=rag)
+        self.assertEqual(result['clause_analysis'],
+                         [{'clause': 'Notice', 'status': 'COMPLIANT', 'recommendation': ''}])
+        self.assertEqual(result['total_clauses_analyzed'], 3)
+
+
+def _filler_chunks(count):
+    return [{'act': 'Societies Registration Act', 'section': str(i), 'title': f'Provision {i}',
+             'text': f'Clause {i} on annual returns, fees and inspection of records by the registrar.',
+             'pages': [i]} for i in range(1, count + 1)]
+
+
+IPC_420 = {
+    'act': 'Indian Penal Code', 'section': '420',
+    'title': 'Cheating and dishonestly inducing delivery of property',
+    'text': 'Whoever cheats and thereby dishonestly induces the person deceived to deliver any property '
+            'shall be punished with imprisonment for a term which may extend to seven years.',
+    'pages': [1],
+}
+
+
+class BinaryIndexTests(SimpleTestCase):
+    # rag_engine's default SPECULATIVE_SCORE_THRESHOLD
+    THRESHOLD = 0.5
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'corpus.idx')
+        build_index([IPC_420] + _filler_chunks(200), path, version='test')
+        self.index = BinaryIndex.open(path)
+
+    def test_precise_hit_clears_speculative_threshold(self):
+        for query in ('section 420 cheating', 'What is the punishment for cheating?'):
+            chunk, relevance = self.index.search(query)[0]
+            self.assertEqual(chunk['section'], '420', query)
+            self.assertGreaterEqual(relevance, self.THRESHOLD, query)
+
+    def test_incidental_match_stays_below_threshold(self):
+        results = self.index.search('section 420 cheating', top_k=3)
+        self.assertTrue(all(relevance < self.THRESHOLD for _, relevance in results[1:]))
+
+    def test_unknown_terms_find_nothing(self):
+        self.assertEqual(self.index.search('murder'), [])
+
+    def test_postings_and_metadata_round_trip(self):
+        self.assertEqual(self.index.doc_count, 201)
+        self.assertEqual(self.index.postings('cheating'), [(0, 1)])
+        self.assertEqual(self.index.doc(0)['title'], IPC_420['title'])
+
+    def test_varints_round_trip(self):
+        values = [0, 1, 127, 128, 300, 2 ** 32 + 5]
+        encoded = bytearray()
+        for value in values:
+            _encode_varint(value, encoded)
+        self.assertEqual(list(_decode_varints(encoded, 0, len(encoded))), values)
+        self.assertEqual(len(encoded), 1 + 1 + 1 + 2 + 2 + 5)
+
+    def test_delta_encoded_postings_keep_every_doc(self):
+        self.assertEqual(self.index.postings('registrar'), [(doc_id, 1) for doc_id in range(1, 201)])
+        self.assertEqual(self.index.lookup('registrar')[0], 200)
+        self.assertIsNone(self.index.lookup('murder'))
+
+    def test_header_metadata(self):
+        self.assertEqual(self.index.version, 'test')
+        self.assertEqual(sorted(self.index.acts), ['Indian Penal Code', 'Societies Registration Act'])
+
+    def test_rejects_files_that_are_not_indexes(self):
+        with tempfile.NamedTemporaryFile(suffix='.idx', delete=False) as f:
+            f.write(b'\0' * HEADER.size)
+        self.addCleanup(os.unlink, f.name)
+        with self.assertRaises(ValueError):
+            BinaryIndex(f.name)
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter(escalation_min_chars=200)
+
+    def test_factual_lookup_goes_fast_and_analysis_goes_strong(self):
+        self.assertEqual(self.router.route('What is the punishment for theft?')['route'], FAST_ROUTE)
+        decision = self.router.route('Can I challenge the eviction if the lease is not registered, '
+                                     'and should I compare my remedies under the Rent Act?')
+        self.assertEqual(decision['route'], STRONG_ROUTE)
+
+    def test_disabled_routing_pins_strong(self):
+        router = ModelRouter(enabled=False)
+        self.assertEqual(router.route('What is bail?')['model'], router.strong_model)
+
+    def test_short_chat_answer_escalates(self):
+        decision = self.router.route('What is bail?')
+        self.assertTrue(self.router.should_escalate(decision, 'Bail is release.'))
+        self.assertFalse(self.router.should_escalate(decision, 'x' * 200))
+
+    def test_short_answers_are_fine_for_evidence_and_json_tasks(self):
+        for task in ('evidence', 'document_analysis', 'clause_comparison'):
+            decision = {'route': FAST_ROUTE, 'task': task}
+            self.assertFalse(self.router.should_escalate(decision, '12 March 2024'), task)
+            self.assertTrue(self.router.should_escalate(decision, '{}', is_failure=True), task)
+            self.assertTrue(self.router.should_escalate(decision, ''), task)
+
+    def test_strong_route_never_escalates(self):
+        self.assertFalse(self.router.should_escalate({'route': STRONG_ROUTE, 'task': 'chat'}, ''))
+
+    def test_escalated_latency_counts_toward_strong_route(self):
+        decision = {'route': FAST_ROUTE, 'task': 'chat'}
+        self.router.record(decision, 0.4)
+        self.router.record(decision, 3.0, escalated=True)
+        snapshot = self.router.snapshot()
+        self.assertEqual(snapshot['latency'][FAST_ROUTE]['count'], 1)
+        self.assertEqual(snapshot['latency'][STRONG_ROUTE]['count'], 1)
+        self.assertEqual(snapshot['escalations'], 1)
+
+
+class CorpusSearchTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        contract = [{'act': 'Indian Contract Act', 'section': str(i), 'title': f'Contract provision {i}',
+                     'text': f'Agreement clause {i} on consideration and cheating of the promisor.',
+                     'pages': [i]} for i in range(1, 4)]
+        self.groups = {'Indian Penal Code': [IPC_420] + _filler_chunks(40), 'Indian Contract Act': contract}
+
+    def _index(self, name, chunks):
+        path = os.path.join(self.directory, f'{name}.idx')
+        build_index(chunks, path)
+        # Without the embedding re-rank, shard scores must equal the single-index scores exactly
+        index = BinaryIndex(path, embedding_weight=0.0)
+        return index
+
+    def _corpus(self):
+        return Corpus({'version': 'test'}, {act: self._index(str(i), chunks)
+                                            for i, (act, chunks) in enumerate(self.groups.items())})
+
+    def test_locate_finds_the_chunk_a_snippet_came_from(self):
+        corpus = self._corpus()
+        snippet = 'ly induces the person <b>deceived</b> to deliver any property shall be puni'
+        self.assertEqual(corpus.locate('ipc.pdf', snippet)['section'], '420')
+        self.assertEqual(corpus.locate('Indian Penal Code', snippet)['section'], '420')
+        self.assertIsNone(corpus.locate('ipc.pdf', 'a passage that appears nowhere in the corpus text'))
+        self.assertIsNone(corpus.locate('ipc.pdf', 'too short'))
+
+    def test_shards_rank_like_one_index(self):
+        corpus = self._corpus()
+        whole = self._index('whole', [chunk for chunks in self.groups.values() for chunk in chunks])
+
+        for query in ('cheating', 'cheating consideration', 'registrar fees'):
+            expected = [(chunk['act'], chunk['section'], relevance)
+                        for chunk, relevance in whole.search(query, top_k=5)]
+            merged = [(chunk['act'], chunk['section'], relevance)
+                      for chunk, relevance in corpus.search(query, top_k=5)]
+            self.assertEqual(merged, expected, query)
+
+
+class ShardRouterTests(SimpleTestCase):
+    SHARDS = ['Transfer of Property Act, 1882', 'Consumer Protection Act, 2019',
+              'Negotiable Instruments Act, 1881', 'Industrial Disputes Act, 1947', 'Indian Penal Code, 1860']
+
+    def setUp(self):
+        self.router = ShardRouter(get_statute_index(), get_fallback_kb())
+
+    def test_normalize_act_ignores_case_punctuation_and_year(self):
+        self.assertEqual(normalize_act('The Negotiable Instruments Act, 1881'), 'negotiable instruments act')
+
+    def test_single_generic_keyword_searches_every_shard(self):
+        self.assertIsNone(self.router.route('When is rent due?', self.SHARDS))
+        self.assertIsNone(self.router.route('Can I get a refund?', self.SHARDS))
+
+    def test_two_topic_keywords_narrow_the_search(self):
+        self.assertEqual(self.router.route('My landlord kept the rent and the security deposit', self.SHARDS),
+                         ['Transfer of Property Act, 1882'])
+
+    def test_named_act_narrows_the_search(self):
+        self.assertEqual(self.router.route('Is my cheque case maintainable under the NI Act?', self.SHARDS),
+                         ['Negotiable Instruments Act, 1881'])
+
+    def test_disabled_routing_searches_every_shard(self):
+        router = ShardRouter(get_statute_index(), get_fallback_kb(), enabled=False)
+        self.assertIsNone(router.route('cheque bounce under the NI Act', self.SHARDS))
+
+
+class RetrievalGateTests(SimpleTestCase):
+    GATE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'retrieval_gate.json')
+
+    def setUp(self):
+        self.gate = RetrievalGate.load(self.GATE_PATH)
+
+    def test_legal_questions_with_document_cues_retrieve(self):
+        for question in ('What is the date by which I must file an appeal?',
+                         'What is the amount of maintenance I am entitled to?',
+                         'Summarize my options to get out of this lease'):
+            self.assertEqual(self.gate.classify(question)['label'], RETRIEVE, question)
+
+    def test_document_questions_skip_retrieval(self):
+        for question in ('What is the date in this notice?', 'Who signed this letter?',
+                         'How much is the monthly rent in this agreement?'):
+            self.assertEqual(self.gate.classify(question)['label'], LOCAL, question)
+
+    def test_document_cue_needs_the_model_to_agree(self):
+        gate = RetrievalGate(['summarize'], [], [
+            (LOCAL, 'summarize the notice'), (LOCAL, 'who sent the letter'),
+            (RETRIEVE, 'what are my options to end the lease'), (RETRIEVE, 'how do I end the lease early'),
+        ])
+        self.assertEqual(gate.classify('summarize the letter')['label'], LOCAL)
+        decision = gate.classify('summarize my options to end the lease')
+        self.assertEqual(decision['label'], RETRIEVE)
+        self.assertLess(decision['p_local'], 0.5)
+
+    def test_disabled_gate_always_retrieves(self):
+        gate = RetrievalGate.load(self.GATE_PATH, enabled=False)
+        self.assertEqual(gate.classify('What is the date in this notice?')['label'], RETRIEVE)
+
+    def test_record_counts_saved_time(self):
+        self.gate.record({'label': LOCAL, 'reason': 'model'}, 0.8)
+        self.gate.record({'label': RETRIEVE, 'reason': "rule: legal cue 'valid'"}, 1.2)
+        snapshot = self.gate.snapshot()
+        self.assertEqual(snapshot[LOCAL]['mean_saved_seconds'], 0.8)
+        self.assertEqual(snapshot['by_reason']['rule'][RETRIEVE], 1)
+
+
+class QueryExpansionTests(SimpleTestCase):
+    def test_terms_match_whole_words(self):
+        self.assertEqual(_find_terms('the first hearing at the firm', ['fir']), [])
+        self.assertEqual(_find_terms('police refused to register my fir', ['fir']), ['fir'])
+        self.assertEqual(_find_terms('two complaints were filed', ['complaint']), ['complaint'])
+
+    def test_longer_terms_win(self):
+        self.assertEqual(_find_terms('reply to the legal notice', ['notice', 'legal notice']), ['legal notice'])
+
+    def test_expand_puts_the_original_first(self):
+        queries = QueryExpander(max_queries=4).expand('Can I file an FIR for cheating by my landlord?')
+        self.assertEqual(queries[0], 'Can I file an FIR for cheating by my landlord?')
+        self.assertIn('punishment for cheating', queries)
+        self.assertIn('procedure for fir', queries)
+        self.assertLessEqual(len(queries), 4)
+
+    def test_fusion_ranks_chunks_found_by_several_queries_first(self):
+        results = {'q': (CHUNK_SEPARATOR.join(['shared', 'only q']), [{'document': 'A'}, {'document': 'B'}]),
+                   'r': (CHUNK_SEPARATOR.join(['other', 'shared']), [{'document': 'C'}, {'document': 'A'}])}
+        context, sources, report = QueryExpander().retrieve(['q', 'r'], results.get, limit=3)
+        self.assertEqual(context.split(CHUNK_SEPARATOR), ['shared', 'other', 'only q'])
+        self.assertEqual(sources[0], {'document': 'A'})
+        self.assertEqual(report['completed'], 2)
+
+    def test_extra_sub_queries_share_one_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def search(query):
+            if query != 'original':
+                release.wait(5)
+            return query, [{'document': query}]
+
+        start = time.monotonic()
+        _, sources, report = QueryExpander(deadline=0.2).retrieve(['original', 'slow-1', 'slow-2', 'slow-3'],
+                                                                 search, limit=4)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(report['completed'], 1)
+        self.assertEqual(sources, [{'document': 'original'}])
+
+    def test_no_retriever_backend_searches_the_original_query_once(self):
+        engine = _test_engine()
+        engine.data_store_id, engine.corpus = None, None
+        with mock.patch.object(engine, 'search_legal_db', return_value=('context', [])) as search:
+            engine.search_legal_db_expanded('Can I file an FIR for cheating by my landlord?', hints=['refund'])
+        self.assertEqual([call.args[0] for call in search.call_args_list],
+                         ['Can I file an FIR for cheating by my landlord?'])
+
+    def test_answer_cache_key_includes_the_hints(self):
+        engine = _test_engine()
+        answer = {'response': 'ok', 'sources': [], 'confidence': 'high'}
+        with mock.patch.object(engine, 'search_legal_db_expanded', return_value=('context', [])), \
+                mock.patch.object(engine, 'generate_lawyer_response', return_value=answer) as generate:
+            for hints in (['Lock-in period'], ['lock-in  period'], ['Stamp duty']):
+                engine.process_legal_query('Is this clause valid?', expansion_hints=hints)
+        self.assertEqual(generate.call_count, 2)
+
+
+class _Provider:
+    """Web search provider returning canned results (or raising) after a delay"""
+
+    def __init__(self, name, results=(), error=None, delay=0.0):
+        self.name = name
+        self.results = list(results)
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query, max_results=5):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.results[:max_results]
+
+
+class WebFallbackTests(SimpleTestCase):
+    RESULT = {'title': 'IPC 420', 'body': 'Cheating', 'href': 'https://indiankanoon.org/doc/1/'}
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('  What is BAIL?? '), 'what is bail')
+
+    def test_first_non_empty_provider_wins_and_is_cached(self):
+        empty, found = _Provider('empty'), _Provider('found', [self.RESULT], delay=0.05)
+        web = WebFallback([empty, found], deadline=2.0)
+        outcome = web.search('What is cheating?')
+        self.assertEqual((outcome['provider'], outcome['error'], outcome['cached']), ('found', None, False))
+        self.assertTrue(web.search('what is cheating')['cached'])
+        self.assertEqual(found.calls, 1)
+
+    def test_real_empty_result_is_negative_cached(self):
+        provider = _Provider('empty')
+        web = WebFallback([provider], deadline=1.0)
+        self.assertIsNone(web.search('obscure question')['error'])
+        self.assertTrue(web.search('obscure question')['cached'])
+        self.assertEqual(provider.calls, 1)
+
+    def test_failed_providers_report_an_error_and_are_not_cached(self):
+        provider = _Provider('broken', error=ConnectionError('rate limited'))
+        web = WebFallback([provider], deadline=1.0)
+        outcome = web.search('What is cheating?')
+        self.assertEqual(outcome['results'], [])
+        self.assertIn('rate limited', outcome['error'])
+        web.search('What is cheating?')
+        self.assertEqual(provider.calls, 2)
+
+    def test_deadline_reports_an_error(self):
+        web = WebFallback([_Provider('slow', [self.RESULT], delay=0.5)], deadline=0.05)
+        outcome = web.search('What is cheating?')
+        self.assertEqual(outcome['results'], [])
+        self.assertIn('no answer within', outcome['error'])
+        self.assertIsNone(web.cache.get((normalize_query('What is cheating?'), 5)))
+
+
+class DepthPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.policy = DepthPolicy(candidates=8, min_k=1, gap_ratio=0.6, mass=0.8, token_budget=2500)
+
+    def test_dominant_hit_stops_at_the_score_gap(self):
+        depth = self.policy.choose(['a'] * 5, [0.9, 0.3, 0.2, 0.2, 0.1], top_k=3)
+        self.assertEqual((depth['depth'], depth['reason']), (1, 'score gap at 1'))
+
+    def test_flat_scores_go_deeper_than_top_k(self):
+        depth = self.policy.choose(['a'] * 8, [0.5] * 8, top_k=3)
+        self.assertGreater(depth['depth'], 3)
+        self.assertLess(depth['tokens_saved'], 0)
+
+    def test_token_estimate_blends_characters_and_pieces(self):
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens('a'), 1)
+        # 44 characters (11 by length), 13 words and punctuation marks (9.75 by pieces)
+        self.assertEqual(estimate_tokens('Section 138, NI Act: dishonour of cheque(s).'), 10)
+
+    def test_token_budget_caps_depth(self):
+        policy = DepthPolicy(token_budget=100, gap_ratio=0.0, mass=1.0)
+        depth = policy.choose(['word ' * 60] * 4, [0.5] * 4, top_k=4)
+        self.assertEqual((depth['depth'], depth['reason']), (1, 'token budget'))
+
+    def test_without_scores_top_k_chunks_are_kept(self):
+        self.assertEqual(self.policy.choose(['a'] * 6, [None] * 6, top_k=3)['depth'], 3)
+
+    def test_without_scores_top_k_counts_documents(self):
+        # Three snippets from document 0, two from 1, one each from 2 and 3
+        groups = [0, 0, 0, 1, 1, 2, 3]
+        depth = self.policy.choose(['a'] * 7, [None] * 7, top_k=2, groups=groups)
+        self.assertEqual((depth['depth'], depth['reason']), (5, 'no scores'))
+        self.assertEqual(depth['tokens_saved'], 0)
+
+    def test_disabled_policy_keeps_every_snippet_of_top_k_documents(self):
+        policy = DepthPolicy(enabled=False)
+        self.assertEqual(policy.fetch_size(3), 3)
+        self.assertEqual(policy.choose(['a'] * 4, [0.9, 0.9, 0.1, 0.1], top_k=1, groups=[0, 0, 1, 1])['depth'], 2)
+
+
+class _Model:
+    """GenerativeModel stand-in: each call pops a (delay, outcome) step"""
+
+    model_name = 'models/gemini-flash-latest'
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None):
+        with self.lock:
+            delay, outcome = self.steps.pop(0)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(text=outcome, usage_metadata=SimpleNamespace(prompt_token_count=100,
+                                                                            candidates_token_count=20))
+
+
+class UsageTests(SimpleTestCase):
+    CONFIG = SimpleNamespace(max_output_tokens=256)
+
+    def setUp(self):
+        self.ledger = UsageLedger({'gemini-flash-latest': (0.30, 2.50)})
+        patcher = mock.patch('app.usage._ledger', self.ledger)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _generate(self, engine, model):
+        return LegalRAGEngine.generate_content(engine, model, 'What is bail?', self.CONFIG, op='gemini')
+
+    def test_usage_metadata_and_cost(self):
+        with request_scope('chat'):
+            self._generate(SimpleNamespace(hedger=Hedger()), _Model((0, 'Bail is ...')))
+            summary = request_usage_summary()
+        self.assertEqual((summary['model_calls'], summary['input_tokens'], summary['output_tokens']), (1, 100, 20))
+        self.assertFalse(summary['estimated'])
+        self.assertAlmostEqual(summary['cost_usd'], (100 * 0.30 + 20 * 2.50) / 1_000_000)
+
+    def test_hedged_duplicate_is_recorded(self):
+        hedger = Hedger(enabled=True, budget_ratio=1.0, min_samples=1)
+        hedger.tracker('gemini_short').observe(0.01)
+        model = _Model((0.3, 'slow primary'), (0, 'fast hedge'))
+        with request_scope('chat'):
+            self.assertEqual(self._generate(SimpleNamespace(hedger=hedger), model).text, 'fast hedge')
+            # The losing attempt is recorded when it returns, after the response
+            deadline = time.monotonic() + 2
+            while request_usage_summary()['model_calls'] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            summary = request_usage_summary()
+        self.assertEqual(summary['model_calls'], 2)
+        self.assertEqual(hedger.stats['hedge_wins'], 1)
+
+    def test_failed_call_is_recorded_with_estimated_input(self):
+        with request_scope('chat'):
+            with self.assertRaises(ConnectionError):
+                self._generate(SimpleNamespace(hedger=Hedger()), _Model((0, ConnectionError('503'))))
+            summary = request_usage_summary()
+        self.assertEqual((summary['model_calls'], summary['failed_calls']), (1, 1))
+        self.assertTrue(summary['estimated'])
+        self.assertGreater(summary['input_tokens'], 0)
+        self.assertEqual(summary['output_tokens'], 0)
+        self.assertEqual(self.ledger.snapshot()[('chat', 'gemini')]['failed_calls'], 1)
+
+
+class CorpusReloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        os.makedirs(os.path.join(self.directory, 'segments'))
+
+    def _publish(self, files):
+        entries = {}
+        for source, (act, chunks) in files.items():
+            segment = os.path.join('segments', f'{source}.json')
+            with open(os.path.join(self.directory, segment), 'w', encoding='utf-8') as f:
+                json.dump({'chunks': chunks}, f)
+            entries[source] = {'digest': f'{source}-{len(chunks)}' * 4, 'segment': segment, 'act': act,
+                               'pages': 1, 'chunks': len(chunks)}
+        return publish_corpus(self.directory, entries)
+
+    def test_watcher_reports_only_changed_acts(self):
+        self._publish({'ipc.pdf': ('Indian Penal Code', [IPC_420]), 'sra.pdf': ('Societies Act', _filler_chunks(2))})
+        current = Corpus.load(self.directory)
+        reloads = []
+        watcher = CorpusWatcher(self.directory, current, lambda corpus, tags: reloads.append((corpus, tags)))
+        self.assertFalse(watcher.check())
+
+        time.sleep(0.01)
+        self._publish({'ipc.pdf': ('Indian Penal Code', [IPC_420]), 'sra.pdf': ('Societies Act', _filler_chunks(3))})
+        self.assertTrue(watcher.check())
+        corpus, tags = reloads[0]
+        self.assertEqual(tags, {'sra.pdf', 'societies act'})
+        self.assertIs(corpus.shards['Indian Penal Code'], current.shards['Indian Penal Code'])
+        self.assertEqual(corpus.doc_count, 4)
+
+    def test_reload_publishes_the_process_wide_corpus(self):
+        with mock.patch('app.corpus._corpus', None), mock.patch('app.corpus._corpus_loaded', True):
+            corpus = Corpus({'version': 'v2'}, {})
+            engine = SimpleNamespace(retrieval_cache=mock.Mock(), answer_cache=mock.Mock())
+            engine.retrieval_cache.invalidate_tags.return_value = 0
+            engine.answer_cache.invalidate_tags.return_value = 0
+            LegalRAGEngine._on_corpus_reload(engine, corpus, {'ipc.pdf'})
+            self.assertIs(engine.corpus, corpus)
+            self.assertIs(get_corpus(), corpus)
+
+
+class StartupTests(SimpleTestCase):
+    def test_readyz_is_unavailable_until_warm(self):
+        report = StartupReport(mode='background')
+        with mock.patch('app.views.startup_report', report):
+            self.assertEqual(self.client.get('/readyz').status_code, 503)
+            report.state = READY
+            self.assertEqual(self.client.get('/readyz').json()['status'], READY)
+            report.state = DEGRADED
+            self.assertEqual(self.client.get('/readyz').status_code, 200)
+
+    def test_healthz_is_always_ok(self):
+        with mock.patch('app.views.startup_report', StartupReport(mode='background')):
+            self.assertEqual(self.client.get('/healthz').status_code, 200)
+
+    def test_off_mode_is_ready_immediately(self):
+        self.assertTrue(StartupReport(mode='off').ready)
+
+    def test_lazy_module_imports_on_first_use(self):
+        module = LazyModule('colorsys')
+        self.assertIn('deferred', repr(module))
+        self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn('loaded', repr(module))
+
+
+class HedgingTests(SimpleTestCase):
+    def _hedger(self, **options):
+        hedger = Hedger(enabled=True, min_samples=1, **options)
+        hedger.tracker('op').observe(0.01)
+        return hedger
+
+    def test_latency_percentiles(self):
+        tracker = LatencyTracker(window=100)
+        self.assertIsNone(tracker.percentile(0.95))
+        for value in range(1, 101):
+            tracker.observe(value / 100)
+        self.assertEqual(tracker.percentile(0.5), 0.51)
+        self.assertEqual(tracker.percentile(0.95), 0.96)
+        self.assertAlmostEqual(tracker.mean(), 0.505)
+
+    def test_budget_allows_one_hedge_per_ratio_of_calls(self):
+        budget = HedgingBudget(ratio=0.5)
+        budget.record_call()
+        self.assertFalse(budget.try_acquire())
+        budget.record_call()
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+
+    def test_slow_primary_is_hedged(self):
+        hedger = self._hedger(budget_ratio=1.0)
+        attempts = iter([(0.5, 'primary'), (0.0, 'hedge')])
+
+        def call():
+            delay, label = next(attempts)
+            time.sleep(delay)
+            return label
+
+        self.assertEqual(hedger.call('op', call), 'hedge')
+        self.assertEqual((hedger.stats['hedges_sent'], hedger.stats['hedge_wins']), (1, 1))
+
+    def test_empty_budget_waits_for_the_primary(self):
+        hedger = self._hedger(budget_ratio=0.0)
+        self.assertEqual(hedger.call('op', lambda: time.sleep(0.05) or 'primary'), 'primary')
+        self.assertEqual((hedger.stats['hedges_sent'], hedger.stats['budget_denied']), (0, 1))
+
+    def test_both_attempts_failing_raises_the_primary_error(self):
+        hedger = self._hedger(budget_ratio=1.0)
+        errors = iter([TimeoutError('primary'), TimeoutError('hedge')])
+
+        def call():
+            error = next(errors)
+            time.sleep(0.05)
+            raise error
+
+        with self.assertRaisesMessage(TimeoutError, 'primary'):
+            hedger.call('op', call)
+
+    def test_disabled_or_cold_operations_are_never_hedged(self):
+        for hedger in (Hedger(enabled=False), Hedger(enabled=True, min_samples=20)):
+            self.assertEqual(hedger.call('op', lambda: 'ok'), 'ok')
+            self.assertEqual(hedger.stats['hedges_sent'], 0)
+            self.assertEqual(hedger.tracker('op').count(), 1)
+
+
+def _test_engine():
+    """A LegalRAGEngine with Gemini mocked out, no web providers and no corpus watcher"""
+    with mock.patch.dict(os.environ, {'CORPUS_RELOAD_INTERVAL': '0', 'WEB_FALLBACK_PROVIDERS': ''}), \
+            mock.patch('app.rag_engine.genai'):
+        return LegalRAGEngine()
+
+
+class _StreamModel:
+    """Streams the given pieces, remembering how many were consumed and whether the stream was closed"""
+
+    model_name = 'models/gemini-pro-latest'
+
+    def __init__(self, *pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        # Held here so only an explicit close (not garbage collection) finishes the stream
+        self.stream = self._stream()
+        return self.stream
+
+    def _stream(self):
+        try:
+            for piece in self.pieces:
+                self.consumed += 1
+                yield SimpleNamespace(text=piece)
+        finally:
+            self.closed = True
+
+
+class SpeculativeFallbackTests(SimpleTestCase):
+    WEB_ANSWER = {'response': 'From the web', 'sources': [], 'confidence': 'medium-web', 'note': 'web'}
+    DECISION = {'route': 'strong', 'model': 'gemini-pro-latest', 'task': 'chat'}
+    SOURCES = [{'filename': 'Indian Penal Code', 'page': '1', 'relevance_score': 0.2}]
+
+    def setUp(self):
+        self.engine = _test_engine()
+        patcher = mock.patch.object(self.engine, '_perform_web_search_fallback', return_value=self.WEB_ANSWER)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, model):
+        with mock.patch.object(self.engine, 'get_model', return_value=model):
+            return self.engine._generate_with_speculative_fallback('What is cheating?', self.DECISION, 'prompt',
+                                                                   None, self.SOURCES)
+
+    def test_weak_scores_trigger_speculation(self):
+        self.assertTrue(self.engine._is_weak_retrieval([{'relevance_score': 0.3}, {'relevance_score': 0.4}]))
+        self.assertFalse(self.engine._is_weak_retrieval([{'relevance_score': 0.3}, {'relevance_score': 0.8}]))
+        self.assertFalse(self.engine._is_weak_retrieval([{'relevance_score': None}]))
+
+    def test_failure_phrase_cuts_the_stream_and_uses_the_web_result(self):
+        model = _StreamModel('The query is ', FAILURE_PHRASES[0], ' of the documents', ' never read')
+        self.assertEqual(self._run(model), self.WEB_ANSWER)
+        self.assertEqual(model.consumed, 2)
+        self.assertTrue(model.closed)
+        self.assertEqual(self.engine.speculation_stats['used'], 1)
+
+    def test_grounded_answer_discards_the_web_result(self):
+        answer = self._run(_StreamModel('Pursuant to Section 420 ', 'of the Indian Penal Code, ' * 10))
+        self.assertTrue(answer['response'].startswith('Pursuant to Section 420'))
+        self.assertEqual(self.engine.speculation_stats, {'launched': 1, 'used': 0, 'discarded': 1})
+
+
+class StatuteIndexTests(SimpleTestCase):
+    DATA = {
+        'acts': {
+            'IPC': {'name': 'Indian Penal Code, 1860', 'aliases': ['indian penal code']},
+            'BNS': {'name': 'Bharatiya Nyaya Sanhita, 2023', 'aliases': []},
+            'NIA': {'name': 'Negotiable Instruments Act, 1881', 'aliases': ['ni act']},
+        },
+        'sections': [
+            {'act': 'IPC', 'section': '420', 'title': 'Cheating', 'text': 'Whoever cheats...',
+             'equivalent': [['BNS', '318']]},
+            {'act': 'IPC', 'section': '406', 'title': 'Breach of trust', 'text': 'Whoever commits...'},
+            {'act': 'IPC', 'section': '498-A', 'title': 'Cruelty', 'text': 'Whoever, being the husband...'},
+            {'act': 'BNS', 'section': '318', 'title': 'Cheating', 'text': 'Whoever cheats (new code)...'},
+            {'act': 'NIA', 'section': '138', 'title': 'Dishonour of cheque', 'text': 'Where any cheque...',
+             'see': [['NIA', '142']]},
+            {'act': 'NIA', 'section': '142', 'title': 'Cognizance of offences', 'text': 'No court shall...'},
+        ],
+    }
+
+    def setUp(self):
+        self.index = StatuteIndex(self.DATA)
+
+    def test_normalize_section(self):
+        self.assertEqual(normalize_section('498-a'), '498A')
+        self.assertEqual(normalize_section('154(1)'), '154')
+
+    def test_citation_forms(self):
+        self.assertEqual(self.index.parse_citations('What is Section 420 IPC?'), [('IPC', '420')])
+        self.assertEqual(self.index.parse_citations('Sec. 302 of the Indian Penal Code'), [('IPC', '302')])
+        self.assertEqual(self.index.parse_citations('complaint u/s 138 NI Act'), [('NIA', '138')])
+        self.assertEqual(self.index.parse_citations('IPC Section 498A'), [('IPC', '498A')])
+        self.assertEqual(self.index.parse_citations('Sections 406 and 420 IPC'), [('IPC', '406'), ('IPC', '420')])
+        self.assertEqual(self.index.parse_citations('Is cheating a crime?'), [])
+
+    def test_cross_references_resolve_both_ways(self):
+        resolved = self.index.resolve('Section 420 IPC')
+        self.assertEqual([(p['act'], p['section'], p['cross_ref_of']) for p in resolved],
+                         [('IPC', '420', None), ('BNS', '318', ('IPC', '420'))])
+        self.assertEqual([p['act'] for p in self.index.resolve('Section 318 BNS')], ['BNS', 'IPC'])
+        self.assertEqual(len(self.index.resolve('Section 420 IPC', include_cross_refs=False)), 1)
+
+    def test_see_links_are_not_equivalents(self):
+        self.assertEqual(self.index.cross_refs.get(('NIA', '138')), None)
+        self.assertEqual(self.index.see_also[('NIA', '138')], [('NIA', '142')])
+        self.assertNotIn(('NIA', '142'), self.index.see_also)
+        self.assertEqual([(p['section'], p['cross_ref_of']) for p in self.index.resolve('Section 138 NI Act')],
+                         [('138', None), ('142', ('NIA', '138'))])
+
+    def test_pure_lookup_vs_question(self):
+        self.assertTrue(self.index.is_pure_lookup('What is Section 420 IPC?'))
+        self.assertFalse(self.index.is_pure_lookup('Can my landlord be charged under Section 420 IPC?'))
+        self.assertFalse(self.index.is_pure_lookup('What is cheating?'))
+
+    def test_mentioned_acts_and_names(self):
+        self.assertEqual(self.index.mentioned_acts('cheque bounce under the NI Act or IPC'), ['NIA', 'IPC'])
+        self.assertEqual(self.index.act_name('NIA'), 'Negotiable Instruments Act, 1881')
+        self.assertEqual(self.index.act_name('XYZ'), 'XYZ')
+
+    def test_engine_answers_pure_lookups_without_generation(self):
+        engine = _test_engine()
+        engine.statute_index = self.index
+        with mock.patch.object(engine, 'get_model') as get_model:
+            answer = engine._answer_from_statute_index('What is Section 420 IPC?')
+        get_model.assert_not_called()
+        self.assertEqual(answer['confidence'], 'high')
+        self.assertIn('Whoever cheats...', answer['response'])
+        self.assertIsNone(engine._answer_from_statute_index('What is Section 999 IPC?'))
+
+
+class FallbackKnowledgeBaseTests(SimpleTestCase):
+    TOPICS = [
+        {'id': 'cheque', 'keywords': ['cheque', {'term': 'bounce', 'weight': 2}], 'context': 'Cheque context',
+         'sources': [{'filename': 'NI Act', 'page': '138', 'relevance_score': 0.9}]},
+        {'id': 'tenancy', 'keywords': ['rent', 'landlord', 'security deposit'], 'context': 'Tenancy context',
+         'sources': [{'filename': 'Rent Act', 'page': '1', 'relevance_score': 0.8}]},
+        {'id': 'cyber', 'keywords': ['hacking', 'cheque'], 'priority': 0.5, 'context': 'Cyber context'},
+    ]
+
+    def setUp(self):
+        self.kb = FallbackKnowledgeBase(self.TOPICS)
+
+    def test_automaton_finds_overlapping_patterns(self):
+        matcher = AhoCorasick(['he', 'she', 'his', 'hers'])
+        self.assertEqual(sorted(matcher.find('ushers')), [(0, 2), (1, 1), (3, 2)])
+        self.assertEqual(AhoCorasick([]).find('anything'), [])
+
+    def test_keywords_match_at_word_start_only(self):
+        self.assertEqual([t['id'] for t, _, _ in self.kb.score_topics('Is the rental agreement valid?')], ['tenancy'])
+        self.assertEqual(self.kb.score_topics('My parent signed it'), [])
+
+    def test_scores_use_weights_and_priority(self):
+        ranked = self.kb.score_topics('My cheque will bounce')
+        self.assertEqual([(t['id'], score) for t, score, _ in ranked], [('cheque', 3.0), ('cyber', 0.5)])
+        # Phrases weigh their word count
+        self.assertEqual(self.kb.score_topics('security deposit not returned')[0][1], 2.0)
+
+    def test_lookup_combines_close_runner_up_topics(self):
+        context, sources, ids = self.kb.lookup('Landlord kept my rent and the cheque bounced')
+        self.assertEqual(ids, ['cheque', 'tenancy'])
+        self.assertEqual(context, 'Cheque context\n\nTenancy context')
+        self.assertEqual([s['filename'] for s in sources], ['NI Act', 'Rent Act'])
+        self.assertEqual(self.kb.lookup('cheque bounce')[2], ['cheque'])
+        self.assertIsNone(self.kb.lookup('What is the weather?'))
+
+    def test_bundled_topic_table_loads(self):
+        self.assertTrue(get_fallback_kb().topics)
+        self.assertIsNotNone(get_fallback_kb().lookup('My cheque bounced'))
+
+
+class ActChunkingTests(SimpleTestCase):
+    PAGES = [
+        "THE INDIAN PENAL CODE, 1860\n"
+        "420. Cheating and dishonestly inducing delivery of property.—Whoever cheats and thereby\n",
+        "dishonestly induces the person deceived to deliver any property shall be punished.\n"
+        "1. Subs. by Act 5 of 2019, s. 2.— for the words\n"
+        "421. Dishonest or fraudulent removal of property.—Whoever dishonestly removes any property.\n",
+    ]
+
+    def test_sections_with_titles_and_page_ranges(self):
+        chunks = chunk_act_text(self.PAGES, 'Indian Penal Code', 'ipc.pdf')
+        self.assertEqual([(c['section'], c['page_start'], c['page_end']) for c in chunks],
+                         [('420', 1, 2), ('421', 2, 2)])
+        self.assertEqual(chunks[0]['title'], 'Cheating and dishonestly inducing delivery of property')
+        self.assertEqual(page_label(chunks[0]), '1-2')
+        self.assertEqual(page_label(chunks[1]), '2')
+        self.assertTrue(all(c['source'] == 'ipc.pdf' and c['subsection'] is None for c in chunks))
+
+    def test_long_sections_split_at_subsections(self):
+        body = ' '.join(f"({n}) {'The officer shall record the information. ' * 8}" for n in (1, 2, 3))
+        chunks = chunk_act_text([f"154. Information in cognizable cases.—{body}"], 'CrPC', 'crpc.pdf', max_chars=400)
+        self.assertEqual([c['subsection'] for c in chunks if c['subsection']], ['1', '2', '3'])
+        self.assertTrue(all(c['text'].startswith('154. Information in cognizable cases') for c in chunks))
+        self.assertEqual(len({c['id'] for c in chunks}), len(chunks))
+
+    def test_act_name_from_title_or_filename(self):
+        self.assertEqual(detect_act_name(self.PAGES[0], 'x.pdf'), 'Indian Penal Code, 1860')
+        self.assertEqual(detect_act_name('no title here', '/acts/consumer_protection.pdf'), 'Consumer Protection')
+        running_text = 'Notwithstanding anything in this act, 2019 amendments apply.'
+        self.assertEqual(detect_act_name(running_text, '/acts/motor_vehicles.pdf'), 'Motor Vehicles')
+        self.assertEqual(detect_act_name('THE NEGOTIABLE INSTRUMENTS ACT, 1881', 'x.pdf'),
+                         'Negotiable Instruments Act, 1881')
+
+    def test_same_named_files_in_different_folders_stay_apart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for folder in ('central', 'state'):
+                os.makedirs(os.path.join(directory, folder))
+                open(os.path.join(directory, folder, 'rent_act.pdf'), 'wb').close()
+            command = IngestCommand()
+            sources = command._collect_pdfs([directory])
+            self.assertEqual(sorted(sources.values()), ['central/rent_act.pdf', 'state/rent_act.pdf'])
+            with self.assertRaises(CommandError):
+                command._collect_pdfs([os.path.join(directory, folder, 'rent_act.pdf')
+                                       for folder in ('central', 'state')])
+
+
+class PromptPackingTests(SimpleTestCase):
+    SECTION = ('Whoever cheats and thereby dishonestly induces the person deceived to deliver any property '
+               'to any person shall be punished with imprisonment of either description for a term which '
+               'may extend to seven years, and shall also be liable to fine.')
+
+    def _pack(self, chunks, scores, route='strong', packer=None):
+        sources = [{'filename': f'doc{i}', 'relevance_score': score} for i, score in enumerate(scores)]
+        return (packer or ContextPacker()).pack(CHUNK_SEPARATOR.join(chunks), sources, route)
+
+    def test_exact_contained_and_near_duplicates_are_dropped(self):
+        chunks = [
+            f"[Source: IPC, Page 1] {self.SECTION}",
+            f"[Source: IPC copy, Page 9] {self.SECTION.upper()}",
+            "[Source: IPC, Page 1] shall be punished with imprisonment of either description",
+            f"[Source: IPC, Page 2] {self.SECTION.replace('seven', 'ten')}",
+            "[Source: NI Act, Page 4] Where any cheque drawn by a person is returned unpaid by the bank.",
+        ]
+        context, sources, report = self._pack(chunks, [0.9, 0.8, 0.7, 0.6, 0.5])
+        self.assertEqual([source['filename'] for source in sources], ['doc0', 'doc4'])
+        self.assertEqual(report['duplicates'], 3)
+        self.assertEqual(context.count(CHUNK_SEPARATOR), 1)
+
+    def test_minhash_estimates_similarity(self):
+        signature = minhash(shingles(self.SECTION.lower()))
+        self.assertEqual(similarity(signature, signature), 1.0)
+        self.assertLess(similarity(signature, minhash(shingles('a completely different provision on wages'))), 0.2)
+        self.assertEqual(similarity((), signature), 0.0)
+
+    def test_chunks_are_ordered_by_relevance(self):
+        _, sources, _ = self._pack(['low score text here', 'high score text there'], [0.2, 0.9])
+        self.assertEqual([source['filename'] for source in sources], ['doc1', 'doc0'])
+        # Without scores retrieval order is kept
+        _, sources, _ = self._pack(['first chunk text', 'second chunk text'], [None, None])
+        self.assertEqual([source['filename'] for source in sources], ['doc0', 'doc1'])
+
+    def test_budget_depends_on_route_and_keeps_the_best_chunk(self):
+        packer = ContextPacker(budgets={'fast': 60, 'strong': 400})
+        chunks = [f"Provision {i}: " + ' '.join(f"term{i}x{j}" for j in range(40)) for i in range(3)]
+        for route, kept in (('fast', 1), ('strong', 3)):
+            context, _, report = self._pack(chunks, [0.9, 0.8, 0.7], route, packer)
+            self.assertEqual(report['chunks_out'], kept, route)
+            self.assertLessEqual(report['tokens_out'], report['tokens_in'])
+        self.assertEqual(packer.stats['over_budget'], 2)
+
+    def test_disabled_packer_passes_context_through(self):
+        context = CHUNK_SEPARATOR.join(['same text', 'same text'])
+        self.assertEqual(ContextPacker(enabled=False).pack(context, [{}, {}])[0], context)
+
+
+class ContextCompressionTests(SimpleTestCase):
+    CHEQUE = ('[Source: Negotiable Instruments Act, Page 45]\n'
+              'Where any cheque drawn by a person is returned by the bank unpaid for insufficiency of funds, '
+              'such person shall be deemed to have committed an offence. The offence is punishable with '
+              'imprisonment which may extend to two years, or with fine which may extend to twice the amount '
+              'of the cheque. Nothing in this section applies unless the cheque is presented within three '
+              'months. The payee makes a demand by notice in writing within thirty days of receiving '
+              'information from the bank. The drawer fails to make payment within fifteen days of the notice.')
+    CONTRACT = ('[Source: Indian Contract Act, Page 12]\n'
+                'An agreement not enforceable by law is said to be void. A contract which ceases to be '
+                'enforceable by law becomes void when it ceases to be enforceable. When a contract contains '
+                'reciprocal promises, the party who prevents performance may be liable. The registrar shall '
+                'maintain records of such agreements for inspection by the parties on payment of fees.')
+
+    def test_split_sentences_keeps_abbreviations_and_clauses(self):
+        self.assertEqual(split_sentences('As per Sec. 138 the drawer is liable. Notice is required.'),
+                         ['As per Sec. 138 the drawer is liable.', 'Notice is required.'])
+        self.assertEqual(split_sentences('The following:\n(a) first; (b) second. Then more.'),
+                         ['The following:\n(a) first;\n(b) second.', 'Then more.'])
+        self.assertEqual(split_sentences('If so, the tenant can:\n1. Send a notice\n2. File a suit'),
+                         ['If so, the tenant can:\n1. Send a notice\n2. File a suit'])
+
+    def test_relevant_sentences_and_markers_are_kept(self):
+        context = CHUNK_SEPARATOR.join([self.CHEQUE, self.CONTRACT])
+        compressed, report = ContextCompressor().compress('What is the punishment for a dishonoured cheque?',
+                                                          context)
+        self.assertIn('punishable with imprisonment', compressed)
+        self.assertNotIn('fifteen days', compressed)
+        # Every chunk keeps its marker and at least its best sentence
+        self.assertEqual(compressed.count('[Source:'), 2)
+        self.assertEqual(compressed.count(CHUNK_SEPARATOR), 1)
+        self.assertLess(report['ratio'], 1.0)
+        self.assertLess(report['sentences_out'], report['sentences_in'])
+
+    def test_short_chunks_and_disabled_compressor_are_untouched(self):
+        short = '[Source: IPC, Page 1]\nWhoever cheats shall be punished.'
+        self.assertEqual(ContextCompressor().compress('cheating', short)[0], short)
+        compressed, report = ContextCompressor(enabled=False).compress('cheque', self.CHEQUE)
+        self.assertEqual((compressed, report['ratio']), (self.CHEQUE, 1.0))
+
+    def _engine_context(self, query, **kwargs):
+        engine = _test_engine()
+        engine.data_store_id, engine.corpus, engine.answer_cache_ttl = None, None, 0
+        seen = {}
+
+        def generate(query, context, sources, *args):
+            seen['context'] = context
+            return {'response': 'ok', 'sources': sources, 'confidence': 'high'}
+
+        with mock.patch.object(engine, 'generate_lawyer_response', side_effect=generate):
+            response = engine.process_legal_query(query, **kwargs)
+        return engine, seen['context'], response
+
+    def test_fallback_topic_context_is_not_compressed(self):
+        query = 'My landlord is not returning my security deposit'
+        for kwargs in ({}, {'expansion_hints': []}):
+            engine, context, response = self._engine_context(query, **kwargs)
+            self.assertEqual(context, engine.fallback_kb.lookup(query)[0])
+            self.assertIn('the tenant can:\n1. Send a legal notice', context)
+            self.assertNotIn('compression', response.get('retrieval', {}))
+
+    def test_web_fallback_context_keeps_its_header(self):
+        results = {'results': [{'href': 'https://indiankanoon.org/doc/1/'}]}
+        with mock.patch('app.rag_engine.WebFallback.search', return_value=results):
+            _, context, _ = self._engine_context('Can my neighbour build a wall blocking my window light?')
+        self.assertTrue(context.startswith('[Web Search Results - Verifiable Legal Sources]'))
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram('stage_seconds', 'Stage latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage='search')
+        lines = registry.render().splitlines()
+        self.assertIn('stage_seconds_bucket{stage="search",le="0.1"} 1', lines)
+        self.assertIn('stage_seconds_bucket{stage="search",le="1.0"} 2', lines)
+        self.assertIn('stage_seconds_bucket{stage="search",le="+Inf"} 3', lines)
+        self.assertIn('stage_seconds_count{stage="search"} 3', lines)
+        self.assertIn('stage_seconds_sum{stage="search"} 5.55', lines)
+
+    def test_counter_labels_are_escaped(self):
+        registry = Registry()
+        registry.counter('events_total', 'Events').inc(2, event='say "hi"\n')
+        self.assertIn('events_total{event="say \\"hi\\"\\n"} 2', registry.render())
+
+    def test_collectors_are_flattened_and_failures_skipped(self):
+        registry = Registry()
+        stats = {'hits': 3, 'enabled': True, 'routes': {'fast': 2, 'strong': 1}}
+        registry.register_collector(lambda: [('router', 'gauge', 'Router stats', stats_samples(stats, {'c': 'x'}))])
+        registry.register_collector(lambda: 1 / 0)
+        rendered = registry.render()
+        self.assertIn('router{c="x",key="hits"} 3', rendered)
+        self.assertIn('router{c="x",key="routes.fast"} 2', rendered)
+        self.assertNotIn('enabled', rendered)
+
+    def test_engine_stats_are_collected_once_per_process(self):
+        collectors = list(registry._collectors)
+        engine = _test_engine()
+        self.assertEqual(registry._collectors, collectors)
+        with mock.patch('app.rag_engine._rag_engine', engine):
+            rendered = registry.render()
+        self.assertEqual(rendered.count('# TYPE nyaya_hedger gauge'), 1)
+
+    def test_scrape_requires_the_token_or_a_loopback_client(self):
+        factory = RequestFactory()
+        remote = factory.get('/metrics', REMOTE_ADDR='203.0.113.9')
+        self.assertFalse(Registry().authorized(remote))
+        self.assertTrue(Registry().authorized(factory.get('/metrics')))
+        guarded = Registry(token='s3cret')
+        self.assertFalse(guarded.authorized(factory.get('/metrics')))
+        self.assertTrue(guarded.authorized(factory.get('/metrics', REMOTE_ADDR='203.0.113.9',
+                                                       HTTP_AUTHORIZATION='Bearer s3cret')))
+        with mock.patch.object(registry, 'token', 's3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_span_counts_exceptions_and_reraises(self):
+        with self.assertRaises(KeyError):
+            with span('metrics_test_stage'):
+                raise KeyError('missing')
+        self.assertIn('nyaya_errors_total{error="KeyError",stage="metrics_test_stage"} 1',
+                      '\n'.join(ERRORS.render()))
+
+    def test_endpoint_propagates_or_derives_request_id(self):
+        view = observe_endpoint('metrics_test')(lambda request: JsonResponse({}))
+        factory = RequestFactory()
+        response = view(factory.get('/', HTTP_X_REQUEST_ID='abc-123'))
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        response = view(factory.get('/', HTTP_X_REQUEST_ID='bad id!',
+                                    HTTP_X_CLOUD_TRACE_CONTEXT='0123456789abcdef0123/1;o=1'))
+        self.assertEqual(response['X-Request-ID'], '0123456789abcdef')
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profiler = RequestProfiler(enabled=True, token='secret', directory=directory.name, max_reports=2)
+        self.factory = RequestFactory()
+
+    @staticmethod
+    def _view(request):
+        with span('profiled_stage'):
+            time.sleep(0.01)
+        return JsonResponse({'ok': True})
+
+    def _profiled(self):
+        with mock.patch.object(request_context, 'STAGE_TRACING', True), request_scope('profile_test'):
+            return self.profiler.run(self._view, self.factory.get('/api/chat/', HTTP_X_NYAYA_PROFILE='secret'))
+
+    def test_only_the_token_opts_a_request_in(self):
+        self.assertTrue(self.profiler.should_profile(self.factory.get('/', HTTP_X_NYAYA_PROFILE='secret')))
+        self.assertFalse(self.profiler.should_profile(self.factory.get('/', HTTP_X_NYAYA_PROFILE='wrong')))
+        self.assertFalse(RequestProfiler(token='').authorized(self.factory.get('/', HTTP_X_NYAYA_PROFILE='')))
+
+    def test_report_has_stages_cpu_and_memory(self):
+        response = self._profiled()
+        report = self.profiler.read_report(response['X-Nyaya-Profile-Id'])
+        self.assertEqual((report['endpoint'], report['status'], report['trigger']), ('profile_test', 200, 'header'))
+        self.assertEqual([stage['stage'] for stage in report['stages']], ['profiled_stage'])
+        self.assertGreaterEqual(report['stage_totals']['profiled_stage'], 0.01)
+        self.assertIn('cumulative', report['cpu_profile'])
+        self.assertTrue(report['memory']['traced'])
+        self.assertGreater(report['memory']['peak_bytes'], 0)
+
+    def test_report_ring_is_bounded(self):
+        ids = [self._profiled()['X-Nyaya-Profile-Id'] for _ in range(3)]
+        self.assertEqual(self.profiler.list_reports(), sorted(ids, reverse=True)[:2])
+        self.assertIsNone(self.profiler.read_report('../../etc/passwd'))
+
+    def test_concurrent_request_runs_unprofiled(self):
+        self.profiler._busy.acquire()
+        self.addCleanup(self.profiler._busy.release)
+        self.assertNotIn('X-Nyaya-Profile-Id', self._profiled())
+
+    def test_failing_request_is_reported(self):
+        def view(request):
+            raise KeyError('missing')
+
+        with self.assertRaises(KeyError):
+            self.profiler.run(view, self.factory.get('/api/chat/'))
+        report = self.profiler.read_report(self.profiler.list_reports()[0])
+        self.assertEqual((report['status'], report['error']), (500, "KeyError: 'missing'"))
+        self.assertFalse(self.profiler._busy.locked())
+
+    def test_memory_is_only_traced_for_a_request_running_alone(self):
+        other = self.profiler.enter
+        self.addCleanup(self.profiler.exit)
+
+        def overlapping_view(request):
+            other()
+            return JsonResponse({'ok': True})
+
+        response = self.profiler.run(overlapping_view, self.factory.get('/api/chat/'))
+        self.assertFalse(self.profiler.read_report(response['X-Nyaya-Profile-Id'])['memory']['traced'])
+        # Another request already in flight: tracemalloc is not started at all
+        self.profiler.enter()
+        self.addCleanup(self.profiler.exit)
+        with mock.patch('app.profiling.tracemalloc.start') as start:
+            response = self.profiler.run(self._view, self.factory.get('/api/chat/'))
+        start.assert_not_called()
+        self.assertEqual(self.profiler.read_report(response['X-Nyaya-Profile-Id'])['memory'],
+                         {'traced': False, 'reason': 'other requests in flight'})
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_latency_specs(self):
+        self.assertEqual(LatencyModel('0.2').sample(), 0.2)
+        self.assertEqual(LatencyModel('fixed:0.2', time_scale=0.5).sample(), 0.1)
+        samples = [LatencyModel('uniform:0.1,0.4', seed=1).sample() for _ in range(50)]
+        self.assertTrue(all(0.1 <= sample <= 0.4 for sample in samples))
+        with self.assertRaises(ValueError):
+            LatencyModel('gamma:1,2')
+
+    def test_seeded_models_repeat_and_inject_errors(self):
+        first, second = LatencyModel('lognormal:0.8,0.4', seed=7), LatencyModel('lognormal:0.8,0.4', seed=7)
+        self.assertEqual([first.sample() for _ in range(5)], [second.sample() for _ in range(5)])
+        with self.assertRaises(FakeUpstreamError):
+            LatencyModel('0', error_rate=1.0).wait()
+
+    def test_fake_model_streams_the_answer_for_the_prompt(self):
+        with mock.patch.object(FakeGenerativeModel, 'fast_latency', LatencyModel('0')):
+            model = FakeGenerativeModel('gemini-flash-latest')
+            response = model.generate_content('What is Section 138?')
+            streamed = ''.join(piece.text for piece in model.generate_content('What is Section 138?', stream=True))
+        self.assertEqual(response.text, streamed)
+        self.assertEqual(streamed, fake_answer('What is Section 138?'))
+        self.assertGreater(response.usage_metadata.prompt_token_count, 0)
+        self.assertIn('compliance', fake_answer('... Respond in JSON ...'))
+
+    def test_percentiles_and_baseline_comparison(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)),
+                         (50.0, 95.0, 99.0))
+        baseline = {'scenarios': {'chat': {'p95': 1.0, 'throughput_rps': 10.0, 'error_rate': 0.0}}}
+        within = {'scenarios': {'chat': {'p95': 1.1, 'throughput_rps': 9.0, 'error_rate': 0.01}}}
+        worse = {'scenarios': {'chat': {'p95': 1.5, 'throughput_rps': 5.0, 'error_rate': 0.1},
+                               'analyze': {'p95': 9.0, 'throughput_rps': 1.0, 'error_rate': 0.0}}}
+        self.assertEqual(compare(within, baseline, 0.2), [])
+        self.assertEqual(len(compare(worse, baseline, 0.2)), 3)
+
+
+class _RecordedModel:
+    """Answers each prompt with a numbered reply, or raises for prompts containing 'fail'"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+        if 'fail' in contents:
+            raise RuntimeError(f"upstream 503 for key=AIza{'x' * 35}")
+        if stream:
+            return iter([SimpleNamespace(text='Part one. '), SimpleNamespace(text='Part two.')])
+        return SimpleNamespace(text=f"Reply {self.calls}",
+                               usage_metadata=SimpleNamespace(prompt_token_count=10, candidates_token_count=2))
+
+
+class CassetteTests(SimpleTestCase):
+    PROMPT = 'Explain the punishment for cheating under Section 420 of the Indian Penal Code in detail'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cassette.jsonl')
+        recorder = Cassette('record', self.path)
+        model = recorder.wrap_model(_RecordedModel(), 'gemini-pro-latest')
+        model.generate_content(self.PROMPT)
+        model.generate_content(self.PROMPT)
+        list(model.generate_content('Stream the answer please', stream=True))
+        with self.assertRaises(RuntimeError):
+            model.generate_content('this call will fail')
+        self.replay = Cassette('replay', self.path, time_scale=0).wrap_model(None, 'gemini-pro-latest')
+
+    def test_scrub_removes_credentials(self):
+        text = (f"key AIza{'A' * 35} token ya29.abc-def Bearer xyz123 "
+                "https://example.com/?q=1&api_key=s3cret secret-value")
+        scrubbed = scrub(text, ['secret-value'])
+        for secret in ('AIza', 'ya29.abc', 'xyz123', 's3cret', 'secret-value'):
+            self.assertNotIn(secret, scrubbed)
+        self.assertIn('&api_key=<redacted>', scrubbed)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertNotIn('AIza', f.read())
+
+    def test_replay_serves_repeated_calls_in_recorded_order(self):
+        self.assertEqual(self.replay.generate_content(self.PROMPT).text, 'Reply 1')
+        response = self.replay.generate_content(self.PROMPT)
+        self.assertEqual(response.text, 'Reply 2')
+        self.assertEqual(response.usage_metadata.prompt_token_count, 10)
+        streamed = ''.join(chunk.text for chunk in self.replay.generate_content('Stream the answer please',
+                                                                                 stream=True))
+        self.assertEqual(streamed, 'Part one. Part two.')
+
+    def test_recorded_errors_are_replayed(self):
+        with self.assertRaises(CassetteError):
+            self.replay.generate_content('this call will fail')
+
+    def test_nearest_match_and_miss(self):
+        changed = self.PROMPT.replace('in detail', 'in detail with examples')
+        self.assertEqual(self.replay.generate_content(changed).text, 'Reply 1')
+        with self.assertRaises(CassetteMiss):
+            self.replay.generate_content('A completely unrelated prompt about tenancy deposits')
+        exact = Cassette('replay', self.path, time_scale=0, match='exact').wrap_model(None, 'gemini-pro-latest')
+        with self.assertRaises(CassetteMiss):
+            exact.generate_content(changed)
+
+
+class RetrievalEvalTests(SimpleTestCase):
+    def setUp(self):
+        self.matcher = ProvisionMatcher(get_statute_index())
+
+    def test_chunks_map_to_canonical_provisions(self):
+        self.assertEqual(self.matcher.provision('Indian Penal Code, 1860', '498-a'), ('IPC', '498A'))
+        self.assertEqual(self.matcher.provisions({'filename': 'IPC', 'section': '420'}), [('IPC', '420')])
+        self.assertEqual(self.matcher.provisions({'filename': 'Consumer Protection Act, 2019',
+                                                  'page': 'Sections 2, 35 and 69'}),
+                         [('consumer protection act', n) for n in ('2', '35', '69')])
+        self.assertEqual(self.matcher.provisions({'filename': 'Indian Penal Code', 'page': '12'},
+                                                 '[Source: IPC, Page 12] 406. Punishment for criminal breach'),
+                         [('IPC', '406')])
+        self.assertEqual(self.matcher.provisions({'filename': '', 'section': '420'}), [])
+
+    def test_only_cross_code_links_are_equivalent(self):
+        self.assertEqual(self.matcher.equivalents(('IPC', '420')), {('IPC', '420'), ('BNS', '318')})
+        self.assertEqual(self.matcher.equivalents(('NIA', '138')), {('NIA', '138')})
+
+    def test_recall_and_reciprocal_rank_count_cross_references(self):
+        ranked = [[('IPC', '406')], [('BNS', '318')], [('NIA', '138')]]
+        scores = score_query(ranked, [('IPC', '420'), ('NIA', '138'), ('ITA', '66')], self.matcher, [1, 3])
+        self.assertEqual(scores['recall@1'], 0.0)
+        self.assertAlmostEqual(scores['recall@3'], 2 / 3)
+        self.assertEqual(scores['reciprocal_rank'], 0.5)
+        self.assertEqual(score_query([], [('IPC', '420')], self.matcher, [1])['reciprocal_rank'], 0.0)
+
+    def test_evaluate_summarises_each_configuration_and_restores_the_engine(self):
+        engine = _test_engine()
+        engine.corpus = None
+        configs = build_configs(engine, ['topic_fallback'], [3])
+        self.assertEqual(len(configs), 4)
+        gold = [{'id': 'cheating', 'query': 'What is cheating?', 'expected': [{'act': 'IPC', 'section': '420'}]}]
+        context = CHUNK_SEPARATOR.join(['[Source: IPC] 406. Breach of trust', '[Source: IPC] 420. Cheating'])
+        sources = [{'filename': 'Indian Penal Code', 'section': '406'}, {'filename': 'Indian Penal Code', 'section': '420'}]
+        ttl = engine.retrieval_cache_ttl
+        with mock.patch.object(engine, 'search_legal_db', return_value=(context, sources)), \
+                mock.patch.object(engine, 'search_legal_db_expanded', return_value=(context, sources)):
+            results = evaluate(engine, gold, configs[:2], [1, 3])
+        self.assertEqual([(r['recall@1'], r['recall@3'], r['mrr'], r['hit_rate']) for r in results],
+                         [(0.0, 1.0, 0.5, 1.0)] * 2)
+        self.assertEqual(results[0]['queries_detail'][0]['retrieved'], ['IPC 406', 'IPC 420'])
+        self.assertEqual(engine.retrieval_cache_ttl, ttl)
+
+
+class LoggingTests(SimpleTestCase):
+    def _logger(self, sample_rate=1.0, size=100):
+        records = queue.Queue(maxsize=size)
+        handler = NonBlockingQueueHandler(records, sample_rate)
+        logger = logging.getLogger(f"nyaya_test.{self._testMethodName}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        return logger, handler, records
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        logger, handler, records = self._logger(size=2)
+        start = time.perf_counter()
+        for i in range(5):
+            logger.info("message %d", i)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(handler.stats, {'queued': 2, 'dropped': 3, 'sampled_out': 0})
+        self.assertEqual(records.get_nowait().msg, 'message 0')
+
+    def test_sampling_spares_warnings_and_is_per_request(self):
+        logger, handler, records = self._logger(sample_rate=0.0)
+        logger.info("high volume", extra=SAMPLED)
+        logger.warning("kept", extra=SAMPLED)
+        logger.info("not sampled")
+        self.assertEqual(handler.stats['sampled_out'], 1)
+        self.assertEqual([records.get_nowait().msg for _ in range(2)], ['kept', 'not sampled'])
+
+        handler.sample_rate = 0.5
+        decisions = {request_id: handler._keep_sampled(request_id) for request_id in map(str, range(200))}
+        self.assertTrue(all(handler._keep_sampled(request_id) == keep for request_id, keep in decisions.items()))
+        self.assertTrue(any(decisions.values()) and not all(decisions.values()))
+
+    def test_records_carry_the_request_context_as_json(self):
+        logger, _, records = self._logger()
+        with request_scope('chat', request_id='req-42'):
+            logger.info("searched %s shards", 3, extra={'shards': 3})
+        entry = json.loads(JsonFormatter().format(records.get_nowait()))
+        self.assertEqual({key: entry[key] for key in ('severity', 'message', 'request_id', 'endpoint', 'shards')},
+                         {'severity': 'INFO', 'message': 'searched 3 shards', 'request_id': 'req-42',
+                          'endpoint': 'chat', 'shards': 3})
+
+
+class _BatchEngine:
+    """Answers with the query, fails on 'boom' ('fizzle' in-band), sleeps on 'slow'; tracks concurrency"""
+
+    def __init__(self):
+        self.queries = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def process_legal_query(self, query):
+        with self._lock:
+            self.queries.append(query)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(1.0 if 'slow' in query else 0.02)
+            if 'boom' in query:
+                raise RuntimeError('upstream failed')
+            if 'fizzle' in query:
+                return {'response': 'Sorry', 'sources': [], 'confidence': 'error', 'note': 'Generation error: quota'}
+            return {'response': f"Answer: {query}", 'sources': []}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class ChatBatchTests(SimpleTestCase):
+    def test_parse_validates_the_body(self):
+        runner = BatchRunner(max_queries=2)
+        self.assertEqual(runner.parse({'queries': ['a', {'id': 'C-1', 'message': 'b'}]}),
+                         [{'id': None, 'message': 'a'}, {'id': 'C-1', 'message': 'b'}])
+        for payload in ({}, {'queries': []}, {'queries': 'a'}, {'queries': ['a', 'b', 'c']}, {'queries': [42]},
+                        {'queries': [{'message': 7}]}, []):
+            with self.assertRaises(BatchValidationError, msg=payload):
+                runner.parse(payload)
+
+    def test_concurrency_limit_is_clamped(self):
+        runner = BatchRunner(concurrency=8, max_concurrency=32)
+        self.assertEqual((runner.limit(), runner.limit(0), runner.limit(100), runner.limit(4)), (8, 1, 32, 4))
+
+    def test_duplicates_collapse_and_results_keep_input_order(self):
+        engine = _BatchEngine()
+        runner = BatchRunner(concurrency=2)
+        items = runner.parse({'queries': ['Cheque bounced?', 'What is bail', 'cheque  BOUNCED', '  ', 'boom']})
+        results, summary = runner.run(engine, items)
+        self.assertEqual(sorted(engine.queries), ['Cheque bounced?', 'What is bail', 'boom'])
+        self.assertLessEqual(engine.peak, 2)
+        self.assertEqual([result['status'] for result in results], [SUCCESS, SUCCESS, SUCCESS, ERROR, ERROR])
+        self.assertEqual(results[2]['duplicate_of'], 0)
+        self.assertEqual(results[2]['response'], 'Answer: Cheque bounced?')
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual((summary['unique'], summary['duplicates'], summary[SUCCESS], summary[ERROR]), (3, 1, 3, 2))
+
+    def test_error_answers_are_reported_as_errors(self):
+        runner = BatchRunner(concurrency=2)
+        results, summary = runner.run(_BatchEngine(), runner.parse({'queries': ['fizzle', 'fine']}))
+        self.assertEqual([result['status'] for result in results], [ERROR, SUCCESS])
+        self.assertEqual(results[0]['message'], 'Generation error: quota')
+        self.assertEqual((summary[SUCCESS], summary[ERROR]), (1, 1))
+
+    def test_deadline_reports_unfinished_queries_as_timeouts(self):
+        runner = BatchRunner(concurrency=1, timeout=0.3)
+        items = runner.parse({'queries': ['quick one', 'slow one', 'never started']})
+        start = time.perf_counter()
+        results, summary = runner.run(_BatchEngine(), items)
+        self.assertLess(time.perf_counter() - start, 0.9)
+        self.assertEqual([result['status'] for result in results], [SUCCESS, TIMEOUT, TIMEOUT])
+        self.assertEqual(summary[TIMEOUT], 2)
+
+    def test_endpoint_rejects_bad_bodies_and_answers_batches(self):
+        response = self.client.post('/api/chat/batch/', '{not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/chat/batch/', json.dumps({'queries': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('app.rag_engine.get_rag_engine', return_value=_BatchEngine()):
+            response = self.client.post('/api/chat/batch/', json.dumps({'queries': ['a query', 'A query!']}),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual([result['status'] for result in body['results']], [SUCCESS, SUCCESS])
+        self.assertEqual(body['results'][1]['duplicate_of'], 0)
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_entries_expire_after_their_ttl(self):
+        cache = TTLCache(ttl=60)
+        cache.set('default', 1)
+        cache.set('short', 2, ttl=0.05)
+        time.sleep(0.1)
+        self.assertEqual((cache.get('default'), cache.get('short', 'gone')), (1, 'gone'))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual([cache.get(key) for key in 'abc'], [1, None, 3])
+
+    def test_tag_invalidation_drops_only_dependent_entries(self):
+        cache = TTLCache()
+        cache.set('ipc answer', 1, tags=['Indian Penal Code'])
+        cache.set('mixed answer', 2, tags=['Indian Penal Code', 'NI Act'])
+        cache.set('ni answer', 3, tags=['NI Act'])
+        cache.set('untagged', 4)
+        self.assertEqual(cache.invalidate_tags(['Indian Penal Code']), 2)
+        self.assertEqual([cache.get(key) for key in ('ipc answer', 'mixed answer', 'ni answer', 'untagged')],
+                         [None, None, 3, 4])
+        # Replacing an entry drops its old tags
+        cache.set('ni answer', 5, tags=['Contract Act'])
+        self.assertEqual(cache.invalidate_tags(['NI Act']), 0)
+        self.assertEqual(cache.get('ni answer'), 5)
+
+
+class BatchResumeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        self.input = os.path.join(self.dir, 'archive.jsonl')
+        with open(self.input, 'w', encoding='utf-8') as f:
+            f.write('{"id": "a", "query": "Cheque bounced"}\n\n{"path": "lease.pdf"}\nnot json\n{"id": "d"}\n')
+        self.checkpoint_path = os.path.join(self.dir, 'archive.checkpoint.json')
+
+    def test_records_are_read_with_kind_and_errors(self):
+        records = list(read_records(self.input))
+        self.assertEqual([record['line'] for record in records], [1, 2, 3, 4])
+        self.assertEqual((records[0]['kind'], records[0]['query']), (QUERY, 'Cheque bounced'))
+        self.assertEqual((records[1]['kind'], records[1]['path']), (CONTRACT, os.path.join(self.dir, 'lease.pdf')))
+        self.assertTrue(records[2]['error'].startswith('Invalid JSON'))
+        self.assertIn('error', records[3])
+
+        csv_path = os.path.join(self.dir, 'archive.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('id,message\nx,What is bail?\n')
+        self.assertEqual(list(read_records(csv_path))[0]['query'], 'What is bail?')
+
+    def test_watermark_advances_over_contiguous_lines(self):
+        checkpoint = Checkpoint.load(self.checkpoint_path, self.input)
+        for line in (1, 3, 4):
+            checkpoint.mark_done(line)
+        self.assertEqual((checkpoint.watermark, checkpoint.done), (1, {3, 4}))
+        checkpoint.mark_done(2)
+        self.assertEqual((checkpoint.watermark, checkpoint.done), (4, set()))
+        checkpoint.save()
+
+        resumed = Checkpoint.load(self.checkpoint_path, self.input)
+        self.assertTrue(resumed.is_done(4))
+        self.assertFalse(resumed.is_done(5))
+
+    def test_appending_input_keeps_the_checkpoint_but_a_new_file_does_not(self):
+        Checkpoint.load(self.checkpoint_path, self.input).save()
+        with open(self.input, 'a', encoding='utf-8') as f:
+            f.write('{"query": "appended later"}\n')
+        Checkpoint.load(self.checkpoint_path, self.input)
+        with open(self.input, 'w', encoding='utf-8') as f:
+            f.write('{"query": "a different archive"}\n')
+        with self.assertRaises(ValueError):
+            Checkpoint.load(self.checkpoint_path, self.input)
+
+    def test_reconcile_recovers_results_written_after_the_last_checkpoint(self):
+        output = os.path.join(self.dir, 'results.jsonl')
+        writer = ResultWriter(output)
+        writer.write({'line': 1, 'status': 'success'})
+        writer.write({'line': 2, 'status': 'error'})
+        writer.close()
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write('{"line": 3, "stat')  # cut short by a crash
+
+        checkpoint = Checkpoint.load(self.checkpoint_path, self.input)
+        self.assertEqual(checkpoint.reconcile(output), 1)
+        self.assertEqual(checkpoint.watermark, 1)
+
+        # The next run starts on a fresh line instead of extending the torn one
+        writer = ResultWriter(output)
+        writer.write({'line': 3, 'status': 'success'})
+        writer.close()
+        self.assertEqual(checkpoint.reconcile(output), 1)
+        self.assertTrue(checkpoint.is_done(3))
@@ -0,0 +1,23 @@
+"""
+Nyaya-Sahayak Token Estimation
+Purpose: Fast local token estimates for budgeting prompts without calling the model's tokenizer
+
+Gemini's tokenizer averages roughly 4 characters per token on English prose; legal text
+with section numbers and punctuation runs a little denser. The estimate blends a
+character count with a word/punctuation count, so dense citations weigh more than their
+length alone suggests. It is a budgeting heuristic, not a substitute for count_tokens
+where exact counts matter.
+"""
+
+import re
+
+_PIECES = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated model tokens for text (0 for empty text)"""
+    if not text:
+        return 0
+    by_chars = len(text) / 4.0
+    by_pieces = len(_PIECES.findall(text)) * 0.75
+    return max(1, int(round((by_chars + by_pieces) / 2)))
@@ -1,11 +1,17 @@
 from django.urls import path
-from .views import home, analyze_document, chat_query, verify_contract, legal_console
+from .views import home, analyze_document, chat_query, chat_batch, verify_contract, legal_console, metrics, profile_reports, healthz, readyz
 
 urlpatterns = [
     path('', name='home', view=home),
     path('api/analyze/', analyze_document, name='analyze_document'),
     path('api/chat/', chat_query, name='chat_query'),
+    path('api/chat/batch/', chat_batch, name='chat_batch'),
     path('api/verify-contract/', verify_contract, name='verify_contract'),
     path('legal-console/', legal_console, name='legal_console'),
+    path('metrics', metrics, name='metrics'),
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
+    path('ops/profiles/', profile_reports, name='profile_reports'),
+    path('ops/profiles/<str:report_id>/', profile_reports, name='profile_report'),
 ]
 
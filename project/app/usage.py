@@ -0,0 +1,168 @@
+"""
+Nyaya-Sahayak Usage Accounting
+Purpose: Token counts and estimated cost of every model call, per request, endpoint and stage
+
+How it works:
+1. Every Gemini call goes through record_model_call() with its stage (the operation
+   name, e.g. 'gemini', 'gemini_evidence', 'gemini_comparison')
+2. Token counts come from the response's usage_metadata; when it is missing (errors,
+   streams cut off early) they are estimated locally from the prompt and output text
+3. Every attempt is a call: a hedged duplicate is recorded alongside the primary, and a
+   call that raised is recorded as failed with its estimated input tokens
+4. Calls are added to the active request context (compact summary returned to the client)
+   and to process-wide totals per (endpoint, stage), exported on /metrics
+
+Configuration (environment):
+- MODEL_PRICES: USD per million tokens, "model=input/output;..."
+      e.g. "gemini-flash-latest=0.30/2.50;gemini-pro-latest=1.25/10.00"
+      (optional; without prices no cost is reported)
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from .request_context import current_endpoint, current_request
+from .tokens import estimate_tokens
+
+
+def parse_model_prices(value: str) -> Dict[str, Tuple[float, float]]:
+    """Parse MODEL_PRICES into {model: (input USD/1M tokens, output USD/1M tokens)}"""
+    prices = {}
+    for entry in value.split(';'):
+        if '=' not in entry or '/' not in entry:
+            continue
+        model, rates = entry.split('=', 1)
+        try:
+            input_rate, output_rate = (float(rate) for rate in rates.split('/', 1))
+        except ValueError:
+            continue
+        prices[model.strip()] = (input_rate, output_rate)
+    return prices
+
+
+def _prompt_text(contents) -> str:
+    """Text parts of a prompt (uploaded files are counted only via usage metadata)"""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return '\n'.join(part for part in contents if isinstance(part, str))
+    return ''
+
+
+class UsageLedger:
+    """Process-wide token totals per (endpoint, stage)"""
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.prices = prices or {}
+        self._lock = threading.Lock()
+        self.totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+        rates = self.prices.get(model.replace('models/', ''))
+        if rates is None:
+            return None
+        return (input_tokens * rates[0] + output_tokens * rates[1]) / 1_000_000
+
+    def record(self, stage: str, model: str, contents, response=None, output_text: Optional[str] = None,
+               failed: bool = False) -> Dict:
+        """
+        Record one model call
+
+        Args:
+            stage: Operation name of the call
+            model: Model name
+            contents: The prompt that was sent
+            response: Gemini response (for usage_metadata), if any
+            output_text: Generated text when there is no complete response (streams)
+            failed: The call raised (input is still billed; output is whatever streamed)
+
+        Returns:
+            The call record added to the request context
+        """
+        prompt = _prompt_text(contents)
+        metadata = getattr(response, 'usage_metadata', None) if response is not None else None
+        input_tokens = getattr(metadata, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(metadata, 'candidates_token_count', 0) or 0
+        estimated = not (input_tokens or output_tokens)
+        if estimated:
+            if output_text is None and response is not None:
+                try:
+                    output_text = response.text
+                except ValueError:
+                    output_text = ''
+            input_tokens = estimate_tokens(prompt)
+            output_tokens = estimate_tokens(output_text or '')
+
+        call = {
+            'stage': stage,
+            'model': model.replace('models/', ''),
+            'prompt_chars': len(prompt),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'estimated': estimated,
+            'failed': failed,
+            'cost_usd': self.cost(model, input_tokens, output_tokens),
+        }
+
+        context = current_request()
+        if context is not None:
+            context.add_model_call(call)
+
+        key = (current_endpoint(), stage)
+        with self._lock:
+            totals = self.totals.setdefault(key, {'calls': 0, 'input_tokens': 0, 'output_tokens': 0,
+                                                  'prompt_chars': 0, 'estimated_calls': 0, 'failed_calls': 0,
+                                                  'cost_usd': 0.0})
+            totals['calls'] += 1
+            totals['input_tokens'] += input_tokens
+            totals['output_tokens'] += output_tokens
+            totals['prompt_chars'] += len(prompt)
+            totals['estimated_calls'] += 1 if estimated else 0
+            totals['failed_calls'] += 1 if failed else 0
+            totals['cost_usd'] += call['cost_usd'] or 0.0
+        return call
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        with self._lock:
+            return {key: dict(totals) for key, totals in self.totals.items()}
+
+
+def request_usage_summary() -> Dict:
+    """Compact usage of the active request: totals plus per-stage tokens"""
+    context = current_request()
+    calls = context.calls() if context is not None else []
+    summary = {
+        'model_calls': len(calls),
+        'input_tokens': sum(call['input_tokens'] for call in calls),
+        'output_tokens': sum(call['output_tokens'] for call in calls),
+        'estimated': any(call['estimated'] for call in calls),
+        'failed_calls': sum(1 for call in calls if call.get('failed')),
+        'by_stage': {},
+    }
+    costs = [call['cost_usd'] for call in calls if call['cost_usd'] is not None]
+    if costs:
+        summary['cost_usd'] = round(sum(costs), 6)
+    for call in calls:
+        stage = summary['by_stage'].setdefault(call['stage'], {'calls': 0, 'input_tokens': 0, 'output_tokens': 0})
+        stage['calls'] += 1
+        stage['input_tokens'] += call['input_tokens']
+        stage['output_tokens'] += call['output_tokens']
+    return summary
+
+
+# Global instance (loaded once at startup)
+_ledger = None
+
+def get_usage_ledger() -> UsageLedger:
+    """Get or create the process-wide usage ledger"""
+    global _ledger
+    if _ledger is None:
+        _ledger = UsageLedger(parse_model_prices(os.getenv('MODEL_PRICES', '')))
+    return _ledger
+
+
+def record_model_call(stage: str, model: str, contents, response=None, output_text: Optional[str] = None,
+                      failed: bool = False) -> Dict:
+    """Record a model call on the process-wide ledger (see UsageLedger.record)"""
+    return get_usage_ledger().record(stage, model, contents, response, output_text, failed)
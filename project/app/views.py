@@ -1,11 +1,22 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.core.files.storage import FileSystemStorage
 from django.views.decorators.csrf import csrf_exempt
 import os
 import json
 from dotenv import load_dotenv
-import google.generativeai as genai
+
+from .contract_verification import is_json, strip_json_fences, verify_contract_file
+from .log import get_logger
+from .metrics import observe_endpoint, registry, span
+from .profiling import get_profiler, profile_request
+from .startup import LazyModule, startup_report
+from .usage import request_usage_summary
+
+# Imported on first use (see startup.py)
+genai = LazyModule('google.generativeai')
+
+log = get_logger('views')
 
 # Load environment variables
 load_dotenv()
@@ -18,7 +29,37 @@ def legal_console(request):
     """Render the hyper-modern legal console interface"""
     return render(request, 'legal_console.html')
 
+def metrics(request):
+    """Prometheus scrape endpoint (stage latency, fallbacks, cache hits, error classes); internal only"""
+    if not registry.enabled or not registry.authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Not found'}, status=404)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def healthz(request):
+    """Liveness probe: the process is up"""
+    return JsonResponse({'status': 'ok'})
+
+def readyz(request):
+    """Readiness probe: 503 until the startup warmup has finished (see startup.py)"""
+    report = startup_report.snapshot()
+    return JsonResponse({'status': report['state'], 'startup': report},
+                        status=200 if startup_report.ready else 503)
+
+def profile_reports(request, report_id=None):
+    """Ops access to stored request profiles (requires the profiling token header)"""
+    profiler = get_profiler()
+    if not profiler.enabled or not profiler.authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Not found'}, status=404)
+    if report_id is None:
+        return JsonResponse({'status': 'success', 'reports': profiler.list_reports()})
+    report = profiler.read_report(report_id)
+    if report is None:
+        return JsonResponse({'status': 'error', 'message': 'Report not found'}, status=404)
+    return JsonResponse({'status': 'success', 'report': report})
+
 @csrf_exempt
+@observe_endpoint('analyze')
+@profile_request
 def analyze_document(request):
     if request.method == 'POST' and request.FILES.get('file'):
         uploaded_file = request.FILES['file']
@@ -34,15 +75,19 @@ def analyze_document(request):
             
             genai.configure(api_key=api_key)
             
-            # Use Gemini Flash model (fast for document analysis)
-            model = genai.GenerativeModel('gemini-flash-latest')
+            # Route to the fast model unless the document is very large;
+            # unparseable output is escalated to the strong model
+            from .rag_engine import get_rag_engine
+            rag = get_rag_engine()
+            decision = rag.router.route('', task='document_analysis', input_size=uploaded_file.size)
             
             # Read file
             with open(local_path, "rb") as f:
                 file_data = f.read()
             
             # Upload file to Gemini
-            uploaded_file_obj = genai.upload_file(local_path)
+            with span('gemini_upload'):
+                uploaded_file_obj = genai.upload_file(local_path)
             
             prompt = """
             You are a legal expert AI. Analyze the attached legal document.
@@ -55,10 +100,15 @@ def analyze_document(request):
             Output ONLY the JSON.
             """
             
-            response = model.generate_content([uploaded_file_obj, prompt])
+            response = rag.generate_routed(
+                decision,
+                [uploaded_file_obj, prompt],
+                op='gemini_analysis',
+                needs_escalation=lambda text: not is_json(text)
+            )
             
             # parse response text to json
-            analysis_text = response.text.replace('```json', '').replace('```', '').strip()
+            analysis_text = strip_json_fences(response.text)
             # Try to parse it to ensure valid JSON, or just return text
             try:
                 analysis_json = json.loads(analysis_text)
@@ -69,9 +119,10 @@ def analyze_document(request):
             if os.path.exists(local_path):
                 os.remove(local_path)
 
-            return JsonResponse({'status': 'success', 'data': analysis_json})
+            return JsonResponse({'status': 'success', 'data': analysis_json, 'usage': request_usage_summary()})
 
         except Exception as e:
+            log.exception(f"Document analysis failed: {str(e)}")
             # Cleanup on error
             if os.path.exists(local_path):
                 os.remove(local_path)
@@ -80,6 +131,8 @@ def analyze_document(request):
     return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
 
 @csrf_exempt
+@observe_endpoint('chat')
+@profile_request
 def chat_query(request):
     """
     RAG-Powered Legal Chat Endpoint with Hybrid Upload Support
@@ -105,37 +158,39 @@ def chat_query(request):
                 file_extension = uploaded_file.name.split('.')[-1].lower()
                 
                 try:
-                    if file_extension == 'pdf':
-                        # Extract PDF text using PyPDF2
-                        import PyPDF2
-                        import io
-                        
-                        pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-                        extracted_text = ""
-                        for page in pdf_reader.pages:
-                            extracted_text += page.extract_text() + "\n"
-                        
-                        uploaded_file_text = extracted_text.strip()
-                        
-                    elif file_extension in ['docx', 'doc']:
-                        # Extract DOCX text using python-docx
-                        from docx import Document
-                        import io
+                    with span('upload_extraction'):
+                        if file_extension == 'pdf':
+                            # Extract PDF text using PyPDF2
+                            import PyPDF2
+                            import io
+                            
+                            pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
+                            extracted_text = ""
+                            for page in pdf_reader.pages:
+                                extracted_text += page.extract_text() + "\n"
+                            
+                            uploaded_file_text = extracted_text.strip()
+                            
+                        elif file_extension in ['docx', 'doc']:
+                            # Extract DOCX text using python-docx
+                            from docx import Document
+                            import io
+                            
+                            doc = Document(io.BytesIO(uploaded_file.read()))
+                            extracted_text = ""
+                            for paragraph in doc.paragraphs:
+                                extracted_text += paragraph.text + "\n"
+                            
+                            uploaded_file_text = extracted_text.strip()
                         
-                        doc = Document(io.BytesIO(uploaded_file.read()))
-                        extracted_text = ""
-                        for paragraph in doc.paragraphs:
-                            extracted_text += paragraph.text + "\n"
-                        
-                        uploaded_file_text = extracted_text.strip()
-                    
-                    else:
-                        return JsonResponse({
-                            'status': 'error',
-                            'message': f'Unsupported file type: {file_extension}. Use PDF or DOCX.'
-                        }, status=400)
+                        else:
+                            return JsonResponse({
+                                'status': 'error',
+                                'message': f'Unsupported file type: {file_extension}. Use PDF or DOCX.'
+                            }, status=400)
                         
                 except Exception as e:
+                    log.warning(f"Text extraction failed for .{file_extension} upload: {str(e)}")
                     return JsonResponse({
                         'status': 'error',
                         'message': f'Error extracting text from file: {str(e)}'
@@ -177,11 +232,14 @@ def chat_query(request):
                 'sources': result['sources'],
                 'confidence': result.get('confidence', 'medium'),
                 'note': result.get('note', ''),
+                'retrieval': result.get('retrieval', {}),
+                'usage': request_usage_summary(),
                 'has_uploaded_context': uploaded_file_text is not None,
                 'format': 'IRAC (Issue, Rule, Application, Conclusion)'
             })
             
         except Exception as e:
+            log.exception(f"Legal query failed: {str(e)}")
             return JsonResponse({
                 'status': 'error', 
                 'message': f'Error processing legal query: {str(e)}'
@@ -194,6 +252,58 @@ def chat_query(request):
 
 
 @csrf_exempt
+@observe_endpoint('chat_batch')
+@profile_request
+def chat_batch(request):
+    """
+    Batch Legal Chat Endpoint for intake triage
+
+    Body: {"queries": ["...", {"id": "C-17", "message": "..."}], "concurrency": 8}
+    Duplicate queries are answered once; results come back in input order with a
+    per-item status (see chat_batch.py).
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Invalid request method. Use POST.'
+        }, status=400)
+
+    from .chat_batch import BatchValidationError, get_batch_runner
+
+    runner = get_batch_runner()
+    try:
+        data = json.loads(request.body)
+        items = runner.parse(data)
+        concurrency = data.get('concurrency')
+        if concurrency is not None:
+            concurrency = int(concurrency)
+    except (ValueError, TypeError) as e:
+        # BatchValidationError is a ValueError, as is a malformed JSON body
+        message = str(e) if isinstance(e, BatchValidationError) else f'Invalid request body: {str(e)}'
+        return JsonResponse({'status': 'error', 'message': message}, status=400)
+
+    try:
+        from .rag_engine import get_rag_engine
+
+        results, summary = runner.run(get_rag_engine(), items, concurrency)
+    except Exception as e:
+        log.exception(f"Batch chat failed: {str(e)}")
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Error processing batch: {str(e)}'
+        }, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'results': results,
+        'summary': summary,
+        'usage': request_usage_summary(),
+        'format': 'IRAC (Issue, Rule, Application, Conclusion)'
+    })
+
+@csrf_exempt
+@observe_endpoint('verify_contract')
+@profile_request
 def verify_contract(request):
     """
     Contract Verification Module
@@ -206,156 +316,20 @@ def verify_contract(request):
         local_path = fs.path(filename)
         
         try:
-            # Configure Google AI with API key
-            api_key = os.getenv('GOOGLE_API_KEY')
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not found in environment variables")
-            
-            genai.configure(api_key=api_key)
-            
-            # Use Gemini model to extract contract text
-            model = genai.GenerativeModel('gemini-pro-latest')
-            
-            # Upload file to Gemini for text extraction
-            uploaded_file_obj = genai.upload_file(local_path)
-            
-            # Extract contract clauses
-            extraction_prompt = """
-            Extract all key clauses from this legal contract/agreement. 
-            For each clause, identify:
-            1. Clause title/heading
-            2. Full text of the clause
-            3. Any monetary amounts, dates, or critical terms
-            
-            Format as JSON:
-            {
-                "contract_type": "Type of contract",
-                "parties": ["Party 1", "Party 2"],
-                "clauses": [
-                    {
-                        "title": "Clause title",
-                        "text": "Full clause text",
-                        "critical_terms": ["term1", "term2"]
-                    }
-                ]
-            }
-            
-            Output ONLY valid JSON.
-            """
-            
-            extraction_response = model.generate_content([uploaded_file_obj, extraction_prompt])
-            
-            # Parse extracted data
-            contract_text = extraction_response.text.replace('```json', '').replace('```', '').strip()
-            try:
-                contract_data = json.loads(contract_text)
-            except:
-                contract_data = {"raw_text": contract_text}
-            
-            # Import RAG engine for cross-verification
-            from .rag_engine import get_rag_engine
-            rag = get_rag_engine()
-            
-            # Cross-verify each clause against legal database
-            discrepancies = []
-            risks = []
-            compliance_status = []
-            
-            if 'clauses' in contract_data:
-                for clause in contract_data['clauses']:
-                    clause_text = clause.get('text', '')
-                    clause_title = clause.get('title', 'Unnamed Clause')
-                    
-                    # Query RAG for relevant legal provisions
-                    verification_query = f"What are the legal requirements and restrictions for: {clause_text[:500]}"
-                    rag_result = rag.process_legal_query(verification_query)
-                    
-                    # Analyze for discrepancies using AI
-                    comparison_prompt = f"""
-                    You are a contract verification specialist. Compare this contract clause against legal provisions.
-                    
-                    CONTRACT CLAUSE:
-                    {clause_text}
-                    
-                    LEGAL PROVISIONS FROM DATABASE:
-                    {rag_result['response']}
-                    
-                    Identify:
-                    1. Any conflicts between the clause and legal requirements
-                    2. Missing mandatory provisions
-                    3. Potential legal risks
-                    4. Compliance status (COMPLIANT / NON-COMPLIANT / UNCLEAR)
-                    
-                    Respond in JSON:
-                    {{
-                        "compliance": "COMPLIANT or NON-COMPLIANT or UNCLEAR",
-                        "issues": ["issue1", "issue2"],
-                        "risks": ["risk1", "risk2"],
-                        "recommendation": "Brief recommendation"
-                    }}
-                    """
-                    
-                    comparison_response = model.generate_content(
-                        comparison_prompt,
-                        generation_config=genai.types.GenerationConfig(
-                            temperature=0.2,
-                            max_output_tokens=1024,
-                        )
-                    )
-                    
-                    # Parse comparison result
-                    comparison_text = comparison_response.text.replace('```json', '').replace('```', '').strip()
-                    try:
-                        comparison = json.loads(comparison_text)
-                        
-                        if comparison.get('issues'):
-                            discrepancies.append({
-                                'clause': clause_title,
-                                'issues': comparison['issues']
-                            })
-                        
-                        if comparison.get('risks'):
-                            risks.extend([{
-                                'clause': clause_title,
-                                'risk': risk
-                            } for risk in comparison['risks']])
-                        
-                        compliance_status.append({
-                            'clause': clause_title,
-                            'status': comparison.get('compliance', 'UNCLEAR'),
-                            'recommendation': comparison.get('recommendation', '')
-                        })
-                    except:
-                        # Skip if parsing fails
-                        pass
-            
-            # Overall compliance assessment
-            overall_compliance = "COMPLIANT"
-            if any(c['status'] == 'NON-COMPLIANT' for c in compliance_status):
-                overall_compliance = "NON-COMPLIANT"
-            elif any(c['status'] == 'UNCLEAR' for c in compliance_status):
-                overall_compliance = "NEEDS REVIEW"
-            
+            data = verify_contract_file(local_path)
+
             # Cleanup
             if os.path.exists(local_path):
                 os.remove(local_path)
-            
+
             return JsonResponse({
                 'status': 'success',
-                'data': {
-                    'contract_type': contract_data.get('contract_type', 'Unknown'),
-                    'parties': contract_data.get('parties', []),
-                    'overall_compliance': overall_compliance,
-                    'discrepancies': discrepancies,
-                    'risks': risks,
-                    'clause_analysis': compliance_status,
-                    'total_clauses_analyzed': len(contract_data.get('clauses', [])),
-                    'issues_found': len(discrepancies),
-                    'risks_identified': len(risks)
-                }
+                'data': data,
+                'usage': request_usage_summary()
             })
-        
+
         except Exception as e:
+            log.exception(f"Contract verification failed: {str(e)}")
             # Cleanup on error
             if os.path.exists(local_path):
                 os.remove(local_path)
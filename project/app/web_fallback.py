@@ -0,0 +1,229 @@
+"""
+Nyaya-Sahayak Web Fallback
+Purpose: Deadline-bounded, cached web search for queries outside the indexed Bare Acts
+
+How it works:
+1. The user query is normalized (case, punctuation, whitespace) into a cache key
+2. A cache hit returns immediately - repeated out-of-scope questions cost nothing
+3. On a miss, all configured providers are raced concurrently on the 'web' pool;
+   the first non-empty result set wins and the rest are cancelled/discarded
+4. Nothing waits past the deadline. An empty outcome every provider agreed on is cached
+   briefly (WEB_FALLBACK_NEGATIVE_TTL); when providers failed or ran out of time the
+   outcome carries an 'error' and is not cached, so the next request searches again
+
+Configuration (environment):
+- WEB_FALLBACK_PROVIDERS: comma-separated providers (default: duckduckgo,google)
+      duckduckgo         - DuckDuckGo text search (duckduckgo-search)
+      google             - Google search restricted to legal domains (googlesearch-python)
+      local:<path.json>  - Local stand-in for tests/benchmarks (see LocalSearchProvider)
+- WEB_FALLBACK_DEADLINE: seconds to wait for any provider (default: 4.0)
+- WEB_FALLBACK_CACHE_TTL: seconds a result set stays cached (default: 3600)
+- WEB_FALLBACK_NEGATIVE_TTL: seconds an empty result stays cached (default: 300)
+"""
+
+import os
+import re
+import json
+import time
+from concurrent.futures import as_completed, TimeoutError as FuturesTimeout
+from typing import Dict, List, Optional
+
+from .caches import TTLCache
+from .concurrency import submit
+from .log import get_logger
+
+log = get_logger('web_fallback')
+
+# Result dicts share the DuckDuckGo shape: {'title', 'body', 'href'}
+WebResults = List[Dict[str, str]]
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query into a cache key (case, punctuation and spacing insensitive)"""
+    text = _NON_WORD.sub(' ', query.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class DuckDuckGoProvider:
+    """DuckDuckGo text search focused on Indian law"""
+
+    name = 'duckduckgo'
+
+    def __init__(self, timeout: float = 4.0):
+        self.timeout = timeout
+
+    def search(self, query: str, max_results: int = 5) -> WebResults:
+        from duckduckgo_search import DDGS
+
+        search_query = f"Indian law {query} legal penalty provisions sections"
+        results = DDGS(timeout=max(1, int(self.timeout))).text(search_query, max_results=max_results)
+        return [
+            {
+                'title': result.get('title', 'Legal Resource'),
+                'body': result.get('body', ''),
+                'href': result.get('href', ''),
+            }
+            for result in (results or [])
+        ]
+
+
+class GoogleSearchProvider:
+    """Google search filtered to .gov.in and indiankanoon.org domains (no sleeping)"""
+
+    name = 'google'
+
+    def __init__(self, timeout: float = 4.0):
+        self.timeout = timeout
+
+    def search(self, query: str, max_results: int = 5) -> WebResults:
+        from googlesearch import search
+
+        search_query = f"{query} site:gov.in OR site:indiankanoon.org OR site:legislative.gov.in"
+        results = []
+        for item in search(search_query, num_results=max_results, advanced=True,
+                           sleep_interval=0, timeout=self.timeout):
+            url = getattr(item, 'url', item)
+            results.append({
+                'title': getattr(item, 'title', None) or url,
+                'body': getattr(item, 'description', '') or '',
+                'href': url,
+            })
+        return results
+
+
+class LocalSearchProvider:
+    """
+    Stand-in provider backed by a local JSON file (for tests and benchmarks)
+
+    File format:
+        {
+            "latency": 0.05,                      # optional simulated latency (seconds)
+            "results": {"<normalized query>": [{"title": ..., "body": ..., "href": ...}]},
+            "default": [...]                      # optional results for any other query
+        }
+    """
+
+    name = 'local'
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.latency = float(data.get('latency', 0.0))
+        self.results = {normalize_query(k): v for k, v in data.get('results', {}).items()}
+        self.default = data.get('default', [])
+
+    def search(self, query: str, max_results: int = 5) -> WebResults:
+        if self.latency:
+            time.sleep(self.latency)
+        return list(self.results.get(normalize_query(query), self.default))[:max_results]
+
+
+def build_provider(spec: str, timeout: float):
+    """Create a provider from its WEB_FALLBACK_PROVIDERS entry"""
+    spec = spec.strip()
+    if spec == 'duckduckgo':
+        return DuckDuckGoProvider(timeout=timeout)
+    if spec == 'google':
+        return GoogleSearchProvider(timeout=timeout)
+    if spec.startswith('local:'):
+        return LocalSearchProvider(spec[len('local:'):])
+    raise ValueError(f"Unknown web fallback provider: {spec}")
+
+
+class WebFallback:
+    """Races web search providers under a deadline and caches normalized results"""
+
+    def __init__(self, providers: List, deadline: float = 4.0,
+                 cache_ttl: float = 3600.0, negative_ttl: float = 300.0, cache_size: int = 2048):
+        self.providers = providers
+        self.deadline = deadline
+        self.negative_ttl = negative_ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @classmethod
+    def from_env(cls) -> 'WebFallback':
+        deadline = float(os.getenv('WEB_FALLBACK_DEADLINE', '4.0'))
+        specs = os.getenv('WEB_FALLBACK_PROVIDERS', 'duckduckgo,google').split(',')
+        providers = []
+        for spec in specs:
+            if not spec.strip():
+                continue
+            try:
+                providers.append(build_provider(spec, timeout=deadline))
+            except Exception as e:
+                log.warning(f"Skipping web fallback provider '{spec}': {str(e)}")
+        return cls(
+            providers,
+            deadline=deadline,
+            cache_ttl=float(os.getenv('WEB_FALLBACK_CACHE_TTL', '3600')),
+            negative_ttl=float(os.getenv('WEB_FALLBACK_NEGATIVE_TTL', '300')),
+        )
+
+    def search(self, query: str, max_results: int = 5) -> Dict:
+        """
+        Search the web for a legal query
+
+        Args:
+            query: User's original legal question
+            max_results: Maximum results to keep
+
+        Returns:
+            Dict with 'results' (list of {'title', 'body', 'href'}),
+            'provider' (winning provider name or None), 'error' (why there are no
+            results when no provider answered, else None) and 'cached' (bool)
+        """
+        key = (normalize_query(query), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+
+        outcome = self._race(query, max_results)
+        if outcome['error'] is None:
+            ttl = None if outcome['results'] else self.negative_ttl
+            self.cache.set(key, outcome, ttl=ttl)
+        return {**outcome, 'cached': False}
+
+    def _race(self, query: str, max_results: int) -> Dict:
+        """
+        Run every provider concurrently; first non-empty result set within the deadline wins
+
+        Returns:
+            Dict with 'results', 'provider' and 'error' - None unless there are no results
+            and some provider failed or missed the deadline (the empty outcome is not real)
+        """
+        futures = {
+            submit(provider.search, query, max_results, pool='web'): provider
+            for provider in self.providers
+        }
+        winner: Optional[Dict] = None
+        failures = []
+
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                provider = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    log.warning(f"Web fallback provider '{provider.name}' failed: {str(e)}")
+                    failures.append(f"{provider.name}: {str(e)}")
+                    continue
+                if results:
+                    winner = {'results': results[:max_results], 'provider': provider.name, 'error': None}
+                    break
+        except FuturesTimeout:
+            log.warning(f"Web fallback deadline ({self.deadline}s) reached for: {query[:100]}")
+            failures.extend(f"{futures[future].name}: no answer within {self.deadline}s"
+                            for future in futures if not future.done())
+
+        for future in futures:
+            future.cancel()
+
+        if winner:
+            return winner
+        if not self.providers:
+            failures.append("no providers configured")
+        return {'results': [], 'provider': None, 'error': '; '.join(failures) or None}
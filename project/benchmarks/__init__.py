@@ -0,0 +1,4 @@
+"""
+Nyaya-Sahayak Benchmarks
+Purpose: Load tests of the API against latency-modelled fake upstreams (python -m benchmarks.run)
+"""
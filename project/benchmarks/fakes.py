@@ -0,0 +1,274 @@
+"""
+Nyaya-Sahayak Benchmark Fakes
+Purpose: Local stand-ins for Gemini, Vertex AI Search (Discovery Engine) and web search
+
+Each fake sleeps for a latency drawn from a configurable distribution and fails at a
+configurable rate, so the Django app can be load-tested without network access or
+credentials. install() patches the client libraries in-process; nothing in app/ changes.
+
+Latency specs:
+    "0.2"                  fixed 0.2 s
+    "fixed:0.2"            fixed 0.2 s
+    "uniform:0.1,0.4"      uniform between 0.1 and 0.4 s
+    "lognormal:0.8,0.4"    log-normal with median 0.8 s and sigma 0.4 (long right tail)
+All latencies are multiplied by the time scale (e.g. 0.1 for a quick run).
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+STATUTES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'data', 'statutes.json')
+
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure (stands in for a 5xx / deadline exceeded)"""
+
+
+class LatencyModel:
+    """Seeded latency distribution plus an error rate"""
+
+    def __init__(self, spec: str = '0', error_rate: float = 0.0, time_scale: float = 1.0, seed: int = 0):
+        self.kind, self.params = self._parse(spec)
+        self.error_rate = error_rate
+        self.time_scale = time_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse(spec: str):
+        kind, _, values = spec.partition(':')
+        if not values:
+            return 'fixed', [float(kind)]
+        params = [float(value) for value in values.split(',')]
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        return kind, params
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == 'uniform':
+                value = self._random.uniform(self.params[0], self.params[1])
+            elif self.kind == 'lognormal':
+                value = self._random.lognormvariate(math.log(self.params[0]), self.params[1])
+            else:
+                value = self.params[0]
+        return value * self.time_scale
+
+    def fails(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def wait(self, share: float = 1.0) -> None:
+        """Sleep for one sampled latency (or a share of it); raise on an injected failure"""
+        if self.fails():
+            time.sleep(self.sample() * share / 2)
+            raise FakeUpstreamError("injected upstream failure")
+        time.sleep(self.sample() * share)
+
+
+# --- Gemini -------------------------------------------------------------------------
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=max(1, len(text) // 4),
+            total_token_count=prompt_tokens + max(1, len(text) // 4),
+        )
+
+
+class FakeStream(FakeResponse):
+    """Streamed response: iterating yields text chunks, sleeping between them"""
+
+    def __init__(self, text: str, prompt_tokens: int, latency: LatencyModel, pieces: int = 5):
+        super().__init__(text, prompt_tokens)
+        self._latency = latency
+        size = max(1, len(text) // pieces + 1)
+        self._chunks = [text[i:i + size] for i in range(0, len(text), size)]
+
+    def __iter__(self):
+        share = 1.0 / max(1, len(self._chunks))
+        for chunk in self._chunks:
+            self._latency.wait(share)
+            yield SimpleNamespace(text=chunk)
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return '\n'.join(part for part in contents if isinstance(part, str))
+    return ''
+
+
+def fake_answer(prompt: str) -> str:
+    """A plausible answer in the shape each call site expects"""
+    if 'Extract all key clauses' in prompt:
+        return json.dumps({
+            'contract_type': 'Leave and Licence Agreement',
+            'parties': ['Licensor', 'Licensee'],
+            'clauses': [
+                {'title': 'Security Deposit', 'critical_terms': ['refund', 'deposit'],
+                 'text': 'The Licensee shall pay a refundable security deposit of Rs. 1,00,000 '
+                         'which shall be refunded within 30 days of vacating the premises.'},
+                {'title': 'Lock-in', 'critical_terms': ['lock-in', 'termination'],
+                 'text': 'Neither party may terminate this agreement during a lock-in period of 11 months.'},
+                {'title': 'Cheque Payments', 'critical_terms': ['cheque', 'dishonour'],
+                 'text': 'Rent shall be paid by post-dated cheques; dishonour of a cheque is a default.'},
+            ],
+        })
+    if 'Respond in JSON' in prompt:
+        return json.dumps({'compliance': 'UNCLEAR',
+                           'issues': ['The refund timeline is contractual; no statute fixes it'],
+                           'risks': ['Delay in refund of the deposit without interest or penalty'],
+                           'recommendation': 'Add interest on delayed refund and a dispute resolution clause.'})
+    if 'Analyze the attached legal document' in prompt:
+        return json.dumps({'summary': 'A leave and licence agreement for residential premises for 11 months.',
+                           'key_clauses': ['Refundable security deposit', '11-month lock-in', 'Rent by cheque'],
+                           'risks': ['Termination right is one-sided in favour of the licensor'],
+                           'verdict': {'score': 62, 'reasoning': 'Standard terms; the termination clause is weak.'}})
+    return (
+        "**ISSUE**\n• Whether the facts disclose an offence or civil liability under the cited provisions.\n\n"
+        "**RULE**\n• Section 138, Negotiable Instruments Act, 1881: dishonour of a cheque for insufficiency "
+        "of funds is punishable with imprisonment up to two years, or fine up to twice the cheque amount.\n\n"
+        "**APPLICATION**\n• A demand notice must be sent within 30 days of the return memo; the drawer has "
+        "15 days to pay before a complaint lies.\n\n"
+        "**CONCLUSION**\n• Issue the statutory notice and file the complaint within one month of the cause of action."
+    )
+
+
+class FakeGenerativeModel:
+    """Stands in for genai.GenerativeModel; fast ('flash') and strong models have separate latency"""
+
+    fast_latency: Optional[LatencyModel] = None
+    strong_latency: Optional[LatencyModel] = None
+
+    def __init__(self, model_name: str, **kwargs):
+        self.model_name = model_name if model_name.startswith('models/') else f"models/{model_name}"
+
+    def _latency(self) -> LatencyModel:
+        return self.fast_latency if 'flash' in self.model_name else self.strong_latency
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False, **kwargs):
+        prompt = _prompt_text(contents)
+        text = fake_answer(prompt)
+        prompt_tokens = max(1, len(prompt) // 4) + (258 if not isinstance(contents, str) else 0)
+        latency = self._latency()
+        if stream:
+            return FakeStream(text, prompt_tokens, latency)
+        latency.wait()
+        return FakeResponse(text, prompt_tokens)
+
+
+# --- Vertex AI Search (Discovery Engine) --------------------------------------------------
+
+class FakeSearchServiceClient:
+    """Stands in for discoveryengine.SearchServiceClient, answering from the statute table"""
+
+    latency: Optional[LatencyModel] = None
+    sections: List[Dict] = []
+    acts: Dict[str, Dict] = {}
+
+    def __init__(self, **kwargs):
+        pass
+
+    def search(self, request):
+        self.latency.wait()
+        # Deterministic pseudo-ranking: rotate through the statute table by query hash
+        start = zlib.crc32(request.query.encode('utf-8'))
+        results = []
+        for rank in range(min(request.page_size or 3, len(self.sections))):
+            section = self.sections[(start + rank * 7) % len(self.sections)]
+            act = self.acts.get(section['act'], {}).get('name', section['act'])
+            struct = SimpleNamespace(
+                title=act,
+                page_number=int(zlib.crc32(section['section'].encode()) % 200) + 1,
+                snippets=[SimpleNamespace(snippet=f"Section {section['section']}. {section['title']}. {section['text']}")],
+            )
+            results.append(SimpleNamespace(id=f"{section['act']}-{section['section']}",
+                                           document=SimpleNamespace(derived_struct_data=struct)))
+        return SimpleNamespace(results=results)
+
+
+# --- Web search -----------------------------------------------------------------------------
+
+class FakeWebProvider:
+    """Stands in for the DuckDuckGo / Google web fallback providers"""
+
+    name = 'fake-web'
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+
+    def search(self, query: str, max_results: int = 5):
+        self.latency.wait()
+        return [
+            {'title': f"Legal resource {i}", 'body': f"About: {query[:80]}",
+             'href': f"https://indiankanoon.org/search/?q={zlib.crc32(query.encode())}&r={i}"}
+            for i in range(1, max_results + 1)
+        ]
+
+
+def install(gemini_fast: LatencyModel, gemini_strong: LatencyModel, search: LatencyModel,
+            upload: LatencyModel, upstreams: bool = True) -> None:
+    """
+    Patch genai and discoveryengine in-process with the fakes
+
+    With upstreams=False only file upload and configure are faked (cassette replay
+    answers Gemini and search calls itself).
+    """
+    import google.generativeai as genai
+    from google.cloud import discoveryengine_v1beta as discoveryengine
+
+    def upload_file(path, **kwargs):
+        upload.wait()
+        return SimpleNamespace(name=f"files/{os.path.basename(path)}", uri=f"fake://{path}")
+
+    genai.configure = lambda **kwargs: None
+    genai.upload_file = upload_file
+    if not upstreams:
+        return
+
+    with open(STATUTES_PATH, 'r', encoding='utf-8') as f:
+        statutes = json.load(f)
+    FakeSearchServiceClient.latency = search
+    FakeSearchServiceClient.sections = statutes['sections']
+    FakeSearchServiceClient.acts = statutes['acts']
+    FakeGenerativeModel.fast_latency = gemini_fast
+    FakeGenerativeModel.strong_latency = gemini_strong
+    genai.GenerativeModel = FakeGenerativeModel
+    discoveryengine.SearchServiceClient = FakeSearchServiceClient
+
+
+def make_pdf(lines: List[str]) -> bytes:
+    """A minimal one-page PDF whose text PyPDF2 can extract"""
+    def escape(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    stream = "BT /F1 11 Tf 50 780 Td 14 TL " + ' '.join(f"({escape(line)}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
@@ -0,0 +1,311 @@
+"""
+Nyaya-Sahayak Benchmark Runner
+Purpose: Repeatable load tests of /api/chat/, /api/chat/batch/, /api/analyze/ and /api/verify-contract/
+
+How it works:
+1. Gemini, Vertex AI Search and the web fallback are replaced in-process by the fakes
+   in benchmarks/fakes.py (latency distributions and error rates set on the command line)
+2. Each scenario sends --requests requests through Django's test client from
+   --concurrency threads, after a short warmup that is not measured
+3. Per scenario: p50/p95/p99/mean latency, throughput, error rate; per run: peak RSS
+   (and the tracemalloc peak with --trace-memory)
+4. --baseline compares against a saved report and exits 1 when a scenario's p95 or
+   throughput is worse than --tolerance allows, or its error rate rose
+
+Usage (from project/):
+    python -m benchmarks.run                                  # all scenarios, fast time scale
+    python -m benchmarks.run --scenarios chat --concurrency 16 --requests 400
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --write-baseline benchmarks/baseline.json
+
+Upstream caches are disabled (TTL 0) so every request pays upstream latency;
+--with-caches keeps the configured caches for a warm-cache measurement.
+
+--cassette replays recorded production traffic (see app/cassettes.py) instead of the
+synthetic Gemini and search fakes, at --time-scale times the recorded latency:
+    CASSETTE_MODE=record python manage.py runserver        # capture, then
+    python -m benchmarks.run --cassette app/data/cassettes/default.jsonl --time-scale 1
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .fakes import FakeWebProvider, LatencyModel, install, make_pdf
+
+SCENARIOS = ('chat', 'chat-batch', 'chat-upload', 'analyze', 'verify-contract')
+
+CHAT_QUERIES = [
+    "My tenant has not paid rent for four months and refuses to vacate. What can I do?",
+    "What is the punishment for cheating under Section 420 IPC?",
+    "A cheque I received for a business payment bounced. What are my legal remedies?",
+    "Can my employer withhold my salary after I resign without serving the notice period?",
+    "What is the procedure to file an FIR if the police refuse to register my complaint?",
+    "Is a verbal agreement for the sale of land enforceable in India?",
+    "My neighbour built a wall encroaching on my property. Which law applies?",
+    "What are the grounds for anticipatory bail?",
+]
+
+EVIDENCE_QUESTIONS = [
+    "What is the security deposit amount in this agreement?",
+    "Is the lock-in clause in this agreement legally enforceable?",
+    "Does this agreement comply with the law on cheque payments?",
+]
+
+CONTRACT_LINES = [
+    "LEAVE AND LICENCE AGREEMENT",
+    "This agreement is made between the Licensor and the Licensee.",
+    "1. Security Deposit: The Licensee shall pay a refundable deposit of Rs. 1,00,000.",
+    "2. Lock-in: Neither party may terminate during a lock-in period of 11 months.",
+    "3. Rent: Rent of Rs. 25,000 shall be paid by post-dated cheques.",
+    "4. Termination: The Licensor may terminate with 30 days notice.",
+]
+
+
+def configure_environment(with_caches: bool, cassette: Optional[str] = None, time_scale: float = 1.0) -> None:
+    """Environment for a hermetic run; must happen before Django and app modules load"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nyayasahayak.settings')
+    os.environ['GOOGLE_API_KEY'] = 'benchmark-key'
+    os.environ['DATA_STORE_ID'] = 'bench-store'
+    os.environ['CORPUS_RELOAD_INTERVAL'] = '0'
+    os.environ['WEB_FALLBACK_PROVIDERS'] = ''
+    os.environ['PROFILING_ENABLED'] = 'False'
+    if cassette:
+        os.environ['CASSETTE_MODE'] = 'replay'
+        os.environ['CASSETTE_PATH'] = cassette
+        os.environ['CASSETTE_TIME_SCALE'] = str(time_scale)
+    else:
+        os.environ['CASSETTE_MODE'] = 'off'
+    if not with_caches:
+        for name in ('RETRIEVAL_CACHE_TTL', 'ANSWER_CACHE_TTL', 'WEB_FALLBACK_CACHE_TTL',
+                     'WEB_FALLBACK_NEGATIVE_TTL'):
+            os.environ[name] = '0'
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    # Rank ceil(fraction * n); round() would round halves to even and skip a rank
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered) - 1e-9) - 1))
+    return ordered[index]
+
+
+class Scenario:
+    """One endpoint workload: builds the i-th request and sends it through a test client"""
+
+    def __init__(self, name: str, pdf: bytes):
+        self.name = name
+        self.pdf = pdf
+
+    def send(self, client, i: int):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        if self.name == 'chat':
+            body = json.dumps({'message': CHAT_QUERIES[i % len(CHAT_QUERIES)]})
+            return client.post('/api/chat/', body, content_type='application/json')
+        if self.name == 'chat-batch':
+            # Every query once plus a rotating pair of repeats, as intake submissions arrive
+            queries = CHAT_QUERIES + [CHAT_QUERIES[(i + k) % len(CHAT_QUERIES)] for k in range(2)]
+            body = json.dumps({'queries': queries, 'concurrency': len(CHAT_QUERIES)})
+            return client.post('/api/chat/batch/', body, content_type='application/json')
+        upload = SimpleUploadedFile(f"agreement-{i}.pdf", self.pdf, content_type='application/pdf')
+        if self.name == 'chat-upload':
+            return client.post('/api/chat/', {'message': EVIDENCE_QUESTIONS[i % len(EVIDENCE_QUESTIONS)],
+                                              'file': upload})
+        if self.name == 'analyze':
+            return client.post('/api/analyze/', {'file': upload})
+        return client.post('/api/verify-contract/', {'file': upload})
+
+
+def run_scenario(scenario: Scenario, requests: int, concurrency: int, warmup: int) -> Dict:
+    """Drive one scenario and summarise its latencies"""
+    from django.test import Client
+
+    local = threading.local()
+
+    def one(i: int):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        start = time.perf_counter()
+        try:
+            response = scenario.send(client, i)
+            ok = response.status_code == 200 and json.loads(response.content).get('status') == 'success'
+            outcome = 'ok' if ok else f"http_{response.status_code}"
+        except Exception as e:
+            outcome = type(e).__name__
+        return time.perf_counter() - start, outcome
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"bench-{scenario.name}") as executor:
+        list(executor.map(one, range(warmup)))
+        started = time.perf_counter()
+        results = list(executor.map(one, range(warmup, warmup + requests)))
+        wall = time.perf_counter() - started
+
+    latencies = [seconds for seconds, outcome in results if outcome == 'ok']
+    failures: Dict[str, int] = {}
+    for _, outcome in results:
+        if outcome != 'ok':
+            failures[outcome] = failures.get(outcome, 0) + 1
+
+    summary = {
+        'requests': requests,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'error_rate': round((requests - len(latencies)) / requests, 4),
+        'failures': failures,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+    }
+    if latencies:
+        summary.update({
+            'p50': round(percentile(latencies, 0.50), 4),
+            'p95': round(percentile(latencies, 0.95), 4),
+            'p99': round(percentile(latencies, 0.99), 4),
+            'mean': round(statistics.fmean(latencies), 4),
+            'max': round(max(latencies), 4),
+        })
+    return summary
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of report against baseline (empty list when within tolerance)"""
+    regressions = []
+    for name, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if 'p95' in current and 'p95' in previous and current['p95'] > previous['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95']:.3f}s > baseline {previous['p95']:.3f}s")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput_rps']:.2f} rps "
+                               f"< baseline {previous['throughput_rps']:.2f} rps")
+        if current['error_rate'] > previous['error_rate'] + 0.02:
+            regressions.append(f"{name}: error rate {current['error_rate']:.2%} "
+                               f"> baseline {previous['error_rate']:.2%}")
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    print(f"{'scenario':<16}{'ok':>6}{'err%':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}")
+    for name, result in report['scenarios'].items():
+        print(f"{name:<16}{result['ok']:>6}{result['error_rate'] * 100:>6.1f}%{result['throughput_rps']:>9.2f}"
+              + ''.join(f"{result.get(key, float('nan')):>9.3f}" for key in ('p50', 'p95', 'p99', 'mean')))
+    memory = report['memory']
+    line = f"peak RSS {memory['max_rss_mib']:.1f} MiB"
+    if 'tracemalloc_peak_mib' in memory:
+        line += f", tracemalloc peak {memory['tracemalloc_peak_mib']:.1f} MiB"
+    print(line)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n')[2])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=40, help='measured requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--warmup', type=int, default=4, help='unmeasured requests per scenario')
+    parser.add_argument('--time-scale', type=float, default=0.1,
+                        help='multiplier on every fake latency (1.0 = production-like)')
+    parser.add_argument('--gemini-fast', default='lognormal:0.8,0.35', help='fast model latency')
+    parser.add_argument('--gemini-strong', default='lognormal:2.0,0.4', help='strong model latency')
+    parser.add_argument('--search', default='lognormal:0.3,0.3', help='Vertex AI Search latency')
+    parser.add_argument('--web', default='lognormal:0.6,0.5', help='web search latency')
+    parser.add_argument('--upload', default='lognormal:0.4,0.3', help='Gemini file upload latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='injected failure rate of every fake')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--cassette', help='replay this recorded cassette instead of the Gemini/search fakes')
+    parser.add_argument('--with-caches', action='store_true', help='keep retrieval/answer/web caches on')
+    parser.add_argument('--trace-memory', action='store_true', help='also report the tracemalloc peak (slower)')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='compare against this report; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95/throughput drift')
+    parser.add_argument('--write-baseline', help='write the report as the new baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    configure_environment(args.with_caches, args.cassette, args.time_scale)
+
+    def latency(spec: str, offset: int) -> LatencyModel:
+        return LatencyModel(spec, args.error_rate, args.time_scale, seed=args.seed + offset)
+
+    install(latency(args.gemini_fast, 1), latency(args.gemini_strong, 2),
+            latency(args.search, 3), latency(args.upload, 4), upstreams=not args.cassette)
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from app.rag_engine import get_rag_engine
+
+    media = tempfile.TemporaryDirectory(prefix='nyaya-bench-')
+    settings.MEDIA_ROOT = media.name
+    engine = get_rag_engine()
+    engine.web_fallback.providers = [FakeWebProvider(latency(args.web, 5))]
+
+    if args.trace_memory:
+        tracemalloc.start()
+    pdf = make_pdf(CONTRACT_LINES)
+    report = {
+        'config': {
+            'requests': args.requests, 'concurrency': args.concurrency, 'warmup': args.warmup,
+            'time_scale': args.time_scale, 'error_rate': args.error_rate, 'seed': args.seed,
+            'with_caches': args.with_caches, 'cassette': args.cassette,
+            'latency': {'gemini_fast': args.gemini_fast, 'gemini_strong': args.gemini_strong,
+                        'search': args.search, 'web': args.web, 'upload': args.upload},
+            'python': platform.python_version(),
+        },
+        'scenarios': {},
+    }
+    try:
+        for name in scenarios:
+            report['scenarios'][name] = run_scenario(Scenario(name, pdf), args.requests, args.concurrency,
+                                                     args.warmup)
+    finally:
+        media.cleanup()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['memory'] = {'max_rss_mib': round(max_rss / (1_048_576 if sys.platform == 'darwin' else 1024), 1)}
+    if args.trace_memory:
+        report['memory']['tracemalloc_peak_mib'] = round(tracemalloc.get_traced_memory()[1] / 1_048_576, 1)
+        tracemalloc.stop()
+
+    print_report(report)
+    for path in (args.output, args.write_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
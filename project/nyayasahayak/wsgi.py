@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nyayasahayak.settings')
 
 application = get_wsgi_application()
+
+# Build the RAG engine and clients before the instance reports ready (/readyz)
+from app.startup import start_warmup  # noqa: E402
+
+start_warmup()